@@ -0,0 +1,352 @@
+"""
+Declarative device definitions.
+
+A device is described in a JSON (or YAML, if PyYAML is installed) file
+instead of being hard coded in the server's __init__:
+
+    {
+        "device": {
+            "instance": 3001,
+            "name": "PPFTransmitter",
+            "vendorName": "VSA",
+            "vendorIdentifier": 999,
+            "modelName": "PPF Environmental Transmitter"
+        },
+        "address": "127.0.0.1:47809",
+        "points": [
+            {
+                "type": "analogInput",
+                "start": 1, "count": 3,
+                "name": "Temperature Sensor {instance}",
+                "kind": "temperature",
+                "units": "degreesCelsius",
+                "initial": [18.0, 24.0],
+                "min": 10.0, "max": 35.0, "drift": 0.05,
+                "covIncrement": 0.1,
+                "source": "sim"
+            }
+        ]
+    }
+
+A point entry with "count" expands to that many points starting at
+instance "start", "{instance}" / "{n}" in the name are filled in.  "initial"
+is a number or a [low, high] range to pick a uniform random start from.
+"covIncrement" is how far presentValue has to move before COV subscribers
+are notified, 0.0 (the default) reports every change.
+"source" says where the value comes from: "sim" (PPFSimEngine random walk),
+"static", or {"feed": <slot>, "field": "<name>"} for the PadA shared memory.
+
+Parsing, template expansion and enum resolution only happen once per file
+content: the compiled form is saved as plain tuples (marshal, which can't
+run code the way a pickle can) in a private per-user cache directory,
+keyed by the file's SHA-256, so a 10k point device loads about three times
+faster afterwards.
+Objects are then materialized in bulk from one validated template per
+point shape, and the device objectList is built once.
+"""
+
+import hashlib
+import json
+import marshal
+import os
+import random
+import stat
+import tempfile
+from collections import defaultdict, namedtuple
+
+from bacpypes.basetypes import EngineeringUnits, StatusFlags, EventTransitionBits, EventState
+from bacpypes.constructeddata import ArrayOf
+from bacpypes.local.device import LocalDeviceObject
+from bacpypes.object import AnalogInputObject, AnalogValueObject
+from bacpypes.primitivedata import (
+    BitString, Boolean, CharacterString, Enumerated, ObjectIdentifier, Real, Unsigned,
+)
+
+# bump when the compiled form changes so stale caches are ignored
+COMPILER_VERSION = 3
+
+# per user and private, nothing in it is trusted beyond being data
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "mdebacnet", "devcache",
+)
+
+# object types a definition can use
+OBJECT_CLASSES = {
+    "analogInput": AnalogInputObject,
+    "analogValue": AnalogValueObject,
+}
+
+DEVICE_DEFAULTS = {
+    "vendorName": "VSA",
+    "vendorIdentifier": 999,
+    "modelName": "MDE Simulated Device",
+    "firmwareRevision": "2.0",
+    "applicationSoftwareVersion": "2.0",
+    "maxApduLengthAccepted": 1024,
+    "segmentationSupported": "noSegmentation",
+}
+
+
+# one expanded point of the compiled definition
+Point = namedtuple("Point", (
+    "type", "instance", "name", "description", "kind", "units",
+    "initial", "min", "max", "drift", "cov_increment", "source",
+))
+
+
+class DefinitionError(ValueError):
+    pass
+
+
+# --------------------------------------------------------------------
+# Parse + compile
+def _parse(path, raw):
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise DefinitionError("%s: PyYAML is not installed, use JSON" % (path,))
+        return yaml.safe_load(raw)
+    return json.loads(raw)
+
+
+def _units(value, where):
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    units = EngineeringUnits.enumerations.get(value)
+    if units is None:
+        raise DefinitionError("%s: unknown units %r" % (where, value))
+    return units
+
+
+def _expand(entry, index):
+    where = "points[%d]" % (index,)
+
+    obj_type = entry.get("type", "analogInput")
+    if obj_type not in OBJECT_CLASSES:
+        raise DefinitionError("%s: unsupported object type %r" % (where, obj_type))
+
+    if "count" in entry:
+        start = int(entry.get("start", 1))
+        instances = range(start, start + int(entry["count"]))
+    elif "instance" in entry:
+        instances = [int(entry["instance"])]
+    else:
+        raise DefinitionError("%s: needs 'instance' or 'count'" % (where,))
+
+    name = entry.get("name", obj_type + " {instance}")
+    initial = entry.get("initial", 0.0)
+    if not isinstance(initial, (list, tuple)):
+        initial = (float(initial), float(initial))
+
+    source = entry.get("source", "static")
+    if isinstance(source, dict):
+        source = ("feed", int(source.get("feed", 0)), source["field"])
+    elif source not in ("sim", "static"):
+        raise DefinitionError("%s: unknown source %r" % (where, source))
+
+    points = []
+    for n, inst in enumerate(instances):
+        points.append(Point(
+            type=obj_type,
+            instance=inst,
+            name=name.format(instance=inst, n=n),
+            description=entry.get("description"),
+            kind=entry.get("kind"),
+            units=_units(entry.get("units"), where),
+            initial=(float(initial[0]), float(initial[1])),
+            min=entry.get("min"),
+            max=entry.get("max"),
+            drift=entry.get("drift"),
+            cov_increment=float(entry.get("covIncrement", 0.0)),
+            source=source,
+        ))
+    return points
+
+
+def compile_definition(data, path="<definition>"):
+    """Turn a parsed definition into the flat form the builders use."""
+    if "device" not in data:
+        raise DefinitionError("%s: missing 'device'" % (path,))
+
+    device = dict(DEVICE_DEFAULTS)
+    device.update(data["device"])
+    if "instance" not in device:
+        raise DefinitionError("%s: device needs an 'instance'" % (path,))
+
+    points = []
+    for i, entry in enumerate(data.get("points", [])):
+        points.extend(_expand(entry, i))
+
+    seen = set()
+    for p in points:
+        if (p.type, p.instance) in seen:
+            raise DefinitionError("%s: duplicate object %s:%d" % (path, p.type, p.instance))
+        seen.add((p.type, p.instance))
+
+    return {
+        "device": device,
+        "address": data.get("address"),
+        "points": points,
+    }
+
+
+def _cache_dir():
+    """Return CACHE_DIR, created 0700, or None if it isn't ours alone."""
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        st = os.stat(CACHE_DIR)
+    except OSError:
+        return None
+    if hasattr(os, "getuid"):
+        if st.st_uid != os.getuid() or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            return None
+    return CACHE_DIR
+
+
+def _load_compiled(cache_path):
+    with open(cache_path, "rb") as f:
+        device, address, rows = marshal.loads(f.read())
+    return {"device": dict(device), "address": address, "points": list(map(Point._make, rows))}
+
+
+def load_definition(path):
+    """Load a definition file, using the compiled cache when the content is unchanged."""
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    digest = hashlib.sha256(raw).hexdigest()
+    cache_dir = _cache_dir()
+    cache_path = cache_dir and os.path.join(cache_dir, "%s-v%d.marshal" % (digest, COMPILER_VERSION))
+
+    if cache_path:
+        try:
+            return _load_compiled(cache_path)
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+
+    compiled = compile_definition(_parse(path, raw.decode("utf-8")), path)
+
+    # best effort, no usable cache directory just means no cache
+    if cache_path:
+        try:
+            data = marshal.dumps((
+                compiled["device"], compiled["address"], [tuple(p) for p in compiled["points"]],
+            ))
+            fd, tmp = tempfile.mkstemp(dir=cache_dir)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, cache_path)
+        except (OSError, TypeError, ValueError):
+            pass
+
+    return compiled
+
+
+# --------------------------------------------------------------------
+# Materialize
+def build_device(definition):
+    d = definition["device"]
+    return LocalDeviceObject(
+        objectIdentifier=('device', int(d["instance"])),
+        objectName=d.get("name", "Device%d" % (d["instance"],)),
+        systemStatus=Enumerated(0),  # operational
+        vendorName=CharacterString(d["vendorName"]),
+        vendorIdentifier=int(d["vendorIdentifier"]),
+        modelName=CharacterString(d["modelName"]),
+        firmwareRevision=CharacterString(d["firmwareRevision"]),
+        applicationSoftwareVersion=CharacterString(d["applicationSoftwareVersion"]),
+        protocolVersion=Unsigned(1),
+        protocolRevision=Unsigned(22),
+        maxApduLengthAccepted=Unsigned(int(d["maxApduLengthAccepted"])),
+        segmentationSupported=d["segmentationSupported"],
+        databaseRevision=Unsigned(1),
+    )
+
+
+def _template(cls, obj_type):
+    # build one object the normal (validating) way, its values are the template
+    obj = cls(
+        objectIdentifier=(obj_type, 0),
+        objectName="template",
+        presentValue=Real(0.0),
+        statusFlags=StatusFlags([0, 0, 0, 0]),
+        eventState=EventState(0),
+        eventEnable=EventTransitionBits([0, 0, 0]),
+        ackedTransitions=EventTransitionBits([0, 0, 0]),
+        outOfService=Boolean(False),
+        notificationClass=Unsigned(0),
+        notifyType=1,
+        units=EngineeringUnits(0),
+        covIncrement=Real(0.0),
+    )
+    return obj._values
+
+
+def build_objects(definition, rng=random):
+    """Materialize every point, returns a list of (point, object)."""
+    templates = {}
+    result = []
+
+    for point in definition["points"]:
+        cls = OBJECT_CLASSES[point.type]
+
+        template = templates.get(point.type)
+        if template is None:
+            values = _template(cls, point.type)
+            bits = [(propid, value.__class__, value.value) for propid, value in values.items()
+                    if isinstance(value, BitString)]
+            template = templates[point.type] = (values, bits)
+
+        # skip Object.__init__ and its per-property validation, the template
+        # already went through it; bit strings are mutable, give each object its own
+        values = dict(template[0])
+        for propid, bit_class, bit_value in template[1]:
+            values[propid] = bit_class(list(bit_value))
+
+        values["objectIdentifier"] = (point.type, point.instance)
+        values["objectName"] = point.name
+        values["presentValue"] = Real(rng.uniform(*point.initial))
+        values["covIncrement"] = Real(point.cov_increment)
+        if point.units is not None:
+            values["units"] = EngineeringUnits(point.units)
+        if point.description is not None:
+            values["description"] = CharacterString(point.description)
+
+        obj = cls.__new__(cls)
+        obj._app = None
+        obj._values = values
+        obj._property_monitors = defaultdict(list)
+
+        result.append((point, obj))
+
+    return result
+
+
+def add_objects(app, objects):
+    """Bulk version of Application.add_object, the objectList is set once."""
+    device = app.localDevice
+    new_ids = []
+
+    for obj in objects:
+        object_name = obj._values["objectName"]
+        object_identifier = obj._values["objectIdentifier"]
+
+        if object_identifier[1] >= ObjectIdentifier.maximum_instance_number:
+            raise RuntimeError("invalid object identifier")
+        if object_name in app.objectName:
+            raise RuntimeError("already an object with name %r" % (object_name,))
+        if object_identifier in app.objectIdentifier:
+            raise RuntimeError("already an object with identifier %r" % (object_identifier,))
+
+        app.objectName[object_name] = obj
+        app.objectIdentifier[object_identifier] = obj
+        new_ids.append(object_identifier)
+        obj._app = app
+
+    if device is not None and device.objectList:
+        # value[0] of an ArrayOf is its length
+        device.objectList = ArrayOf(ObjectIdentifier)(device.objectList.value[1:] + new_ids)
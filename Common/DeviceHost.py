@@ -0,0 +1,193 @@
+"""
+Many BACnet devices in one process, behind a virtual router.
+
+The host owns the one real UDP socket (a BIP stack bound to the router's
+NetworkServiceAccessPoint).  Every simulated device is a light application
+stack (ASAP / SMAP / NSAP) bound to a Node on a virtual network, so it costs
+a handful of Python objects instead of an interpreter and a UDP port.
+
+To a client like Ignition the devices are remote stations on the virtual
+network, reached through the router's address:
+
+    Ignition  --UDP-->  127.0.0.1:47820  (router, BIP network 1)
+                              |
+                        virtual network 100
+                      /        |          \\
+                 100:0x0002  100:0x0003  ...  (one LocalDeviceObject each)
+
+Who-Is is forwarded onto the virtual network like any broadcast and each
+device answers with an I-Am that carries its network and station address.
+"""
+
+import struct
+
+from bacpypes.app import ApplicationIOController
+from bacpypes.appservice import StateMachineAccessPoint, ApplicationServiceAccessPoint
+from bacpypes.bvllservice import BIPSimple, AnnexJCodec, UDPMultiplexer
+from bacpypes.comm import bind
+from bacpypes.core import deferred
+from bacpypes.netservice import NetworkServiceAccessPoint, NetworkServiceElement
+from bacpypes.pdu import Address, LocalBroadcast, PDU
+from bacpypes.service.device import WhoIsIAmServices
+from bacpypes.service.cov import ChangeOfValueServices
+from bacpypes.service.object import ReadWritePropertyServices, ReadWritePropertyMultipleServices
+from bacpypes.vlan import Network, Node
+
+# station 0 is not a valid MAC, 0x0001 is the router itself
+ROUTER_STATION = 1
+FIRST_DEVICE_STATION = 2
+
+# two byte station addresses, 0xFFFF is reserved for broadcast
+MAX_STATIONS = 0xFFFE
+
+
+def station_address(station):
+    """Two octet MAC address on the virtual network."""
+    return Address(struct.pack(">H", station))
+
+
+# --------------------------------------------------------------------
+# Virtual network with O(1) unicast delivery
+class VirtualNetwork(Network):
+    """Network delivers unicast by scanning every node and deep copies the
+    PDU for every receiver, which is fine for a test bench with three nodes
+    but not for a thousand.  Keep an index of station address -> node for
+    unicast.  Broadcasts from a device only go to the router (the devices
+    never need to hear each other, and the startup I-Am from every device
+    would otherwise be an N squared storm), broadcasts from the router go
+    to every device as a cheap PDU clone."""
+
+    def __init__(self, name=""):
+        Network.__init__(self, name=name, broadcast_address=LocalBroadcast())
+        self.by_address = {}
+        self.uplink = None
+
+    def add_node(self, node, uplink=False):
+        if node.address in self.by_address:
+            raise ValueError("duplicate station address: %s" % (node.address,))
+        Network.add_node(self, node)
+        self.by_address[node.address] = node
+        if uplink:
+            self.uplink = node
+
+    def remove_node(self, node):
+        Network.remove_node(self, node)
+        del self.by_address[node.address]
+        if node is self.uplink:
+            self.uplink = None
+
+    def process_pdu(self, pdu):
+        if self.traffic_log:
+            self.traffic_log(self.name, pdu)
+
+        if pdu.pduDestination == self.broadcast_address:
+            if self.uplink is None:
+                Network.process_pdu(self, pdu)
+            elif pdu.pduSource != self.uplink.address:
+                self.uplink.response(pdu)
+            else:
+                for node in self.nodes:
+                    if node is not self.uplink:
+                        node.response(_clone(pdu))
+            return
+
+        node = self.by_address.get(pdu.pduDestination)
+        if node is not None:
+            # the sender is done with it, no copy needed for a single receiver
+            node.response(pdu)
+
+
+def _clone(pdu):
+    # decoding consumes pduData, so every receiver needs its own buffer,
+    # but nothing else needs the deepcopy Network.process_pdu does
+    clone = PDU(pdu.pduData)
+    clone.update(pdu)
+    return clone
+
+
+# --------------------------------------------------------------------
+# One simulated device
+class HostedApplication(ApplicationIOController, WhoIsIAmServices, ReadWritePropertyServices,
+                        ReadWritePropertyMultipleServices, ChangeOfValueServices):
+
+    # a few hundred devices share the loop, keep their COV traffic paced
+    cov_notification_interval = 1.0
+    cov_max_outstanding = 1
+
+    def __init__(self, device, vlan, station):
+        ApplicationIOController.__init__(self, device)
+
+        self.station = station
+        self.localAddress = station_address(station)
+
+        # application layer
+        self.asap = ApplicationServiceAccessPoint()
+        self.smap = StateMachineAccessPoint(device)
+        self.smap.deviceInfoCache = self.deviceInfoCache
+
+        # network layer, the device only ever sees its own virtual network
+        self.nsap = NetworkServiceAccessPoint()
+        self.nse = NetworkServiceElement()
+        bind(self.nse, self.nsap)
+        bind(self, self.asap, self.smap, self.nsap)
+
+        # attach to the virtual network
+        self.node = Node(self.localAddress)
+        vlan.add_node(self.node)
+        self.nsap.bind(self.node, address=self.localAddress)
+
+
+# --------------------------------------------------------------------
+# The router and the devices behind it
+class DeviceHost:
+
+    def __init__(self, address, network=1, vlan_network=100):
+        self.address = Address(address)
+        self.network = network
+        self.vlan_network = vlan_network
+
+        # router side, one NSAP with an adapter per network
+        self.nsap = NetworkServiceAccessPoint()
+        self.nse = NetworkServiceElement()
+        bind(self.nse, self.nsap)
+
+        # the only real socket in the process
+        self.bip = BIPSimple()
+        self.annexj = AnnexJCodec()
+        self.mux = UDPMultiplexer(self.address)
+        bind(self.bip, self.annexj, self.mux.annexJ)
+        self.nsap.bind(self.bip, network, self.address)
+
+        # virtual network the devices live on
+        self.vlan = VirtualNetwork(name="vlan%d" % (vlan_network,))
+        self.router_node = Node(station_address(ROUTER_STATION))
+        self.vlan.add_node(self.router_node, uplink=True)
+        self.nsap.bind(self.router_node, vlan_network)
+
+        self.apps = []
+        self.next_station = FIRST_DEVICE_STATION
+
+    def add_device(self, device, objects=()):
+        """Host a LocalDeviceObject (plus its objects) on the next free station."""
+        if self.next_station > MAX_STATIONS:
+            raise RuntimeError("virtual network %d is full" % (self.vlan_network,))
+
+        app = HostedApplication(device, self.vlan, self.next_station)
+        self.next_station += 1
+
+        for obj in objects:
+            app.add_object(obj)
+
+        self.apps.append(app)
+        return app
+
+    def remote_address(self, app):
+        """How a client on the BIP side addresses a hosted device."""
+        return Address("%d:0x%04x" % (self.vlan_network, app.station))
+
+    def announce(self):
+        """Tell the BIP side we route to the virtual network (once the loop runs)."""
+        deferred(self.nse.i_am_router_to_network)
+
+    def close_socket(self):
+        self.mux.close_socket()
@@ -0,0 +1,251 @@
+"""
+Binary delta wire format for the PoD-A feed (mars-monitor -> PadAListener).
+
+The monitor used to send a full JSON snapshot (~150 bytes) per sample.  This
+format sends frames of batched samples, and each sample only carries the
+fields that changed since the previous one:
+
+    frame header, 8 bytes (little endian)
+        offset  0  2s   magic  b"\\xa5\\xd1"  (never the start of a JSON line)
+        offset  2  B    version
+        offset  3  B    flags, FLAG_KEYFRAME / FLAG_NAME
+        offset  4  H    sample count
+        offset  6  H    payload length in bytes
+
+    payload
+        [FLAG_NAME]  B length + utf-8 feed name
+        sample * count
+            B   changed mask, bit i = ANALOG_FIELDS[i] (bits 0-2), bit 3 = switches
+            f   value of every changed analog field, in order (float32, the
+                same resolution as the BACnet Real it ends up in)
+            B   [bit 3 set] the four switches, bit i = SWITCH_FIELDS[i]
+
+A keyframe's first sample is a delta against nothing, i.e. it carries every
+field, and resets the decoder.  The encoder sends one after every
+(re)connect and every KEYFRAME_EVERY frames, so a decoder never has to guess
+at state it missed.  An unchanged sample is a single zero byte.
+
+This module is imported by mars-monitor.py on the VM, which runs Python 2:
+keep it free of Python 3 only syntax and of any dependency outside the
+standard library.  Copy it next to mars-monitor.py when deploying.
+"""
+
+import struct
+from collections import deque
+
+MAGIC = b"\xa5\xd1"
+VERSION = 1
+
+FLAG_KEYFRAME = 0x01
+FLAG_NAME = 0x02
+
+ANALOG_FIELDS = ("pressure", "level", "delta_p")
+SWITCH_FIELDS = ("vent_open", "vent_close", "press_open", "press_close")
+
+SWITCH_BIT = 1 << len(ANALOG_FIELDS)
+
+# the header's count and length are 16 bit, stay well inside both
+MAX_SAMPLES_PER_FRAME = 1024
+
+# force a keyframe this often even on a healthy connection
+KEYFRAME_EVERY = 120
+
+# samples kept while the listener is unreachable, oldest are dropped first
+MAX_BUFFERED = 6000
+
+_HEADER = struct.Struct("<2sBBHH")
+_FLOAT = struct.Struct("<f")
+
+HEADER_SIZE = _HEADER.size
+
+# bytes a sample takes after its mask byte, by the low four mask bits
+_SAMPLE_SIZE = [
+    _FLOAT.size * bin(mask & (SWITCH_BIT - 1)).count("1") + (1 if mask & SWITCH_BIT else 0)
+    for mask in range(SWITCH_BIT << 1)
+]
+
+
+class FeedCodecError(ValueError):
+    pass
+
+
+def _f32(value):
+    # what the value looks like after a trip through the wire
+    return _FLOAT.unpack(_FLOAT.pack(float(value)))[0]
+
+
+def _switch_bits(snapshot):
+    bits = 0
+    for i, name in enumerate(SWITCH_FIELDS):
+        if snapshot.get(name):
+            bits |= 1 << i
+    return bits
+
+
+class DeltaEncoder(object):
+    """Sender side.  add() samples as they are taken, then frame() to get the
+    bytes for everything pending; call commit() once they were sent, or
+    reset() if the connection failed (the samples stay pending and go out
+    in a keyframe on the next connection)."""
+
+    def __init__(self, feed="", max_buffered=MAX_BUFFERED):
+        self.feed = feed
+        self.pending = deque(maxlen=max_buffered)
+        self.dropped = 0
+
+        # what the receiver holds: analog values as float32 + switch bits
+        self.state = None
+        self.keyframe = True
+        self.frames = 0
+
+        # set by frame(), applied by commit()
+        self._next_state = None
+        self._taken = 0
+
+    def add(self, snapshot):
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+        self.pending.append((
+            tuple(_f32(snapshot.get(name, 0.0)) for name in ANALOG_FIELDS),
+            _switch_bits(snapshot),
+        ))
+
+    def reset(self):
+        """Connection lost: the next frame is a keyframe."""
+        self.state = None
+        self.keyframe = True
+        self._next_state = None
+        self._taken = 0
+
+    def frame(self):
+        """Bytes for up to MAX_SAMPLES_PER_FRAME pending samples, b"" if none."""
+        if not self.pending:
+            return b""
+
+        keyframe = self.keyframe or self.frames >= KEYFRAME_EVERY
+        state = None if keyframe else self.state
+
+        count = min(len(self.pending), MAX_SAMPLES_PER_FRAME)
+        body = bytearray()
+        flags = 0
+        if keyframe:
+            flags |= FLAG_KEYFRAME
+        if keyframe and self.feed:
+            name = self.feed.encode("utf-8")[:255]
+            flags |= FLAG_NAME
+            body.append(len(name))
+            body += name
+
+        for n in range(count):
+            analog, switches = self.pending[n]
+            mask = 0
+            values = []
+            for i, value in enumerate(analog):
+                if state is None or state[0][i] != value:
+                    mask |= 1 << i
+                    values.append(value)
+            if state is None or state[1] != switches:
+                mask |= SWITCH_BIT
+
+            body.append(mask)
+            for value in values:
+                body += _FLOAT.pack(value)
+            if mask & SWITCH_BIT:
+                body.append(switches)
+            state = (analog, switches)
+
+        self._next_state = state
+        self._taken = count
+        return _HEADER.pack(MAGIC, VERSION, flags, count, len(body)) + bytes(body)
+
+    def commit(self):
+        """The last frame() went out, drop its samples and advance the state."""
+        for _ in range(self._taken):
+            self.pending.popleft()
+        if self._taken:
+            self.state = self._next_state
+            self.frames = 0 if self.keyframe or self.frames >= KEYFRAME_EVERY else self.frames + 1
+            self.keyframe = False
+        self._next_state = None
+        self._taken = 0
+
+
+class DeltaDecoder(object):
+    """Receiver side.  feed() raw stream bytes, get back a list of
+    (feed name or None, snapshot dict) per decoded sample."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.name = None
+        self.snapshot = None
+
+    def feed(self, chunk):
+        buf = self.buffer
+        buf += chunk
+
+        samples = []
+        start = 0
+        while len(buf) - start >= HEADER_SIZE:
+            magic, version, flags, count, length = _HEADER.unpack_from(buf, start)
+            if magic != MAGIC:
+                raise FeedCodecError("bad frame magic %r" % (bytes(magic),))
+            if version != VERSION:
+                raise FeedCodecError("unsupported frame version %d" % (version,))
+            end = start + HEADER_SIZE + length
+            if len(buf) < end:
+                break
+            self._decode(buf, start + HEADER_SIZE, end, flags, count, samples)
+            start = end
+
+        # compact once per chunk, not once per frame
+        if start:
+            del buf[:start]
+        return samples
+
+    def _decode(self, buf, pos, end, flags, count, samples):
+        # every read is checked against the end of the frame first, a
+        # malformed frame is a FeedCodecError and never reads past it
+        if flags & FLAG_NAME:
+            if pos >= end:
+                raise FeedCodecError("frame ends in the feed name")
+            size = buf[pos]
+            if pos + 1 + size > end:
+                raise FeedCodecError("frame ends in the feed name")
+            self.name = bytes(buf[pos + 1:pos + 1 + size]).decode("utf-8", "replace")
+            pos += 1 + size
+
+        snapshot = self.snapshot
+        if flags & FLAG_KEYFRAME:
+            snapshot = None
+        elif snapshot is None:
+            raise FeedCodecError("delta frame before the first keyframe")
+
+        for _ in range(count):
+            if pos >= end:
+                raise FeedCodecError("frame ends mid sample")
+            mask = buf[pos]
+            pos += 1
+            if pos + _SAMPLE_SIZE[mask & 0x0F] > end:
+                raise FeedCodecError("frame ends mid sample")
+            if snapshot is None:
+                if mask & 0x0F != 0x0F:
+                    raise FeedCodecError("keyframe sample is missing fields")
+                snapshot = {}
+            else:
+                snapshot = dict(snapshot)
+
+            for i, name in enumerate(ANALOG_FIELDS):
+                if mask & (1 << i):
+                    snapshot[name] = _FLOAT.unpack_from(buf, pos)[0]
+                    pos += _FLOAT.size
+            if mask & SWITCH_BIT:
+                bits = buf[pos]
+                pos += 1
+                for i, name in enumerate(SWITCH_FIELDS):
+                    snapshot[name] = bool(bits & (1 << i))
+
+            samples.append((self.name, snapshot))
+
+        if pos != end:
+            raise FeedCodecError("%d trailing bytes in frame" % (end - pos,))
+        self.snapshot = snapshot
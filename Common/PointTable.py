@@ -0,0 +1,98 @@
+"""
+Double-buffered point table shared by the device servers.
+
+Producers never touch BACnet objects.  A writer (a reader thread, a
+simulation task, ...) stages samples into the table's back buffer, which
+is the only thing guarded by a lock, and commits.  The commit schedules a
+swap on the bacpypes event loop thread: the back buffer is exchanged for
+the spare one and the presentValues that changed are written.
+
+The objects themselves are the published state.  Everything that serves
+clients (ReadProperty, ReadPropertyMultiple, COV) runs on the loop thread
+too, so a request always sees one whole swap or none of it, with no lock
+and no copy of the values on the read path.  Writing presentValue runs
+the object's property monitors, which is where change-of-value detection
+lives, so COV fires in the same loop pass as the swap.
+"""
+
+import threading
+
+from bacpypes.core import deferred
+from bacpypes.primitivedata import Real
+
+
+class PointTable:
+
+    def __init__(self, objects):
+        # key -> BACnet object with a Real presentValue
+        self.objects = objects
+
+        # writer side: two buffers, writers fill _back, the swap takes it
+        # and hands them the other one
+        self._lock = threading.Lock()
+        self._buffers = ({}, {})
+        self._back = self._buffers[0]
+        self._swap_pending = False
+
+        # bumped on every swap that changed something
+        self.generation = 0
+
+    # ----------------------------------------------------------------
+    # writer side, any thread
+    def stage(self, values):
+        """Stage {key: value} into the back buffer, latest value wins."""
+        with self._lock:
+            self._back.update(values)
+
+    def commit(self):
+        """Ask the event loop to swap buffers (once, however often it's called)."""
+        with self._lock:
+            if self._swap_pending or not self._back:
+                return
+            self._swap_pending = True
+
+        # wakes the core loop through the task manager trigger
+        deferred(self._swap)
+
+    def push(self, values):
+        self.stage(values)
+        self.commit()
+
+    # ----------------------------------------------------------------
+    # event loop side
+    def value(self, key):
+        """Event loop thread only, the current presentValue of a point as a float."""
+        value = self.objects[key].presentValue
+        return value.value if isinstance(value, Real) else value
+
+    def _swap(self):
+        with self._lock:
+            back = self._back
+            self._back = self._buffers[1] if back is self._buffers[0] else self._buffers[0]
+            self._swap_pending = False
+
+        self.apply(back)
+        back.clear()
+
+    def apply(self, values):
+        """Event loop thread only, publish the values that changed."""
+        objects = self.objects
+        changed = 0
+        for key, value in values.items():
+            if value is None or key not in objects:
+                continue
+            value = float(value)
+            if self.value(key) == value:
+                continue
+
+            # property monitors (COV detection) run right here, one object
+            # failing doesn't hold back the rest or whoever is driving the table
+            try:
+                objects[key].presentValue = Real(value)
+                changed += 1
+            except Exception as err:
+                print(f"⚠️ point {key}: presentValue not published: {err!r}")
+
+        if changed:
+            self.generation += 1
+        return changed
@@ -3,9 +3,11 @@
 # --- patch CharacterString early ---
 from bacpypes.primitivedata import CharacterString
 from bacpypes.core import run
-import time, random, threading
+from bacpypes.task import RecurringTask
 from bacpypes.pdu import Address
 from bacpypes.app import BIPSimpleApplication
+from bacpypes.service.cov import ChangeOfValueServices
+from bacpypes.service.object import ReadWritePropertyMultipleServices
 from bacpypes.constructeddata import ArrayOf
 from bacpypes.local.device import LocalDeviceObject
 from bacpypes.object import AnalogInputObject
@@ -38,6 +40,25 @@ from bacpypes.apdu import ReadAccessResult, ReadAccessResultElement
 from bacpypes.object import DeviceObject
 from bacpypes.local.device import LocalDeviceObject
 
+import os, sys
+from PPFSimEngine import SimEngine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common.DeviceConfig import load_definition, build_device, build_objects, add_objects
+from Common.PointTable import PointTable
+
+# device + points are declared in PPFDevice.json
+DEVICE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "PPFDevice.json")
+definition = load_definition(DEVICE_FILE)
+
+# drift tick, milliseconds
+DRIFT_INTERVAL = 2000
+
+# COV notifications, at most one per subscription every COV_MIN_INTERVAL
+# seconds and COV_MAX_OUTSTANDING unanswered confirmed ones per subscriber
+COV_MIN_INTERVAL = 1.0
+COV_MAX_OUTSTANDING = 1
+
 def make_ansi_string(text: str):
     """Force ANSI (encoding=0) CharacterString compatible with BACnet 4J."""
     encoded = text.encode("ascii", errors="ignore")
@@ -47,21 +68,7 @@ def make_ansi_string(text: str):
     return any_val
 
 
-this_device = LocalDeviceObject(
-    objectIdentifier=('device', 3001),
-    objectName='PPFTransmitter',
-    systemStatus=Enumerated(0),  # operational
-    vendorName=CharacterString('VSA'),
-    vendorIdentifier=999,
-    modelName=CharacterString('PPF Environmental Transmitter'),
-    firmwareRevision=CharacterString('2.0'),
-    applicationSoftwareVersion=CharacterString('2.0'),
-    protocolVersion=Unsigned(1),
-    protocolRevision=Unsigned(22),
-    maxApduLengthAccepted=Unsigned(1024),
-    segmentationSupported=Enumerated(3),  # noSegmentation = 3
-    databaseRevision=Unsigned(1),
-)
+this_device = build_device(definition)
 
 def _send_ack(self, ack):
     self.response(ack)
@@ -71,135 +78,68 @@ def _send_ack(self, ack):
 
 
 
+# --------------------------------------------------------------------
+# Drift task, runs inside the bacpypes event loop
+class DriftTask(RecurringTask):
+    def __init__(self, server, interval):
+        RecurringTask.__init__(self, interval)
+        self.server = server
+
+    def process_task(self):
+        self.server._drift_step()
+
+
 # --------------------------------------------------------------------
 # 2️⃣ Application subclass that handles BACnet traffic
-class FakeBACnetServer(BIPSimpleApplication):
+class FakeBACnetServer(BIPSimpleApplication, ReadWritePropertyMultipleServices, ChangeOfValueServices):
+    cov_notification_interval = COV_MIN_INTERVAL
+    cov_max_outstanding = COV_MAX_OUTSTANDING
+
     def _send_ack(self, ack):
         self.response(ack)
         print("sent ack")
         return
  
 
-    def __init__(self, device, address):
+    def __init__(self, device, address, definition):
         super().__init__(device, address)
-                # --- 10 fake analog inputs ---
-
-                
-
-        # --- Realistic sensor categories ---
-        self.sensors = {
-            # temperature (°C)
-            1:  random.uniform(18.0, 24.0),
-            2:  random.uniform(18.0, 24.0),
-            3:  random.uniform(18.0, 24.0),
-
-            # pressure (kPa)
-            4:  random.uniform(85.0, 110.0),
-            5:  random.uniform(85.0, 110.0),
-            6:  random.uniform(85.0, 110.0),
-
-            # humidity (% RH)
-            7:  random.uniform(35.0, 55.0),
-            8:  random.uniform(35.0, 55.0),
-            9:  random.uniform(35.0, 55.0),
-        }
-
-        # --- matching sensor metadata ---
-        self.sensor_types = {
-            1: "temperature", 2: "temperature", 3: "temperature",
-            4: "pressure",    5: "pressure",    6: "pressure",
-            7: "humidity",    8: "humidity",    9: "humidity",
-        }
-
-        # BACnet engineering units mapping
-        self.unit_map = {
-            "temperature": 62,   # degreesCelsius
-            "pressure":    115,  # kilopascals
-            "humidity":    29,   # percentRelativeHumidity
-        }
-
-        # start drift loop
-        
-        self.ai_objects = {}  # store references
-        # --- Build REAL analog input objects ---
-        for inst, value in self.sensors.items():
-            from bacpypes.basetypes import StatusFlags, EventTransitionBits, TimeStamp, EngineeringUnits, NotifyType, EventState
-            sensor_type = self.sensor_types[inst]
-            unit_enum = self.unit_map[sensor_type]
-            ai = AnalogInputObject(
-                objectIdentifier=('analogInput', inst),
-                objectName=f"{sensor_type.title()} Sensor {inst}",
-                presentValue=Real(value),
 
-                # ---- REQUIRED VALID BACNET TYPES ----
-                statusFlags=StatusFlags([0, 0, 0, 0]),
+        # --- Build every object from the definition in one go ---
+        points = build_objects(definition)
+        add_objects(self, [obj for _, obj in points])
 
-                eventState=EventState(0),              # instead of 0
-                eventEnable=EventTransitionBits([0,0,0]),
-                ackedTransitions=EventTransitionBits([0,0,0]),
-                outOfService=Boolean(False),
-
-                notificationClass=Unsigned(0),
-
-                notifyType=1,               # instead of Unsigned(1)
-
-                # ---- FIXED! MUST BE EngineeringUnits ----
-                units=EngineeringUnits(unit_enum),              # degreesCelsius
-            )
-
-            self.add_object(ai)
-            self.ai_objects[inst] = ai
-
-        from bacpypes.object import AnalogValueObject
-        from bacpypes.basetypes import StatusFlags, EventTransitionBits, TimeStamp, EngineeringUnits, NotifyType, EventState
-        av = AnalogValueObject(
-            objectIdentifier=('analogValue', 1),
-            objectName=f"Test AV {1}",
-            presentValue=Real(0.0),
-            statusFlags=StatusFlags([0,0,0,0]),
-            eventState=EventState(0),
-            eventEnable=EventTransitionBits([0,0,0]),
-            ackedTransitions=EventTransitionBits([0,0,0]),
-            outOfService=Boolean(False),
-            notificationClass=Unsigned(0),
-            notifyType=1,
-            units=EngineeringUnits(0),
-        )
-
-        self.add_object(av)
-        self.av_objects = {}          # <-- create dictionary
-        self.av_objects[1] = av       # <-- store the AV object reference
-        self.localDevice.objectList.append(ObjectIdentifier(('analogValue', 1)))
-        threading.Thread(target=self._drift_loop, daemon=True).start()
-
-
-
-    def _drift_loop(self):
-        while True:
-            for i, v in self.sensors.items():
+        self.ai_objects = {}  # store references
+        self.av_objects = {}
 
-                t = self.sensor_types[i]
+        # every simulated point lives in one vectorized engine, drift runs as a task on the bacpypes loop
+        self.engine = SimEngine()
+        sim_objects = {}
+        for point, obj in points:
+            if point.type == "analogInput":
+                self.ai_objects[point.instance] = obj
+            elif point.type == "analogValue":
+                self.av_objects[point.instance] = obj
 
-                if t == "temperature":
-                    drift = random.uniform(-0.05, 0.05)
-                    new = max(10.0, min(35.0, v + drift))
+            if point.source == "sim":
+                self.engine.add_point(
+                    point.instance, point.kind, obj.presentValue.value,
+                    lo=point.min, hi=point.max, drift=point.drift,
+                )
+                sim_objects[point.instance] = obj
+        self.engine.build()
 
-                elif t == "pressure":
-                    drift = random.uniform(-0.3, 0.3)
-                    new = max(60.0, min(130.0, v + drift))
+        # the engine only produces numbers, the table owns the objects
+        self.points = PointTable(sim_objects)
 
-                elif t == "humidity":
-                    drift = random.uniform(-0.4, 0.4)
-                    new = max(10.0, min(90.0, v + drift))
+        self.drift_task = DriftTask(self, DRIFT_INTERVAL)
+        self.drift_task.install_task()
 
-                # SAVE internally
-                self.sensors[i] = new
 
-                # UPDATE BACnet object’s presentValue
-                ai = self.ai_objects[i]
-                ai.presentValue = Real(new)  # <-- THIS is what Ignition reads
 
-            time.sleep(2)
+    def _drift_step(self):
+        # random walk + clamp for all points at once, only changed
+        # presentValues are written (that's what Ignition reads)
+        self.points.apply(self.engine.tick())
 
 
 
@@ -221,114 +161,59 @@ class FakeBACnetServer(BIPSimpleApplication):
 
             # If writing to AV
             if obj == ('analogValue', 1) and prop == "presentValue":
-                self.av_objects[1].presentValue = float(val)
+                self.av_objects[1].presentValue = Real(val)
 
                 ack = SimpleAckPDU(context=apdu)
                 self.response(ack)
                 return
 
-            # If writing to AI (optional)
-            if obj[0] == "analogInput" and prop == "presentValue":
-                self.sensors[obj[1]] = float(val)
+            # If writing to AI (optional), unknown instances get the stock unknownObject error
+            if obj[0] == "analogInput" and prop == "presentValue" and obj[1] in self.ai_objects:
+                self._write_ai(obj[1], float(val))
                 ack = SimpleAckPDU(context=apdu)
                 self.response(ack)
                 return
 
 
-        if True:
-            super().indication(apdu)
-            return 
-        print(f"received {apdu}")
-        if isinstance(apdu, WhoIsRequest):
-            print(f"📡 Who-Is from {apdu.pduSource}")
-
-            i_am = IAmRequest(
-                iAmDeviceIdentifier=self.localDevice.objectIdentifier,
-                maxAPDULengthAccepted=self.localDevice.maxApduLengthAccepted,
-                segmentationSupported=self.localDevice.segmentationSupported,
-                vendorID=self.localDevice.vendorIdentifier,
-            )
-
-            # ✅ Use the real (ip, port) tuple — not the string
-            dest_ip, dest_port = apdu.pduSource.addrTuple
-            i_am.pduDestination = Address(f"{dest_ip}:{dest_port}")
+        # everything else, including ReadPropertyMultiple, WritePropertyMultiple
+        # and SubscribeCOV / SubscribeCOVProperty, goes to the service capabilities
+        super().indication(apdu)
 
-            print(f"   ↩️  Replying to {dest_ip}:{dest_port}")
-            self.request(i_am)
-            print("✅ I-Am sent")
-
-
-        elif isinstance(apdu, ReadPropertyMultipleRequest):
-            print("📦 RPM received (device does NOT support RPM)")
-
-            from bacpypes.apdu import Error
-            from bacpypes.basetypes import ServicesSupported
-
-            # Proper defined enum values
-            error = Error(
-                errorClass='services',
-                errorCode='serviceRequestDenied',  # VALID enum
-            )
-
-            error.apduSource = apdu.pduSource
-
-            self.response(error)
-            print("❌ Sent proper RPM serviceRequestDenied error")
+    def _write_ai(self, instance, val):
+        # simulated points are forced in the engine (they drift on from
+        # there) and published through the table, the rest directly
+        if instance in self.engine:
+            self.engine.set(instance, val)
+            self.points.apply({instance: val})
+        else:
+            self.ai_objects[instance].presentValue = Real(val)
+
+    def is_writable(self, obj, propertyIdentifier):
+        # point presentValues are read-only to bacpypes, write_property() takes them
+        if obj.objectIdentifier[0] in ("analogInput", "analogValue") and propertyIdentifier == "presentValue":
+            return True
+        return super().is_writable(obj, propertyIdentifier)
+
+    def write_property(self, obj, propertyIdentifier, value, propertyArrayIndex=None, priority=None):
+        # WritePropertyMultiple lands here, points take the same path as a WriteProperty
+        instance = obj.objectIdentifier
+        if instance[0] == "analogValue" and propertyIdentifier == "presentValue":
+            val = float(value)
+            print(f"WRITE: {instance} {propertyIdentifier} = {val}")
+            obj.presentValue = Real(val)
             return
-
-
-        
-
-        elif isinstance(apdu, SubscribeCOVRequest):
-            print(f"🟦 SubscribeCOVRequest from {apdu.pduSource}")
-
-            # Save the subscription (only one subscriber supported for simplicity)
-            self.cov_subscriber = apdu.pduSource
-            self.cov_object = apdu.monitoredObjectIdentifier
-            self.cov_lifetime = apdu.lifetime
-
-            # Must send ACK or Ignition will retry forever
-            ack = SimpleAckPDU(context=apdu)
-            self.response(ack)
-            print("🟩 Sent COV ACK")
+        if instance[0] == "analogInput" and propertyIdentifier == "presentValue":
+            val = float(value)
+            print(f"WRITE: {instance} {propertyIdentifier} = {val}")
+            self._write_ai(instance[1], val)
             return
-
-
-        elif isinstance(apdu, UnconfirmedTextMessageRequest):
-            print(f"💬 UnconfirmedText from {apdu.pduSource}: {apdu.message}")
-        # --- Confirmed services ---
-        elif isinstance(apdu, ReadPropertyRequest):
-            obj_id = apdu.objectIdentifier
-            prop_id = apdu.propertyIdentifier
-            print(f"🔍 ReadProperty from {apdu.pduSource}: {obj_id} {prop_id}")
-
-        if True:
-            super().indication(apdu)
-            return 
-       
-
-        elif isinstance(apdu, WritePropertyRequest):
-            obj_id = apdu.objectIdentifier
-            prop_id = apdu.propertyIdentifier
-            value = apdu.propertyValue.cast_out(Real)
-            print(f"✏️ WriteProperty from {apdu.pduSource}: {obj_id} {prop_id} = {value}")
-            if obj_id[0] == "analogInput" and prop_id == "presentValue":
-                self.sensors[obj_id[1]] = float(value)
-            ack = SimpleAckPDU(context=apdu)
-            self.response(ack)
-
-        elif isinstance(apdu, ConfirmedTextMessageRequest):
-            print(f"📨 ConfirmedText from {apdu.pduSource}: {apdu.message}")
-            ack = SimpleAckPDU(context=apdu)
-            self.response(ack)
-
-        else:
-            print(f"❓ Unknown APDU type: {apdu.__class__.__name__}")
+        return super().write_property(obj, propertyIdentifier, value, propertyArrayIndex, priority)
 
 
 # --------------------------------------------------------------------
-server = FakeBACnetServer(this_device, Address("127.0.0.1:47809"))
-print("🚀 BACnet server running on UDP/47809 ...")
+address = Address(definition["address"])
+server = FakeBACnetServer(this_device, address, definition)
+print(f"🚀 BACnet server running on UDP/{address.addrPort} ...")
 run()
 
 
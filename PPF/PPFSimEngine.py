@@ -0,0 +1,137 @@
+"""
+Vectorized point simulation for PPFServer.
+
+Every simulated point lives in a set of contiguous NumPy arrays (value,
+min, max, drift, type code, last published value) instead of a dict entry
+per sensor.  One step() advances the random walk and clamps the whole
+array at once, then compares against what was last published and only
+hands back the points whose value actually changed.
+
+BACnet Real is a 32 bit float, so "changed" means changed at float32
+resolution (or by more than the point's deadband, if it has one).
+"""
+
+import numpy as np
+
+# type string -> type code, the code is what lives in the array
+TYPE_CODES = {
+    "temperature": 0,
+    "pressure":    1,
+    "humidity":    2,
+}
+
+# default (min, max, drift) per type, drift is the +/- range of one step
+TYPE_DEFAULTS = {
+    "temperature": (10.0, 35.0, 0.05),
+    "pressure":    (60.0, 130.0, 0.3),
+    "humidity":    (10.0, 90.0, 0.4),
+}
+
+
+class SimEngine:
+
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+        # staging lists, turned into arrays by build()
+        self._rows = []
+
+        self.keys = []          # index -> point key (the AI instance)
+        self.index = {}         # point key -> index
+
+        self.value = np.zeros(0)
+        self.published = np.zeros(0, dtype=np.float32)
+
+    def add_point(self, key, sensor_type, value, lo=None, hi=None, drift=None, deadband=0.0):
+        d_lo, d_hi, d_drift = TYPE_DEFAULTS[sensor_type]
+        self._rows.append((
+            key, TYPE_CODES[sensor_type], float(value),
+            d_lo if lo is None else lo,
+            d_hi if hi is None else hi,
+            d_drift if drift is None else drift,
+            deadband,
+        ))
+
+    def build(self):
+        """Freeze the staged points into arrays, call once after add_point()."""
+        rows = self._rows
+        self._rows = []
+
+        self.keys = [r[0] for r in rows]
+        self.index = {key: i for i, key in enumerate(self.keys)}
+
+        self.type_code = np.array([r[1] for r in rows], dtype=np.uint8)
+        self.value = np.array([r[2] for r in rows], dtype=np.float64)
+        self.min = np.array([r[3] for r in rows], dtype=np.float64)
+        self.max = np.array([r[4] for r in rows], dtype=np.float64)
+        self.drift = np.array([r[5] for r in rows], dtype=np.float64)
+        self.deadband = np.array([r[6] for r in rows], dtype=np.float64)
+
+        # what was last handed out as changed
+        self.published = self.value.astype(np.float32)
+
+        # scratch space so a step doesn't allocate
+        self._noise = np.empty_like(self.value)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def step(self):
+        """Advance the random walk one tick, return the indexes that changed."""
+        noise = self._noise
+        self.rng.random(out=noise)
+        noise *= 2.0
+        noise -= 1.0
+        noise *= self.drift
+
+        self.value += noise
+        np.clip(self.value, self.min, self.max, out=self.value)
+
+        current = self.value.astype(np.float32)
+        changed = current != self.published
+        if self.deadband.any():
+            changed &= np.abs(self.value - self.published) >= self.deadband
+
+        idx = np.flatnonzero(changed)
+        self.published[idx] = current[idx]
+        return idx
+
+    def changes(self, idx):
+        """{key: value} for the indexes step() returned, ready for a PointTable."""
+        keys = self.keys
+        return {keys[i]: v for i, v in zip(idx.tolist(), self.published[idx].tolist())}
+
+    def tick(self):
+        return self.changes(self.step())
+
+    def get(self, key):
+        return float(self.value[self.index[key]])
+
+    def set(self, key, value):
+        """Force a point (a WriteProperty from a client), it keeps drifting from there."""
+        i = self.index[key]
+        self.value[i] = value
+        self.published[i] = np.float32(value)
+
+
+if __name__ == "__main__":
+    # quick benchmark: python3 PPF/PPFSimEngine.py [points]
+    import sys
+    import time
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    engine = SimEngine(seed=1)
+    types = list(TYPE_CODES)
+    for i in range(count):
+        engine.add_point(i, types[i % 3], sum(TYPE_DEFAULTS[types[i % 3]][:2]) / 2)
+    engine.build()
+
+    ticks = 20
+    start = time.perf_counter()
+    for _ in range(ticks):
+        changed = engine.step()
+    elapsed = (time.perf_counter() - start) / ticks
+    print(f"{count} points: {elapsed * 1000.0:.2f} ms per step, {len(changed)} changed")
@@ -0,0 +1,130 @@
+# PPFTestCOV.py
+#
+# Subscribe-then-write check against a running device server: subscribe to
+# COV on the test AV, write its presentValue with a WriteProperty and then
+# a WritePropertyMultiple, and expect an ack for each write plus COV
+# notifications carrying the value that was written last.  Exits non-zero
+# if anything is missing.
+#
+#   python3 PPFTestCOV.py                      # PPFServer on 127.0.0.1:47809
+#   python3 PPFTestCOV.py 127.0.0.1:47809 analogValue 1
+
+import sys
+
+from bacpypes.core import run, stop, deferred
+from bacpypes.task import FunctionTask
+from bacpypes.app import BIPSimpleApplication
+from bacpypes.local.device import LocalDeviceObject
+from bacpypes.pdu import Address
+from bacpypes.iocb import IOCB
+from bacpypes.apdu import (
+    SubscribeCOVRequest, WritePropertyRequest,
+    WritePropertyMultipleRequest, WriteAccessSpecification,
+)
+from bacpypes.basetypes import PropertyValue
+from bacpypes.constructeddata import Any
+from bacpypes.primitivedata import Real
+
+target = Address(sys.argv[1] if len(sys.argv) > 1 else "127.0.0.1:47809")
+obj_id = (sys.argv[2], int(sys.argv[3])) if len(sys.argv) > 3 else ("analogValue", 1)
+
+# the servers pace notifications, one per subscription per second
+SETTLE = 3.0
+
+# a request that never completes fails the check instead of hanging it
+DEADLINE = 15.0
+
+device = LocalDeviceObject(
+    objectName="COVTestClient",
+    objectIdentifier=601,
+    maxApduLengthAccepted=1024,
+    segmentationSupported="noSegmentation",
+    vendorIdentifier=15,
+)
+
+
+class COVTestClient(BIPSimpleApplication):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.notifications = []
+
+    def do_UnconfirmedCOVNotificationRequest(self, apdu):
+        for element in apdu.listOfValues:
+            if element.propertyIdentifier == "presentValue":
+                value = element.value.cast_out(Real)
+                print(f"📥 COV {apdu.monitoredObjectIdentifier} presentValue = {value}")
+                self.notifications.append(value)
+
+
+app = COVTestClient(device, Address("127.0.0.1:47832"))
+failures = []
+
+
+def write_property(value):
+    apdu = WritePropertyRequest(objectIdentifier=obj_id, propertyIdentifier="presentValue")
+    apdu.propertyValue = Any(Real(value))
+    return apdu
+
+
+def write_property_multiple(value):
+    return WritePropertyMultipleRequest(listOfWriteAccessSpecs=[
+        WriteAccessSpecification(objectIdentifier=obj_id, listOfProperties=[
+            PropertyValue(propertyIdentifier="presentValue", value=Any(Real(value))),
+        ]),
+    ])
+
+
+steps = [
+    ("SubscribeCOV", SubscribeCOVRequest(
+        subscriberProcessIdentifier=1,
+        monitoredObjectIdentifier=obj_id,
+        issueConfirmedNotifications=False,
+        lifetime=60,
+    )),
+    ("WriteProperty 11.5", write_property(11.5)),
+    ("WritePropertyMultiple 23.25", write_property_multiple(23.25)),
+]
+
+
+def check():
+    if not app.notifications:
+        failures.append("no COV notifications")
+    elif app.notifications[-1] != 23.25:
+        failures.append(f"last COV notification {app.notifications[-1]}, expected 23.25")
+    stop()
+
+
+def expired():
+    failures.append(f"no result after {DEADLINE:.0f} s")
+    stop()
+
+
+def step(i=0):
+    if i == len(steps):
+        FunctionTask(check).install_task(delta=SETTLE)
+        return
+
+    label, apdu = steps[i]
+    apdu.pduDestination = target
+    iocb = IOCB(apdu)
+
+    def done(iocb):
+        if iocb.ioError is not None:
+            print(f"❌ {label}: {iocb.ioError}")
+            failures.append(label)
+        else:
+            print(f"✅ {label}: {iocb.ioResponse.__class__.__name__}")
+        deferred(step, i + 1)
+
+    iocb.add_callback(done)
+    app.request_io(iocb)
+
+
+deferred(step)
+deferred(FunctionTask(expired).install_task, delta=DEADLINE)
+run()
+
+if failures:
+    print(f"❌ {len(failures)} failed: {', '.join(failures)}")
+    sys.exit(1)
+print(f"✅ subscribe-then-write OK, {len(app.notifications)} COV notifications")
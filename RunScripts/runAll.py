@@ -1,40 +1,317 @@
-import subprocess
+import argparse
 import os
 import signal
+import subprocess
 import sys
 import time
 
 BASE = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
-commands = [
-    ["python3", os.path.join(BASE, "PPF/PPFServer.py")],
-    ["python3", os.path.join(BASE, "padADriver/PadAListener.py")],
-    ["python3", os.path.join(BASE, "padADriver/PadAServer.py")],
+# Supervisor for every service of the bench.  Each service is declared once
+# below: what to run, which CPUs it may use, how to tell it's ready and what
+# it has to wait for.  Crashed children are restarted with exponential
+# backoff, and every REPORT_INTERVAL seconds one table with RSS / CPU / UDP
+# drops per child is printed (all read from /proc, Linux only).
+#
+#   python3 RunScripts/runAll.py --listener-cpus 0
+
+# cpus: "ingest" is the listener's core set, "devices" is everything else
+SERVICES = [
+    {
+        "name": "PadAListener",
+        "cmd": [sys.executable, os.path.join(BASE, "padADriver/PadAListener.py")],
+        "cpus": "ingest",
+        "ready": ("tcp", 9000),
+        "after": [],
+    },
+    {
+        "name": "PPFServer",
+        "cmd": [sys.executable, os.path.join(BASE, "PPF/PPFServer.py")],
+        "cpus": "devices",
+        "ready": ("udp", 47809),
+        "after": [],
+    },
+    {
+        "name": "PadAServer",
+        "cmd": [sys.executable, os.path.join(BASE, "padADriver/PadAServer.py")],
+        "cpus": "devices",
+        "ready": ("udp", 47810),
+        "after": ["PadAListener"],
+    },
 ]
 
-procs = []
+# restart delay doubles per crash, back to BACKOFF_BASE after a stable run
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+STABLE_AFTER = 30.0
+
+# a child that isn't ready by then is killed and counts as a crash
+READY_TIMEOUT = 30.0
+
+POLL_INTERVAL = 0.5
+REPORT_INTERVAL = 10.0
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+# --------------------------------------------------------------------
+# /proc sampling
+def read_cpu_ticks(pid):
+    """utime + stime of a process, in clock ticks."""
+    with open("/proc/%d/stat" % pid) as f:
+        stat = f.read()
+    # the command name is in parens and may contain spaces
+    fields = stat[stat.rindex(")") + 2:].split()
+    return int(fields[11]) + int(fields[12])
+
+
+def read_rss(pid):
+    """Resident set size in bytes."""
+    with open("/proc/%d/statm" % pid) as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def socket_inodes(pid):
+    inodes = set()
+    fd_dir = "/proc/%d/fd" % pid
+    for fd in os.listdir(fd_dir):
+        try:
+            target = os.readlink(os.path.join(fd_dir, fd))
+        except OSError:
+            continue
+        if target.startswith("socket:["):
+            inodes.add(int(target[8:-1]))
+    return inodes
+
+
+def read_udp_table():
+    """inode -> (local port, drops) for every UDP socket on the box."""
+    table = {}
+    for path in ("/proc/net/udp", "/proc/net/udp6"):
+        try:
+            with open(path) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    port = int(fields[1].rsplit(":", 1)[1], 16)
+                    table[int(fields[9])] = (port, int(fields[12]))
+        except OSError:
+            pass
+    return table
+
+
+def udp_port_bound(port):
+    return any(p == port for p, _ in read_udp_table().values())
+
+
+TCP_LISTEN = "0A"
+
+
+def tcp_port_listening(port):
+    """True if some socket on the box listens on the TCP port, read from
+    /proc/net/tcp so the check doesn't show up as a client connection."""
+    for path in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(path) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    if fields[3] == TCP_LISTEN and int(fields[1].rsplit(":", 1)[1], 16) == port:
+                        return True
+        except OSError:
+            pass
+    return False
+
+
+# --------------------------------------------------------------------
+# One supervised child
+class Service:
 
-def shutdown(signum, frame):
-    print("\n🛑 Shutting down all subprocesses...")
-    for p in procs:
+    def __init__(self, spec, cpus):
+        self.name = spec["name"]
+        self.cmd = spec["cmd"]
+        self.ready_check = spec.get("ready")
+        self.after = spec.get("after", [])
+        self.cpus = cpus
+
+        self.proc = None
+        self.state = "waiting"      # waiting, starting, ready, backoff, stopped
+        self.started_at = 0.0
+        self.next_start = 0.0
+        self.failures = 0
+        self.restarts = 0
+
+        # previous cpu sample, for a percentage between reports
+        self.cpu_sample = None
+
+    def _preexec(self):
+        # own process group so Ctrl-C on the supervisor doesn't hit it twice,
+        # pinned before exec so every thread the child starts inherits it
+        os.setsid()
+        if self.cpus and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.cpus)
+
+    def start(self):
+        self.proc = subprocess.Popen(self.cmd, preexec_fn=self._preexec)
+        self.started_at = time.monotonic()
+        self.cpu_sample = None
+        self.state = "starting"
+        print(f"▶️  {self.name} started (pid {self.proc.pid}, cpus {sorted(self.cpus) if self.cpus else 'any'})")
+
+    def is_ready(self):
+        if self.ready_check is None:
+            return True
+        kind, port = self.ready_check
+        if kind == "tcp":
+            return tcp_port_listening(port)
+        if kind == "udp":
+            return udp_port_bound(port)
+        raise ValueError("unknown readiness check: %r" % (kind,))
+
+    def crashed(self, reason):
+        now = time.monotonic()
+        if now - self.started_at >= STABLE_AFTER:
+            self.failures = 0
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** self.failures)
+        self.failures += 1
+        self.restarts += 1
+        self.proc = None
+        self.state = "backoff"
+        self.next_start = now + delay
+        print(f"💥 {self.name} {reason}, restarting in {delay:.0f}s")
+
+    def kill(self, sig=signal.SIGINT):
+        if self.proc is None or self.proc.poll() is not None:
+            return
         try:
-            os.killpg(os.getpgid(p.pid), signal.SIGINT)
-        except Exception:
+            os.killpg(self.proc.pid, sig)
+        except ProcessLookupError:
             pass
-    sys.exit(0)
 
-signal.signal(signal.SIGINT, shutdown)
-signal.signal(signal.SIGTERM, shutdown)
 
-for cmd in commands:
-    p = subprocess.Popen(
-        cmd,
-        preexec_fn=os.setsid   # 🔑 creates new process group
-    )
-    procs.append(p)
+# --------------------------------------------------------------------
+# Supervisor
+class Supervisor:
+
+    def __init__(self, services):
+        self.services = services
+        self.by_name = {s.name: s for s in services}
+        self.running = True
+        self.last_report = time.monotonic()
+
+    def deps_ready(self, service):
+        return all(self.by_name[name].state == "ready" for name in service.after)
+
+    def step(self):
+        now = time.monotonic()
+        for s in self.services:
+            if s.state in ("starting", "ready"):
+                code = s.proc.poll()
+                if code is not None:
+                    s.crashed(f"exited with code {code}")
+                    continue
+
+            if s.state == "waiting" and self.deps_ready(s):
+                s.start()
+
+            elif s.state == "starting":
+                if s.is_ready():
+                    s.state = "ready"
+                    print(f"✅ {s.name} ready after {now - s.started_at:.1f}s")
+                elif now - s.started_at > READY_TIMEOUT:
+                    s.kill(signal.SIGKILL)
+                    s.proc.wait()
+                    s.crashed(f"not ready after {READY_TIMEOUT:.0f}s")
+
+            elif s.state == "backoff" and now >= s.next_start:
+                # dependents keep running, but a restart still waits for its own dependencies
+                s.state = "waiting"
+
+        if now - self.last_report >= REPORT_INTERVAL:
+            self.report(now - self.last_report)
+            self.last_report = now
+
+    def report(self, elapsed):
+        udp = read_udp_table()
+        print(f"{'service':<14}{'pid':>8} {'state':<9}{'restarts':>9}{'cpus':>10}{'rss MB':>9}{'cpu %':>8}{'udp drops':>11}")
+        for s in self.services:
+            pid = s.proc.pid if s.proc is not None else None
+            rss = cpu = drops = None
+            if pid is not None:
+                try:
+                    rss = read_rss(pid) / (1024.0 * 1024.0)
+                    ticks = read_cpu_ticks(pid)
+                    if s.cpu_sample is not None:
+                        cpu = 100.0 * (ticks - s.cpu_sample) / CLOCK_TICKS / elapsed
+                    s.cpu_sample = ticks
+                    drops = sum(udp[i][1] for i in socket_inodes(pid) if i in udp)
+                except OSError:
+                    # exited between poll() and now, the next step notices
+                    pass
+
+            cpus = ",".join(str(c) for c in sorted(s.cpus)) if s.cpus else "any"
+            print(f"{s.name:<14}{pid if pid else '-':>8} {s.state:<9}{s.restarts:>9}{cpus:>10}"
+                  f"{'-' if rss is None else f'{rss:.1f}':>9}"
+                  f"{'-' if cpu is None else f'{cpu:.1f}':>8}"
+                  f"{'-' if drops is None else drops:>11}")
+
+    def run(self):
+        while self.running:
+            self.step()
+            time.sleep(POLL_INTERVAL)
+
+    def shutdown(self):
+        print("\n🛑 Shutting down all subprocesses...")
+        self.running = False
+        for s in self.services:
+            s.kill()
+        deadline = time.monotonic() + 5.0
+        for s in self.services:
+            if s.proc is None:
+                continue
+            try:
+                s.proc.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                s.kill(signal.SIGKILL)
+                s.proc.wait()
+
+
+def cpu_sets(listener_cpus):
+    """Split the CPUs we may use into the ingest set and the device set."""
+    available = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else set()
+    ingest = set(listener_cpus) & available
+    devices = available - ingest
+    if not ingest or not devices:
+        # too few cores to keep them apart, don't pin at all
+        return {"ingest": set(), "devices": set()}
+    return {"ingest": ingest, "devices": devices}
+
+
+def main():
+    global REPORT_INTERVAL
+
+    parser = argparse.ArgumentParser(description="Start and supervise every BACnet bench service")
+    parser.add_argument("--listener-cpus", default="0",
+                        help="comma separated CPUs reserved for the ingest listener, the devices get the rest")
+    parser.add_argument("--report-interval", type=float, default=REPORT_INTERVAL,
+                        help="seconds between resource reports")
+    args = parser.parse_args()
+    REPORT_INTERVAL = args.report_interval
+
+    sets = cpu_sets(int(c) for c in args.listener_cpus.split(",") if c.strip())
+    supervisor = Supervisor([Service(spec, sets[spec["cpus"]]) for spec in SERVICES])
+
+    def shutdown(signum, frame):
+        supervisor.shutdown()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    print("🚀 Supervising all services. Press Ctrl-C to stop.")
+    supervisor.run()
 
-print("🚀 All services running. Press Ctrl-C to stop.")
 
-# Keep parent alive
-while True:
-    time.sleep(1)
+if __name__ == "__main__":
+    main()
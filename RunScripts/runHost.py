@@ -0,0 +1,122 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+BASE = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(BASE)
+
+from bacpypes import core, aiocore
+from bacpypes.settings import os_settings
+from bacpypes.task import RecurringTask
+from bacpypes.local.device import LocalDeviceObject
+from bacpypes.object import AnalogInputObject
+from bacpypes.primitivedata import CharacterString, Enumerated, Unsigned, Real, Boolean
+from bacpypes.basetypes import StatusFlags, EventTransitionBits, EngineeringUnits, EventState
+
+from Common.DeviceHost import DeviceHost
+from Common.PointTable import PointTable
+
+# Host mode: N simulated devices in ONE process, behind a virtual router on
+# one UDP port.  Point Ignition at the router address, the devices show up
+# as remote stations on the virtual network (see Common/DeviceHost.py).
+#
+#   python3 RunScripts/runHost.py --devices 500 --points 10
+
+
+def make_device(instance):
+    return LocalDeviceObject(
+        objectIdentifier=('device', instance),
+        objectName=f'SimDevice{instance}',
+        systemStatus=Enumerated(0),  # operational
+        vendorName=CharacterString('VSA'),
+        vendorIdentifier=999,
+        modelName=CharacterString('MDE Simulated Device'),
+        firmwareRevision=CharacterString('2.0'),
+        applicationSoftwareVersion=CharacterString('2.0'),
+        protocolVersion=Unsigned(1),
+        protocolRevision=Unsigned(22),
+        maxApduLengthAccepted=Unsigned(1024),
+        segmentationSupported=Enumerated(3),  # noSegmentation = 3
+        databaseRevision=Unsigned(1),
+    )
+
+
+def make_points(count):
+    points = {}
+    for inst in range(1, count + 1):
+        points[inst] = AnalogInputObject(
+            objectIdentifier=('analogInput', inst),
+            objectName=f"Temperature Sensor {inst}",
+            presentValue=Real(random.uniform(18.0, 24.0)),
+            statusFlags=StatusFlags([0, 0, 0, 0]),
+            eventState=EventState(0),
+            eventEnable=EventTransitionBits([0, 0, 0]),
+            ackedTransitions=EventTransitionBits([0, 0, 0]),
+            outOfService=Boolean(False),
+            notificationClass=Unsigned(0),
+            notifyType=1,
+            units=EngineeringUnits(62),  # degreesCelsius
+            covIncrement=Real(0.1),
+        )
+    return points
+
+
+class DriftTask(RecurringTask):
+    """One task drives every hosted point, instead of a thread per device."""
+
+    def __init__(self, tables, interval):
+        RecurringTask.__init__(self, interval)
+        self.tables = tables
+
+    def process_task(self):
+        for table in self.tables:
+            values = {}
+            for inst in table.objects:
+                values[inst] = max(10.0, min(35.0, table.value(inst) + random.uniform(-0.05, 0.05)))
+            table.apply(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many simulated BACnet devices in one process")
+    parser.add_argument("--address", default="127.0.0.1:47820", help="router BACnet/IP address")
+    parser.add_argument("--network", type=int, default=1, help="network number of the BIP side")
+    parser.add_argument("--vlan-network", type=int, default=100, help="network number of the virtual side")
+    parser.add_argument("--devices", type=int, default=100, help="number of simulated devices")
+    parser.add_argument("--points", type=int, default=10, help="analog inputs per device")
+    parser.add_argument("--base-instance", type=int, default=10000, help="first device instance number")
+    parser.add_argument("--interval", type=int, default=2000, help="drift interval in milliseconds")
+    parser.add_argument("--core", choices=("asyncore", "asyncio"), default="asyncore",
+                        help="event loop the stack runs on")
+    args = parser.parse_args()
+    if args.devices < 1:
+        parser.error("--devices must be at least 1")
+
+    # BACPYPES_UDP_RCVBUF / BACPYPES_UDP_SNDBUF size the router's socket
+    os_settings()
+
+    start = time.time()
+    host = DeviceHost(args.address, args.network, args.vlan_network)
+
+    tables = []
+    for n in range(args.devices):
+        device = make_device(args.base_instance + n)
+        points = make_points(args.points)
+        host.add_device(device, points.values())
+        tables.append(PointTable(points))
+
+    DriftTask(tables, args.interval).install_task()
+    host.announce()
+
+    first, last = host.apps[0], host.apps[-1]
+    print(f"🚀 {args.devices} devices x {args.points} points on {args.address} "
+          f"(network {args.network} -> {args.vlan_network}) in {time.time() - start:.2f}s")
+    print(f"   device {first.localDevice.objectIdentifier[1]} at {host.remote_address(first)} ... "
+          f"device {last.localDevice.objectIdentifier[1]} at {host.remote_address(last)}")
+
+    (aiocore if args.core == "asyncio" else core).run()
+
+
+if __name__ == "__main__":
+    main()
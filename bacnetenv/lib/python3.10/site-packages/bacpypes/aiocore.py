@@ -0,0 +1,291 @@
+#!/usr/bin/python
+
+"""
+Asyncio Core
+
+An alternative to core.run() that runs the task manager, the deferred
+functions and the socket I/O on an asyncio event loop instead of spinning
+asyncore.loop().  Nothing else in the stack changes, applications, SAPs and
+directors are built exactly as before and then
+
+    from bacpypes.aiocore import run
+    run()
+
+or, to share the loop with other asyncio code in the same process,
+
+    await bacpypes.aiocore.serve()
+
+which returns when core.stop() is called.  Any event loop works, install
+the uvloop policy before calling run() to get uvloop.
+
+UDP directors are taken off the asyncore map and their socket is handed to
+the loop as a datagram endpoint, it is closed when serve() returns.
+Everything else still in the asyncore map (TCP directors, the task manager
+trigger, consoles) is watched with add_reader() and add_writer() and
+serviced by the dispatcher methods it already has.
+"""
+
+import asyncio
+import asyncore
+import signal
+import threading
+import warnings
+
+from . import core
+from .core import stop, print_stack, SPIN
+from .task import TaskManager
+from .pdu import PDU
+from .udp import UDPDirector
+from .debugging import bacpypes_debugging, ModuleLogger
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+# due tasks processed in one go before the loop gets to look at sockets
+MAX_TASKS_PER_PASS = 100
+
+#
+#   UDPProtocol
+#
+
+@bacpypes_debugging
+class UDPProtocol(asyncio.DatagramProtocol):
+
+    """Datagram endpoint for a UDPDirector, incoming datagrams go up the
+    stack right away rather than through a deferred function."""
+
+    def __init__(self, director, bridge):
+        if _debug: UDPProtocol._debug("__init__ %r %r", director, bridge)
+        self.director = director
+        self.bridge = bridge
+
+    def connection_made(self, transport):
+        if _debug: UDPProtocol._debug("connection_made %r", transport)
+        director = self.director
+        director.transport = transport
+
+        # anything queued before the loop took over goes out now
+        while not director.request.empty():
+            director.send(director.request.get())
+
+    def datagram_received(self, data, addr):
+        if _debug: UDPProtocol._debug("datagram_received %d octets from %r", len(data), addr)
+        self.director.received += 1
+        try:
+            self.director._response(PDU(data, source=addr))
+        except Exception as err:
+            UDPProtocol._exception("an error has occurred: %s", err)
+        self.bridge.wakeup()
+
+    def error_received(self, exc):
+        if _debug: UDPProtocol._debug("error_received %r", exc)
+        self.director.handle_error(exc)
+
+    def connection_lost(self, exc):
+        if _debug: UDPProtocol._debug("connection_lost %r", exc)
+        self.director.transport = None
+
+#
+#   _Bridge
+#
+
+@bacpypes_debugging
+class _Bridge:
+
+    """Drives the task manager and deferred functions from the loop and
+    keeps the loop's readers and writers in step with the asyncore map."""
+
+    def __init__(self, loop, spin):
+        if _debug: _Bridge._debug("__init__ %r %r", loop, spin)
+        self.loop = loop
+        self.spin = spin
+
+        self.done = loop.create_future()
+        self.soon = None                # pending call_soon() of pump
+        self.timer = None               # pending call_later() of pump
+
+        self.readers = {}               # fd -> dispatcher
+        self.writers = {}               # fd -> dispatcher
+        self.directors = set()
+
+    def wakeup(self):
+        """Run a pass of the tasks and deferred functions soon."""
+        if self.soon is None:
+            self.soon = self.loop.call_soon(self.pump)
+
+    def pump(self):
+        self.soon = None
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        taskManager = core.taskManager
+        delta = None
+        try:
+            for _ in range(MAX_TASKS_PER_PASS):
+                task, delta = taskManager.get_next_task()
+                if task:
+                    taskManager.process_task(task)
+
+                # deferred functions queued by the task (or by anything
+                # since the last pass)
+                while core.deferredFns:
+                    fnlist = core.deferredFns
+                    core.deferredFns = []
+                    for fn, args, kwargs in fnlist:
+                        fn(*args, **kwargs)
+
+                if not task:
+                    break
+            else:
+                # still more due, let the sockets have a turn first
+                delta = 0.0
+
+        except KeyboardInterrupt:
+            if _debug: _Bridge._info("keyboard interrupt")
+            core.running = False
+        except Exception as err:
+            _Bridge._exception("an error has occurred: %s", err)
+            delta = 0.0
+
+        if not core.running:
+            self.close()
+            return
+
+        self.sync()
+
+        # wake up for the next task, never sleep longer than spin so a
+        # platform without a trigger still notices other threads
+        if delta is None:
+            delta = self.spin
+        if core.deferredFns or delta <= 0.0:
+            self.wakeup()
+        else:
+            self.timer = self.loop.call_later(min(delta, self.spin), self.pump)
+
+    def sync(self):
+        """Adopt new UDP directors, then watch whatever is left in the
+        asyncore map the way asyncore.poll() would."""
+        socket_map = asyncore.socket_map
+
+        for fd, obj in list(socket_map.items()):
+            if isinstance(obj, UDPDirector) and obj not in self.directors:
+                self.adopt(obj)
+
+        for fd, obj in list(socket_map.items()):
+            want_read = obj.readable()
+            want_write = obj.writable() and not obj.accepting
+
+            if want_read and fd not in self.readers:
+                self.loop.add_reader(fd, self.on_readable, obj)
+                self.readers[fd] = obj
+            elif not want_read and fd in self.readers:
+                self.loop.remove_reader(fd)
+                del self.readers[fd]
+
+            if want_write and fd not in self.writers:
+                self.loop.add_writer(fd, self.on_writable, obj)
+                self.writers[fd] = obj
+            elif not want_write and fd in self.writers:
+                self.loop.remove_writer(fd)
+                del self.writers[fd]
+
+        # dispatchers that have been closed
+        for watched, remove in ((self.readers, self.loop.remove_reader), (self.writers, self.loop.remove_writer)):
+            for fd, obj in list(watched.items()):
+                if socket_map.get(fd) is not obj:
+                    remove(fd)
+                    del watched[fd]
+
+    def adopt(self, director):
+        if _debug: _Bridge._debug("adopt %r", director)
+        self.directors.add(director)
+
+        # asyncore lets go of the socket, the loop takes it
+        director.del_channel()
+        self.loop.create_task(self.loop.create_datagram_endpoint(
+            lambda: UDPProtocol(director, self), sock=director.socket,
+            ))
+
+    def on_readable(self, obj):
+        asyncore.read(obj)
+        self.wakeup()
+
+    def on_writable(self, obj):
+        asyncore.write(obj)
+        self.wakeup()
+
+    def close(self):
+        if _debug: _Bridge._debug("close")
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        for fd in self.readers:
+            self.loop.remove_reader(fd)
+        for fd in self.writers:
+            self.loop.remove_writer(fd)
+        self.readers.clear()
+        self.writers.clear()
+
+        # the transports own the sockets now, they go with the loop
+        for director in self.directors:
+            if director.transport is not None:
+                director.transport.close()
+        self.directors.clear()
+
+        if not self.done.done():
+            self.done.set_result(None)
+
+#
+#   serve
+#
+
+@bacpypes_debugging
+async def serve(spin=SPIN):
+    """Run the stack on the running event loop until core.stop()."""
+    if _debug: serve._debug("serve spin=%r", spin)
+
+    # reference the task manager (a singleton), deferred() and stop() use
+    # its trigger to wake the loop, from other threads too
+    core.taskManager = TaskManager()
+    core.running = True
+
+    bridge = _Bridge(asyncio.get_running_loop(), spin)
+    bridge.wakeup()
+    try:
+        await bridge.done
+    finally:
+        core.running = False
+        bridge.close()
+
+#
+#   run
+#
+
+@bacpypes_debugging
+def run(spin=SPIN, sigterm=stop, sigusr1=print_stack, loop=None):
+    """Like core.run(), on a new event loop unless one is given."""
+    if _debug: run._debug("run spin=%r sigterm=%r sigusr1=%r loop=%r", spin, sigterm, sigusr1, loop)
+
+    # install the signal handlers if they have been provided (issue #112)
+    if isinstance(threading.current_thread(), threading._MainThread):
+        if (sigterm is not None) and hasattr(signal, 'SIGTERM'):
+            signal.signal(signal.SIGTERM, sigterm)
+        if (sigusr1 is not None) and hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, sigusr1)
+    elif sigterm or sigusr1:
+        warnings.warn("no signal handlers for child threads")
+
+    own_loop = loop is None
+    if own_loop:
+        loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(serve(spin))
+    except KeyboardInterrupt:
+        if _debug: run._info("keyboard interrupt")
+    finally:
+        core.running = False
+        if own_loop:
+            loop.close()
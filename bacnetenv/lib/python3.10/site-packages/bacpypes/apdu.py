@@ -276,11 +276,9 @@ class APCI(PCI, DebugContents):
                 self.apduSeq = pdu.get()
                 self.apduWin = pdu.get()
             self.apduService = pdu.get()
-            self.pduData = pdu.pduData
 
         elif (self.apduType == UnconfirmedRequestPDU.pduType):
             self.apduService = pdu.get()
-            self.pduData = pdu.pduData
 
         elif (self.apduType == SimpleAckPDU.pduType):
             self.apduInvokeID = pdu.get()
@@ -294,7 +292,6 @@ class APCI(PCI, DebugContents):
                 self.apduSeq = pdu.get()
                 self.apduWin = pdu.get()
             self.apduService = pdu.get()
-            self.pduData = pdu.pduData
 
         elif (self.apduType == SegmentAckPDU.pduType):
             self.apduNak = ((buff & 0x02) != 0)
@@ -306,7 +303,6 @@ class APCI(PCI, DebugContents):
         elif (self.apduType == ErrorPDU.pduType):
             self.apduInvokeID = pdu.get()
             self.apduService = pdu.get()
-            self.pduData = pdu.pduData
 
         elif (self.apduType == RejectPDU.pduType):
             self.apduInvokeID = pdu.get()
@@ -316,7 +312,6 @@ class APCI(PCI, DebugContents):
             self.apduSrv = ((buff & 0x01) != 0)
             self.apduInvokeID = pdu.get()
             self.apduAbortRejectReason = pdu.get()
-            self.pduData = pdu.pduData
 
         else:
             raise DecodingError("invalid APDU type")
@@ -373,13 +368,15 @@ class APDU(APCI, PDUData):
     def encode(self, pdu):
         if _debug: APDU._debug("encode %s", str(pdu))
         APCI.encode(self, pdu)
-        pdu.put_data(self.pduData)
+        pdu.put_payload(self)
 
     def decode(self, pdu):
         if _debug: APDU._debug("decode %s", str(pdu))
 
         APCI.decode(self, pdu)
-        self.pduData = pdu.get_data(len(pdu.pduData))
+
+        # the rest is the service data, shared with pdu rather than copied
+        self.take_data(pdu)
 
     def apdu_contents(self, use_dict=None, as_class=dict):
         return PDUData.pdudata_contents(self, use_dict=use_dict, as_class=as_class)
@@ -416,13 +413,13 @@ class _APDU(APDU):
         if _debug: _APDU._debug("encode %r", pdu)
 
         APCI.update(pdu, self)
-        pdu.put_data(self.pduData)
+        pdu.put_payload(self)
 
     def decode(self, pdu):
         if _debug: _APDU._debug("decode %r", pdu)
 
         APCI.update(self, pdu)
-        self.pduData = pdu.get_data(len(pdu.pduData))
+        self.take_data(pdu)
 
     def set_context(self, context):
         if _debug: _APDU._debug("set_context %r", context)
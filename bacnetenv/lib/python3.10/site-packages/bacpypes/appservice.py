@@ -203,9 +203,12 @@ class SSM(OneShotTask, DebugContents):
             segAPDU.apduSeg = False
             segAPDU.apduMor = False
 
-        # add the content
-        offset = indx * self.segmentSize
-        segAPDU.put_data( self.segmentAPDU.pduData[offset:offset+self.segmentSize] )
+        # add the content, the whole thing goes through without a copy
+        if (self.segmentCount == 1):
+            segAPDU.put_payload(self.segmentAPDU)
+        else:
+            offset = indx * self.segmentSize
+            segAPDU.put_data( self.segmentAPDU.data_view()[offset:offset+self.segmentSize] )
 
         # success
         return segAPDU
@@ -220,7 +223,7 @@ class SSM(OneShotTask, DebugContents):
             raise RuntimeError("no segmentation context established")
 
         # append the data
-        self.segmentAPDU.put_data(apdu.pduData)
+        self.segmentAPDU.put_payload(apdu)
 
     def in_window(self, seqA, seqB):
         if _debug: SSM._debug("in_window %r %r", seqA, seqB)
@@ -276,7 +279,7 @@ class ClientSSM(SSM):
         # when completed or aborted, remove tracking
         if (newState == COMPLETED) or (newState == ABORTED):
             if _debug: ClientSSM._debug("    - remove from active transactions")
-            self.ssmSAP.clientTransactions.remove(self)
+            self.ssmSAP.remove_client_transaction(self)
 
             # release the device info
             if self.device_info:
@@ -328,12 +331,12 @@ class ClientSSM(SSM):
         if _debug: ClientSSM._debug("    - invoke ID: %r", self.invokeID)
 
         # compute the segment count
-        if not apdu.pduData:
+        if not apdu.remaining():
             # always at least one segment
             self.segmentCount = 1
         else:
             # split into chunks, maybe need one more
-            self.segmentCount, more = divmod(len(apdu.pduData), self.segmentSize)
+            self.segmentCount, more = divmod(apdu.remaining(), self.segmentSize)
             if more:
                 self.segmentCount += 1
         if _debug: ClientSSM._debug("    - segment count: %r", self.segmentCount)
@@ -712,7 +715,7 @@ class ServerSSM(SSM):
         # when completed or aborted, remove tracking
         if (newState == COMPLETED) or (newState == ABORTED):
             if _debug: ServerSSM._debug("    - remove from active transactions")
-            self.ssmSAP.serverTransactions.remove(self)
+            del self.ssmSAP.serverTransactions[(self.pdu_address, self.invokeID)]
 
             # release the device info
             if self.device_info:
@@ -805,12 +808,12 @@ class ServerSSM(SSM):
             if _debug: ServerSSM._debug("    - segment size: %r", self.segmentSize)
 
             # compute the segment count
-            if not apdu.pduData:
+            if not apdu.remaining():
                 # always at least one segment
                 self.segmentCount = 1
             else:
                 # split into chunks, maybe need one more
-                self.segmentCount, more = divmod(len(apdu.pduData), self.segmentSize)
+                self.segmentCount, more = divmod(apdu.remaining(), self.segmentSize)
                 if more:
                     self.segmentCount += 1
             if _debug: ServerSSM._debug("    - segment count: %r", self.segmentCount)
@@ -1132,6 +1135,10 @@ class ServerSSM(SSM):
 #   StateMachineAccessPoint
 #
 
+# peers whose next invoke ID is remembered after their last transaction,
+# past this the least recently used ones start over from 1
+MAX_INVOKE_ID_PEERS = 4096
+
 @bacpypes_debugging
 class StateMachineAccessPoint(Client, ServiceAccessPoint):
 
@@ -1146,12 +1153,14 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
         self.localDevice = localDevice
         self.deviceInfoCache = deviceInfoCache
 
-        # client settings
-        self.nextInvokeID = 1
-        self.clientTransactions = []
+        # client settings, transactions are keyed by (peer address, invoke ID)
+        # and invoke IDs are allocated per peer
+        self.clientTransactions = {}
+        self.clientInvokeIDs = {}           # peer address -> invoke IDs in use
+        self.nextInvokeIDs = {}             # peer address -> next invoke ID to try, least recently used first
 
-        # server settings
-        self.serverTransactions = []
+        # server settings, keyed the same way
+        self.serverTransactions = {}
 
         # confirmed request defaults
         self.numberOfApduRetries = 3
@@ -1175,23 +1184,56 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
         """Called by clients to get an unused invoke ID."""
         if _debug: StateMachineAccessPoint._debug("get_next_invoke_id")
 
-        initialID = self.nextInvokeID
-        while 1:
-            invokeID = self.nextInvokeID
-            self.nextInvokeID = (self.nextInvokeID + 1) % 256
+        # each peer has its own 256 invoke IDs
+        inUse = self.clientInvokeIDs.get(addr, ())
+        if len(inUse) >= 256:
+            raise RuntimeError("no available invoke ID")
 
-            # see if we've checked for them all
-            if initialID == self.nextInvokeID:
-                raise RuntimeError("no available invoke ID")
+        # keep going round so a late answer to an old request is not
+        # mistaken for the answer to a new one, the peer moves to the end
+        nextInvokeIDs = self.nextInvokeIDs
+        invokeID = nextInvokeIDs.pop(addr, 1)
+        while invokeID in inUse:
+            invokeID = (invokeID + 1) % 256
+        nextInvokeIDs[addr] = (invokeID + 1) % 256
 
-            for tr in self.clientTransactions:
-                if (invokeID == tr.invokeID) and (addr == tr.pdu_address):
-                    break
-            else:
-                break
+        # a client talking to many short lived peers doesn't keep them all
+        if len(nextInvokeIDs) > MAX_INVOKE_ID_PEERS:
+            self.forget_invoke_ids()
 
         return invokeID
 
+    def forget_invoke_ids(self):
+        """Drop the least recently used quarter of the next invoke IDs of
+        peers that have nothing outstanding."""
+        if _debug: StateMachineAccessPoint._debug("forget_invoke_ids")
+
+        excess = len(self.nextInvokeIDs) - (MAX_INVOKE_ID_PEERS * 3) // 4
+        for addr in list(self.nextInvokeIDs):
+            if excess <= 0:
+                break
+            if addr not in self.clientInvokeIDs:
+                del self.nextInvokeIDs[addr]
+                excess -= 1
+
+    def add_client_transaction(self, tr):
+        """Track a new client transaction, its invoke ID is in use."""
+        if _debug: StateMachineAccessPoint._debug("add_client_transaction %r", tr)
+
+        self.clientTransactions[(tr.pdu_address, tr.invokeID)] = tr
+        self.clientInvokeIDs.setdefault(tr.pdu_address, set()).add(tr.invokeID)
+
+    def remove_client_transaction(self, tr):
+        """The client transaction is done, free its invoke ID."""
+        if _debug: StateMachineAccessPoint._debug("remove_client_transaction %r", tr)
+
+        del self.clientTransactions[(tr.pdu_address, tr.invokeID)]
+
+        inUse = self.clientInvokeIDs[tr.pdu_address]
+        inUse.discard(tr.invokeID)
+        if not inUse:
+            del self.clientInvokeIDs[tr.pdu_address]
+
     def confirmation(self, pdu):
         """Packets coming up the stack are APDU's."""
         if _debug: StateMachineAccessPoint._debug("confirmation %r", pdu)
@@ -1225,15 +1267,15 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
 
         if isinstance(apdu, ConfirmedRequestPDU):
             # find duplicates of this request
-            for tr in self.serverTransactions:
-                if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduSource == tr.pdu_address):
-                    break
-            else:
+            key = (apdu.pduSource, apdu.apduInvokeID)
+            tr = self.serverTransactions.get(key)
+            if tr is None:
                 # build a server transaction
                 tr = ServerSSM(self, apdu.pduSource)
+                tr.invokeID = apdu.apduInvokeID
 
                 # add it to our transactions to track it
-                self.serverTransactions.append(tr)
+                self.serverTransactions[key] = tr
 
             # let it run with the apdu
             tr.indication(apdu)
@@ -1248,10 +1290,8 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
             or isinstance(apdu, RejectPDU):
 
             # find the client transaction this is acking
-            for tr in self.clientTransactions:
-                if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduSource == tr.pdu_address):
-                    break
-            else:
+            tr = self.clientTransactions.get((apdu.pduSource, apdu.apduInvokeID))
+            if tr is None:
                 return
 
             # send the packet on to the transaction
@@ -1260,19 +1300,15 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
         elif isinstance(apdu, AbortPDU):
             # find the transaction being aborted
             if apdu.apduSrv:
-                for tr in self.clientTransactions:
-                    if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduSource == tr.pdu_address):
-                        break
-                else:
+                tr = self.clientTransactions.get((apdu.pduSource, apdu.apduInvokeID))
+                if tr is None:
                     return
 
                 # send the packet on to the transaction
                 tr.confirmation(apdu)
             else:
-                for tr in self.serverTransactions:
-                    if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduSource == tr.pdu_address):
-                        break
-                else:
+                tr = self.serverTransactions.get((apdu.pduSource, apdu.apduInvokeID))
+                if tr is None:
                     return
 
                 # send the packet on to the transaction
@@ -1281,19 +1317,15 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
         elif isinstance(apdu, SegmentAckPDU):
             # find the transaction being aborted
             if apdu.apduSrv:
-                for tr in self.clientTransactions:
-                    if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduSource == tr.pdu_address):
-                        break
-                else:
+                tr = self.clientTransactions.get((apdu.pduSource, apdu.apduInvokeID))
+                if tr is None:
                     return
 
                 # send the packet on to the transaction
                 tr.confirmation(apdu)
             else:
-                for tr in self.serverTransactions:
-                    if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduSource == tr.pdu_address):
-                        break
-                else:
+                tr = self.serverTransactions.get((apdu.pduSource, apdu.apduInvokeID))
+                if tr is None:
                     return
 
                 # send the packet on to the transaction
@@ -1334,9 +1366,8 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
                 apdu.apduInvokeID = self.get_next_invoke_id(apdu.pduDestination)
             else:
                 # verify the invoke ID isn't already being used
-                for tr in self.clientTransactions:
-                    if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduDestination == tr.pdu_address):
-                        raise RuntimeError("invoke ID in use")
+                if (apdu.pduDestination, apdu.apduInvokeID) in self.clientTransactions:
+                    raise RuntimeError("invoke ID in use")
 
             # warning for bogus requests
             if (apdu.pduDestination.addrType != Address.localStationAddr) and (apdu.pduDestination.addrType != Address.remoteStationAddr):
@@ -1344,10 +1375,11 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
 
             # create a client transaction state machine
             tr = ClientSSM(self, apdu.pduDestination)
+            tr.invokeID = apdu.apduInvokeID
             if _debug: StateMachineAccessPoint._debug("    - client segmentation state machine: %r", tr)
 
             # add it to our transactions to track it
-            self.clientTransactions.append(tr)
+            self.add_client_transaction(tr)
 
             # let it run
             tr.indication(apdu)
@@ -1366,10 +1398,8 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
                 or isinstance(apdu, RejectPDU) \
                 or isinstance(apdu, AbortPDU):
             # find the appropriate server transaction
-            for tr in self.serverTransactions:
-                if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduDestination == tr.pdu_address):
-                    break
-            else:
+            tr = self.serverTransactions.get((apdu.pduDestination, apdu.apduInvokeID))
+            if tr is None:
                 return
 
             # pass control to the transaction
@@ -2186,12 +2186,12 @@ class NameValue(Sequence):
         if tag and (tag.tagClass == Tag.applicationTagClass):
 
             # if it is a date check the next one for a time
-            if (tag.tagNumber == Tag.dateAppTag) and (len(taglist.tagList) >= 2):
-                next_tag = taglist.tagList[1]
+            if (tag.tagNumber == Tag.dateAppTag) and (len(taglist) >= 2):
+                next_tag = taglist[1]
                 if _debug: NameValue._debug("    - next_tag: %r", next_tag)
 
                 if (next_tag.tagClass == Tag.applicationTagClass) and (next_tag.tagNumber == Tag.timeAppTag):
-                    if _debug: NameValue._debug("    - remaining tag list 0: %r", taglist.tagList)
+                    if _debug: NameValue._debug("    - remaining tag list 0: %r", taglist[:])
 
                     self.value = DateTime()
                     self.value.decode(taglist)
@@ -116,7 +116,7 @@ class BSLCI(PCI, DebugContents):
         pdu.put( self.bslciType )               # 0x83
         pdu.put( self.bslciFunction )
 
-        if (self.bslciLength != len(self.pduData) + 4):
+        if (self.bslciLength != self.remaining() + 4):
             raise EncodingError("invalid BSLCI length")
 
         pdu.put_short( self.bslciLength )
@@ -135,7 +135,7 @@ class BSLCI(PCI, DebugContents):
         self.bslciFunction = pdu.get()
         self.bslciLength = pdu.get_short()
 
-        if (self.bslciLength != len(pdu.pduData) + 4):
+        if (self.bslciLength != pdu.remaining() + 4):
             raise DecodingError("invalid BSLCI length")
 
 #
@@ -149,11 +149,11 @@ class BSLPDU(BSLCI, PDUData):
 
     def encode(self, pdu):
         BSLCI.encode(self, pdu)
-        pdu.put_data(self.pduData)
+        pdu.put_payload(self)
 
     def decode(self, pdu):
         BSLCI.decode(self, pdu)
-        self.pduData = pdu.get_data(len(pdu.pduData))
+        self.take_data(pdu)
 
 #
 #   Result
@@ -237,7 +237,7 @@ class AccessRequest(BSLCI):
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
         self.bslciHashFn = bslpdu.get()
-        self.bslciUsername = bslpdu.get_data(len(bslpdu.pduData))
+        self.bslciUsername = bslpdu.get_data(bslpdu.remaining())
 
 register_bslpdu_type(AccessRequest)
 
@@ -269,7 +269,7 @@ class AccessChallenge(BSLCI):
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
         self.bslciHashFn = bslpdu.get()
-        self.bslciChallenge = bslpdu.get_data(len(bslpdu.pduData))
+        self.bslciChallenge = bslpdu.get_data(bslpdu.remaining())
 
 register_bslpdu_type(AccessChallenge)
 
@@ -301,7 +301,7 @@ class AccessResponse(BSLCI):
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
         self.bslciHashFn = bslpdu.get()
-        self.bslciResponse = bslpdu.get_data(len(bslpdu.pduData))
+        self.bslciResponse = bslpdu.get_data(bslpdu.remaining())
 
 register_bslpdu_type(AccessResponse)
 
@@ -319,22 +319,22 @@ class DeviceToDeviceAPDU(BSLPDU):
         super(DeviceToDeviceAPDU, self).__init__(*args, **kwargs)
 
         self.bslciFunction = BSLCI.deviceToDeviceAPDU
-        self.bslciLength = 4 + len(self.pduData)
+        self.bslciLength = 4 + self.remaining()
 
     def encode(self, bslpdu):
         # make sure the length is correct
-        self.bslciLength = 4 + len(self.pduData)
+        self.bslciLength = 4 + self.remaining()
 
         BSLCI.update(bslpdu, self)
 
         # encode the rest of the data
-        bslpdu.put_data( self.pduData )
+        bslpdu.put_payload(self)
 
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
 
         # get the rest of the data
-        self.pduData = bslpdu.get_data(len(bslpdu.pduData))
+        self.take_data(bslpdu)
 
 register_bslpdu_type(DeviceToDeviceAPDU)
 
@@ -350,22 +350,22 @@ class RouterToRouterNPDU(BSLPDU):
         super(RouterToRouterNPDU, self).__init__(*args, **kwargs)
 
         self.bslciFunction = BSLCI.routerToRouterNPDU
-        self.bslciLength = 4 + len(self.pduData)
+        self.bslciLength = 4 + self.remaining()
 
     def encode(self, bslpdu):
         # make sure the length is correct
-        self.bslciLength = 4 + len(self.pduData)
+        self.bslciLength = 4 + self.remaining()
 
         BSLCI.update(bslpdu, self)
 
         # encode the rest of the data
-        bslpdu.put_data( self.pduData )
+        bslpdu.put_payload(self)
 
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
 
         # get the rest of the data
-        self.pduData = bslpdu.get_data(len(bslpdu.pduData))
+        self.take_data(bslpdu)
 
 register_bslpdu_type(RouterToRouterNPDU)
 
@@ -383,7 +383,7 @@ class ProxyToServerUnicastNPDU(BSLPDU):
         super(ProxyToServerUnicastNPDU, self).__init__(*args, **kwargs)
 
         self.bslciFunction = BSLCI.proxyToServerUnicastNPDU
-        self.bslciLength = 5 + len(self.pduData)
+        self.bslciLength = 5 + self.remaining()
         self.bslciAddress = addr
         if addr is not None:
             self.bslciLength += addr.addrLen
@@ -392,7 +392,7 @@ class ProxyToServerUnicastNPDU(BSLPDU):
         addrLen = self.bslciAddress.addrLen
 
         # make sure the length is correct
-        self.bslciLength = 5 + addrLen + len(self.pduData)
+        self.bslciLength = 5 + addrLen + self.remaining()
 
         BSLCI.update(bslpdu, self)
 
@@ -401,7 +401,7 @@ class ProxyToServerUnicastNPDU(BSLPDU):
         bslpdu.put_data( self.bslciAddress.addrAddr )
 
         # encode the rest of the data
-        bslpdu.put_data( self.pduData )
+        bslpdu.put_payload(self)
 
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
@@ -411,7 +411,7 @@ class ProxyToServerUnicastNPDU(BSLPDU):
         self.bslciAddress = LocalStation(bslpdu.get_data(addrLen))
 
         # get the rest of the data
-        self.pduData = bslpdu.get_data(len(bslpdu.pduData))
+        self.take_data(bslpdu)
 
 register_bslpdu_type(ProxyToServerUnicastNPDU)
 
@@ -429,7 +429,7 @@ class ProxyToServerBroadcastNPDU(BSLPDU):
         super(ProxyToServerBroadcastNPDU, self).__init__(*args, **kwargs)
 
         self.bslciFunction = BSLCI.proxyToServerBroadcastNPDU
-        self.bslciLength = 5 + len(self.pduData)
+        self.bslciLength = 5 + self.remaining()
         self.bslciAddress = addr
         if addr is not None:
             self.bslciLength += addr.addrLen
@@ -438,7 +438,7 @@ class ProxyToServerBroadcastNPDU(BSLPDU):
         addrLen = self.bslciAddress.addrLen
 
         # make sure the length is correct
-        self.bslciLength = 5 + addrLen + len(self.pduData)
+        self.bslciLength = 5 + addrLen + self.remaining()
 
         BSLCI.update(bslpdu, self)
 
@@ -447,7 +447,7 @@ class ProxyToServerBroadcastNPDU(BSLPDU):
         bslpdu.put_data( self.bslciAddress.addrAddr )
 
         # encode the rest of the data
-        bslpdu.put_data( self.pduData )
+        bslpdu.put_payload(self)
 
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
@@ -457,7 +457,7 @@ class ProxyToServerBroadcastNPDU(BSLPDU):
         self.bslciAddress = LocalStation(bslpdu.get_data(addrLen))
 
         # get the rest of the data
-        self.pduData = bslpdu.get_data(len(bslpdu.pduData))
+        self.take_data(bslpdu)
 
 register_bslpdu_type(ProxyToServerBroadcastNPDU)
 
@@ -475,7 +475,7 @@ class ServerToProxyUnicastNPDU(BSLPDU):
         super(ServerToProxyUnicastNPDU, self).__init__(*args, **kwargs)
 
         self.bslciFunction = BSLCI.serverToProxyUnicastNPDU
-        self.bslciLength = 5 + len(self.pduData)
+        self.bslciLength = 5 + self.remaining()
         self.bslciAddress = addr
         if addr is not None:
             self.bslciLength += addr.addrLen
@@ -484,7 +484,7 @@ class ServerToProxyUnicastNPDU(BSLPDU):
         addrLen = self.bslciAddress.addrLen
 
         # make sure the length is correct
-        self.bslciLength = 5 + addrLen + len(self.pduData)
+        self.bslciLength = 5 + addrLen + self.remaining()
 
         BSLCI.update(bslpdu, self)
 
@@ -493,7 +493,7 @@ class ServerToProxyUnicastNPDU(BSLPDU):
         bslpdu.put_data( self.bslciAddress.addrAddr )
 
         # encode the rest of the data
-        bslpdu.put_data( self.pduData )
+        bslpdu.put_payload(self)
 
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
@@ -503,7 +503,7 @@ class ServerToProxyUnicastNPDU(BSLPDU):
         self.bslciAddress = LocalStation(bslpdu.get_data(addrLen))
 
         # get the rest of the data
-        self.pduData = bslpdu.get_data(len(bslpdu.pduData))
+        self.take_data(bslpdu)
 
 register_bslpdu_type(ServerToProxyUnicastNPDU)
 
@@ -519,19 +519,19 @@ class ServerToProxyBroadcastNPDU(BSLPDU):
         super(ServerToProxyBroadcastNPDU, self).__init__(*args, **kwargs)
 
         self.bslciFunction = BSLCI.serverToProxyBroadcastNPDU
-        self.bslciLength = 4 + len(self.pduData)
+        self.bslciLength = 4 + self.remaining()
 
     def encode(self, bslpdu):
         BSLCI.update(bslpdu, self)
 
         # encode the rest of the data
-        bslpdu.put_data( self.pduData )
+        bslpdu.put_payload(self)
 
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
 
         # get the rest of the data
-        self.pduData = bslpdu.get_data(len(bslpdu.pduData))
+        self.take_data(bslpdu)
 
 register_bslpdu_type(ServerToProxyBroadcastNPDU)
 
@@ -549,7 +549,7 @@ class ClientToLESUnicastNPDU(BSLPDU):
         super(ClientToLESUnicastNPDU, self).__init__(*args, **kwargs)
 
         self.bslciFunction = BSLCI.clientToLESUnicastNPDU
-        self.bslciLength = 5 + len(self.pduData)
+        self.bslciLength = 5 + self.remaining()
         self.bslciAddress = addr
         if addr is not None:
             self.bslciLength += addr.addrLen
@@ -558,7 +558,7 @@ class ClientToLESUnicastNPDU(BSLPDU):
         addrLen = self.bslciAddress.addrLen
 
         # make sure the length is correct
-        self.bslciLength = 5 + addrLen + len(self.pduData)
+        self.bslciLength = 5 + addrLen + self.remaining()
 
         BSLCI.update(bslpdu, self)
 
@@ -567,7 +567,7 @@ class ClientToLESUnicastNPDU(BSLPDU):
         bslpdu.put_data( self.bslciAddress.addrAddr )
 
         # encode the rest of the data
-        bslpdu.put_data( self.pduData )
+        bslpdu.put_payload(self)
 
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
@@ -577,7 +577,7 @@ class ClientToLESUnicastNPDU(BSLPDU):
         self.bslciAddress = LocalStation(bslpdu.get_data(addrLen))
 
         # get the rest of the data
-        self.pduData = bslpdu.get_data(len(bslpdu.pduData))
+        self.take_data(bslpdu)
 
 register_bslpdu_type(ClientToLESUnicastNPDU)
 
@@ -595,7 +595,7 @@ class ClientToLESBroadcastNPDU(BSLPDU):
         super(ClientToLESBroadcastNPDU, self).__init__(*args, **kwargs)
 
         self.bslciFunction = BSLCI.clientToLESBroadcastNPDU
-        self.bslciLength = 5 + len(self.pduData)
+        self.bslciLength = 5 + self.remaining()
         self.bslciAddress = addr
         if addr is not None:
             self.bslciLength += addr.addrLen
@@ -604,7 +604,7 @@ class ClientToLESBroadcastNPDU(BSLPDU):
         addrLen = self.bslciAddress.addrLen
 
         # make sure the length is correct
-        self.bslciLength = 5 + addrLen + len(self.pduData)
+        self.bslciLength = 5 + addrLen + self.remaining()
 
         BSLCI.update(bslpdu, self)
 
@@ -613,7 +613,7 @@ class ClientToLESBroadcastNPDU(BSLPDU):
         bslpdu.put_data( self.bslciAddress.addrAddr )
 
         # encode the rest of the data
-        bslpdu.put_data( self.pduData )
+        bslpdu.put_payload(self)
 
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
@@ -623,7 +623,7 @@ class ClientToLESBroadcastNPDU(BSLPDU):
         self.bslciAddress = LocalStation(bslpdu.get_data(addrLen))
 
         # get the rest of the data
-        self.pduData = bslpdu.get_data(len(bslpdu.pduData))
+        self.take_data(bslpdu)
 
 register_bslpdu_type(ClientToLESBroadcastNPDU)
 
@@ -641,7 +641,7 @@ class LESToClientUnicastNPDU(BSLPDU):
         super(LESToClientUnicastNPDU, self).__init__(*args, **kwargs)
 
         self.bslciFunction = BSLCI.lesToClientUnicastNPDU
-        self.bslciLength = 5 + len(self.pduData)
+        self.bslciLength = 5 + self.remaining()
         self.bslciAddress = addr
         if addr is not None:
             self.bslciLength += addr.addrLen
@@ -650,7 +650,7 @@ class LESToClientUnicastNPDU(BSLPDU):
         addrLen = self.bslciAddress.addrLen
 
         # make sure the length is correct
-        self.bslciLength = 5 + addrLen + len(self.pduData)
+        self.bslciLength = 5 + addrLen + self.remaining()
 
         BSLCI.update(bslpdu, self)
 
@@ -659,7 +659,7 @@ class LESToClientUnicastNPDU(BSLPDU):
         bslpdu.put_data( self.bslciAddress.addrAddr )
 
         # encode the rest of the data
-        bslpdu.put_data( self.pduData )
+        bslpdu.put_payload(self)
 
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
@@ -669,7 +669,7 @@ class LESToClientUnicastNPDU(BSLPDU):
         self.bslciAddress = LocalStation(bslpdu.get_data(addrLen))
 
         # get the rest of the data
-        self.pduData = bslpdu.get_data(len(bslpdu.pduData))
+        self.take_data(bslpdu)
 
 register_bslpdu_type(LESToClientUnicastNPDU)
 
@@ -687,7 +687,7 @@ class LESToClientBroadcastNPDU(BSLPDU):
         super(LESToClientBroadcastNPDU, self).__init__(*args, **kwargs)
 
         self.bslciFunction = BSLCI.lesToClientBroadcastNPDU
-        self.bslciLength = 5 + len(self.pduData)
+        self.bslciLength = 5 + self.remaining()
         self.bslciAddress = addr
         if addr is not None:
             self.bslciLength += addr.addrLen
@@ -696,7 +696,7 @@ class LESToClientBroadcastNPDU(BSLPDU):
         addrLen = self.bslciAddress.addrLen
 
         # make sure the length is correct
-        self.bslciLength = 5 + addrLen + len(self.pduData)
+        self.bslciLength = 5 + addrLen + self.remaining()
 
         BSLCI.update(bslpdu, self)
 
@@ -705,7 +705,7 @@ class LESToClientBroadcastNPDU(BSLPDU):
         bslpdu.put_data( self.bslciAddress.addrAddr )
 
         # encode the rest of the data
-        bslpdu.put_data( self.pduData )
+        bslpdu.put_payload(self)
 
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
@@ -715,7 +715,7 @@ class LESToClientBroadcastNPDU(BSLPDU):
         self.bslciAddress = LocalStation(bslpdu.get_data(addrLen))
 
         # get the rest of the data
-        self.pduData = bslpdu.get_data(len(bslpdu.pduData))
+        self.take_data(bslpdu)
 
 register_bslpdu_type(LESToClientBroadcastNPDU)
 
@@ -733,7 +733,7 @@ class ClientToServerUnicastAPDU(BSLPDU):
         super(ClientToServerUnicastAPDU, self).__init__(*args, **kwargs)
 
         self.bslciFunction = BSLCI.clientToServerUnicastAPDU
-        self.bslciLength = 5 + len(self.pduData)
+        self.bslciLength = 5 + self.remaining()
         self.bslciAddress = addr
         if addr is not None:
             self.bslciLength += addr.addrLen
@@ -742,7 +742,7 @@ class ClientToServerUnicastAPDU(BSLPDU):
         addrLen = self.bslciAddress.addrLen
 
         # make sure the length is correct
-        self.bslciLength = 5 + addrLen + len(self.pduData)
+        self.bslciLength = 5 + addrLen + self.remaining()
 
         BSLCI.update(bslpdu, self)
 
@@ -751,7 +751,7 @@ class ClientToServerUnicastAPDU(BSLPDU):
         bslpdu.put_data( self.bslciAddress.addrAddr )
 
         # encode the rest of the data
-        bslpdu.put_data( self.pduData )
+        bslpdu.put_payload(self)
 
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
@@ -761,7 +761,7 @@ class ClientToServerUnicastAPDU(BSLPDU):
         self.bslciAddress = LocalStation(bslpdu.get_data(addrLen))
 
         # get the rest of the data
-        self.pduData = bslpdu.get_data(len(bslpdu.pduData))
+        self.take_data(bslpdu)
 
 register_bslpdu_type(ClientToServerUnicastAPDU)
 
@@ -779,7 +779,7 @@ class ClientToServerBroadcastAPDU(BSLPDU):
         super(ClientToServerBroadcastAPDU, self).__init__(*args, **kwargs)
 
         self.bslciFunction = BSLCI.clientToServerBroadcastAPDU
-        self.bslciLength = 5 + len(self.pduData)
+        self.bslciLength = 5 + self.remaining()
         self.bslciAddress = addr
         if addr is not None:
             self.bslciLength += addr.addrLen
@@ -788,7 +788,7 @@ class ClientToServerBroadcastAPDU(BSLPDU):
         addrLen = self.bslciAddress.addrLen
 
         # make sure the length is correct
-        self.bslciLength = 5 + addrLen + len(self.pduData)
+        self.bslciLength = 5 + addrLen + self.remaining()
 
         BSLCI.update(bslpdu, self)
 
@@ -797,7 +797,7 @@ class ClientToServerBroadcastAPDU(BSLPDU):
         bslpdu.put_data( self.bslciAddress.addrAddr )
 
         # encode the rest of the data
-        bslpdu.put_data( self.pduData )
+        bslpdu.put_payload(self)
 
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
@@ -807,7 +807,7 @@ class ClientToServerBroadcastAPDU(BSLPDU):
         self.bslciAddress = LocalStation(bslpdu.get_data(addrLen))
 
         # get the rest of the data
-        self.pduData = bslpdu.get_data(len(bslpdu.pduData))
+        self.take_data(bslpdu)
 
 register_bslpdu_type(ClientToServerBroadcastAPDU)
 
@@ -825,7 +825,7 @@ class ServerToClientUnicastAPDU(BSLPDU):
         super(ServerToClientUnicastAPDU, self).__init__(*args, **kwargs)
 
         self.bslciFunction = BSLCI.serverToClientUnicastAPDU
-        self.bslciLength = 5 + len(self.pduData)
+        self.bslciLength = 5 + self.remaining()
         self.bslciAddress = addr
         if addr is not None:
             self.bslciLength += addr.addrLen
@@ -834,7 +834,7 @@ class ServerToClientUnicastAPDU(BSLPDU):
         addrLen = self.bslciAddress.addrLen
 
         # make sure the length is correct
-        self.bslciLength = 5 + addrLen + len(self.pduData)
+        self.bslciLength = 5 + addrLen + self.remaining()
 
         BSLCI.update(bslpdu, self)
 
@@ -843,7 +843,7 @@ class ServerToClientUnicastAPDU(BSLPDU):
         bslpdu.put_data( self.bslciAddress.addrAddr )
 
         # encode the rest of the data
-        bslpdu.put_data( self.pduData )
+        bslpdu.put_payload(self)
 
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
@@ -853,7 +853,7 @@ class ServerToClientUnicastAPDU(BSLPDU):
         self.bslciAddress = LocalStation(bslpdu.get_data(addrLen))
 
         # get the rest of the data
-        self.pduData = bslpdu.get_data(len(bslpdu.pduData))
+        self.take_data(bslpdu)
 
 register_bslpdu_type(ServerToClientUnicastAPDU)
 
@@ -871,7 +871,7 @@ class ServerToClientBroadcastAPDU(BSLPDU):
         super(ServerToClientBroadcastAPDU, self).__init__(*args, **kwargs)
 
         self.bslciFunction = BSLCI.serverToClientBroadcastAPDU
-        self.bslciLength = 5 + len(self.pduData)
+        self.bslciLength = 5 + self.remaining()
         self.bslciAddress = addr
         if addr is not None:
             self.bslciLength += addr.addrLen
@@ -880,7 +880,7 @@ class ServerToClientBroadcastAPDU(BSLPDU):
         addrLen = self.bslciAddress.addrLen
 
         # make sure the length is correct
-        self.bslciLength = 5 + addrLen + len(self.pduData)
+        self.bslciLength = 5 + addrLen + self.remaining()
 
         BSLCI.update(bslpdu, self)
 
@@ -889,7 +889,7 @@ class ServerToClientBroadcastAPDU(BSLPDU):
         bslpdu.put_data( self.bslciAddress.addrAddr )
 
         # encode the rest of the data
-        bslpdu.put_data( self.pduData )
+        bslpdu.put_payload(self)
 
     def decode(self, bslpdu):
         BSLCI.update(self, bslpdu)
@@ -899,7 +899,7 @@ class ServerToClientBroadcastAPDU(BSLPDU):
         self.bslciAddress = LocalStation(bslpdu.get_data(addrLen))
 
         # get the rest of the data
-        self.pduData = bslpdu.get_data(len(bslpdu.pduData))
+        self.take_data(bslpdu)
 
 register_bslpdu_type(ServerToClientBroadcastAPDU)
 
@@ -220,7 +220,7 @@ class BTR(Client, Server, DebugContents):
 
             # loop through the peers
             for peerAddr in self.peers.keys():
-                xpdu = PDU(pdu.pduData, destination=peerAddr)
+                xpdu = PDU(pdu, destination=peerAddr)
 
                 # send it downstream
                 self.request(xpdu)
@@ -395,7 +395,7 @@ class BIPSimple(BIPSAP, Client, Server):
 
         elif isinstance(pdu, OriginalUnicastNPDU):
             # build a vanilla PDU
-            xpdu = PDU(pdu.pduData, source=pdu.pduSource, destination=pdu.pduDestination, user_data=pdu.pduUserData)
+            xpdu = PDU(pdu, source=pdu.pduSource, destination=pdu.pduDestination, user_data=pdu.pduUserData)
             if _debug: BIPSimple._debug("    - xpdu: %r", xpdu)
 
             # send it upstream
@@ -403,7 +403,7 @@ class BIPSimple(BIPSAP, Client, Server):
 
         elif isinstance(pdu, OriginalBroadcastNPDU):
             # build a PDU with a local broadcast address
-            xpdu = PDU(pdu.pduData, source=pdu.pduSource, destination=LocalBroadcast(), user_data=pdu.pduUserData)
+            xpdu = PDU(pdu, source=pdu.pduSource, destination=LocalBroadcast(), user_data=pdu.pduUserData)
             if _debug: BIPSimple._debug("    - xpdu: %r", xpdu)
 
             # send it upstream
@@ -411,7 +411,7 @@ class BIPSimple(BIPSAP, Client, Server):
 
         elif isinstance(pdu, ForwardedNPDU):
             # build a PDU with the source from the real source
-            xpdu = PDU(pdu.pduData, source=pdu.bvlciAddress, destination=LocalBroadcast(), user_data=pdu.pduUserData)
+            xpdu = PDU(pdu, source=pdu.bvlciAddress, destination=LocalBroadcast(), user_data=pdu.pduUserData)
 #           if route_aware:
 #               xpdu.pduSource.addrRoute = pdu.pduSource
 
@@ -566,7 +566,7 @@ class BIPForeign(BIPSAP, Client, Server, OneShotTask, DebugContents):
 
         if isinstance(pdu, OriginalUnicastNPDU):
             # build a vanilla PDU
-            xpdu = PDU(pdu.pduData, source=pdu.pduSource, destination=pdu.pduDestination, user_data=pdu.pduUserData)
+            xpdu = PDU(pdu, source=pdu.pduSource, destination=pdu.pduDestination, user_data=pdu.pduUserData)
 
             # send it upstream
             self.response(xpdu)
@@ -583,7 +583,7 @@ class BIPForeign(BIPSAP, Client, Server, OneShotTask, DebugContents):
                 return
 
             # build a PDU with the source from the real source
-            xpdu = PDU(pdu.pduData, source=pdu.bvlciAddress, destination=LocalBroadcast(), user_data=pdu.pduUserData)
+            xpdu = PDU(pdu, source=pdu.bvlciAddress, destination=LocalBroadcast(), user_data=pdu.pduUserData)
 #           if route_aware:
 #               xpdu.pduSource.pduRoute = pdu.pduSource
 
@@ -837,7 +837,7 @@ class BIPBBMD(BIPSAP, Client, Server, RecurringTask, DebugContents):
             # send it upstream if there is a network layer
             if self.serverPeer:
                 # build a PDU with a local broadcast address
-                xpdu = PDU(pdu.pduData, source=pdu.bvlciAddress, destination=LocalBroadcast(), user_data=pdu.pduUserData)
+                xpdu = PDU(pdu, source=pdu.bvlciAddress, destination=LocalBroadcast(), user_data=pdu.pduUserData)
 #               if settings.route_aware:
 #                   xpdu.pduSource.addrRoute = pdu.pduSource
                 if _debug: BIPBBMD._debug("    - upstream xpdu: %r", xpdu)
@@ -909,7 +909,7 @@ class BIPBBMD(BIPSAP, Client, Server, RecurringTask, DebugContents):
             # send it upstream if there is a network layer
             if self.serverPeer:
                 # build a PDU with a local broadcast address
-                xpdu = PDU(pdu.pduData, source=pdu.pduSource, destination=LocalBroadcast(), user_data=pdu.pduUserData)
+                xpdu = PDU(pdu, source=pdu.pduSource, destination=LocalBroadcast(), user_data=pdu.pduUserData)
                 if _debug: BIPBBMD._debug("    - upstream xpdu: %r", xpdu)
 
                 self.response(xpdu)
@@ -940,7 +940,7 @@ class BIPBBMD(BIPSAP, Client, Server, RecurringTask, DebugContents):
             # send it upstream if there is a network layer
             if self.serverPeer:
                 # build a PDU with a local broadcast address
-                xpdu = PDU(pdu.pduData, source=pdu.pduSource, destination=pdu.pduDestination, user_data=pdu.pduUserData)
+                xpdu = PDU(pdu, source=pdu.pduSource, destination=pdu.pduDestination, user_data=pdu.pduUserData)
                 if _debug: BIPBBMD._debug("    - upstream xpdu: %r", xpdu)
 
                 self.response(xpdu)
@@ -949,7 +949,7 @@ class BIPBBMD(BIPSAP, Client, Server, RecurringTask, DebugContents):
             # send it upstream if there is a network layer
             if self.serverPeer:
                 # build a PDU with a local broadcast address
-                xpdu = PDU(pdu.pduData, source=pdu.pduSource, destination=LocalBroadcast(), user_data=pdu.pduUserData)
+                xpdu = PDU(pdu, source=pdu.pduSource, destination=LocalBroadcast(), user_data=pdu.pduUserData)
                 if _debug: BIPBBMD._debug("    - upstream xpdu: %r", xpdu)
 
                 self.response(xpdu)
@@ -1176,7 +1176,7 @@ class BIPNAT(BIPSAP, Client, Server, RecurringTask, DebugContents):
             ###TODO verify this is from a peer
 
             # build a PDU with the source from the real source
-            xpdu = PDU(pdu.pduData, source=pdu.bvlciAddress, destination=LocalBroadcast(), user_data=pdu.pduUserData)
+            xpdu = PDU(pdu, source=pdu.bvlciAddress, destination=LocalBroadcast(), user_data=pdu.pduUserData)
 #           if settings.route_aware:
 #               xpdu.pduSource.addrRoute = pdu.pduSource
             if _debug: BIPNAT._debug("    - upstream xpdu: %r", xpdu)
@@ -1239,7 +1239,7 @@ class BIPNAT(BIPSAP, Client, Server, RecurringTask, DebugContents):
             ###TODO verify this is from a registered foreign device
 
             # build a PDU with a local broadcast address
-            xpdu = PDU(pdu.pduData, source=pdu.pduSource, destination=LocalBroadcast(), user_data=pdu.pduUserData)
+            xpdu = PDU(pdu, source=pdu.pduSource, destination=LocalBroadcast(), user_data=pdu.pduUserData)
             if _debug: BIPNAT._debug("    - upstream xpdu: %r", xpdu)
 
             # send it upstream
@@ -1269,7 +1269,7 @@ class BIPNAT(BIPSAP, Client, Server, RecurringTask, DebugContents):
             ###TODO verify this is from a peer
 
             # build a vanilla PDU
-            xpdu = PDU(pdu.pduData, source=pdu.pduSource, destination=pdu.pduDestination, user_data=pdu.pduUserData)
+            xpdu = PDU(pdu, source=pdu.pduSource, destination=pdu.pduDestination, user_data=pdu.pduUserData)
             if _debug: BIPNAT._debug("    - upstream xpdu: %r", xpdu)
 
             # send it upstream
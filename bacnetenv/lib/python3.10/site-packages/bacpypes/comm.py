@@ -6,7 +6,6 @@ Communications Module
 
 import sys
 import struct
-from copy import copy as _copy
 
 from .errors import DecodingError, ConfigurationError
 from .debugging import ModuleLogger, DebugContents, bacpypes_debugging, btox
@@ -19,6 +18,13 @@ _log = ModuleLogger(globals())
 _short_mask = 0xFFFF
 _long_mask = 0xFFFFFFFF
 
+_short_struct = struct.Struct('>H')
+_long_struct = struct.Struct('>L')
+
+# free octets kept in front of a new buffer for the headers of lower layers,
+# BVLL + NPCI + APCI of a routed message is well under this
+HEADROOM = 64
+
 # maps of named clients and servers
 client_map = {}
 server_map = {}
@@ -40,25 +46,19 @@ class PCI(DebugContents):
     def __init__(self, *args, **kwargs):
         if _debug: PCI._debug("__init__ %r %r", args, kwargs)
 
-        # split out the keyword arguments that belong to this class
-        my_kwargs = {}
-        other_kwargs = {}
-        for element in ('user_data', 'source', 'destination'):
-            if element in kwargs:
-                my_kwargs[element] = kwargs[element]
-        for kw in kwargs:
-            if kw not in my_kwargs:
-                other_kwargs[kw] = kwargs[kw]
-        if _debug: PCI._debug("    - my_kwargs: %r", my_kwargs)
-        if _debug: PCI._debug("    - other_kwargs: %r", other_kwargs)
+        # take out the keyword arguments that belong to this class, kwargs
+        # is our own copy
+        user_data = kwargs.pop('user_data', None)
+        source = kwargs.pop('source', None)
+        destination = kwargs.pop('destination', None)
 
         # call some superclass, if there is one
-        super(PCI, self).__init__(*args, **other_kwargs)
+        super(PCI, self).__init__(*args, **kwargs)
 
         # pick up some optional kwargs
-        self.pduUserData = my_kwargs.get('user_data', None)
-        self.pduSource = my_kwargs.get('source', None)
-        self.pduDestination = my_kwargs.get('destination', None)
+        self.pduUserData = user_data
+        self.pduSource = source
+        self.pduDestination = destination
 
     def update(self, pci):
         """Copy the PCI fields."""
@@ -100,6 +100,29 @@ class PCI(DebugContents):
 @bacpypes_debugging
 class PDUData(object):
 
+    """
+    The data portion of a PDU is a window [offset, end) on a buffer.
+
+    Decoding never deletes from the front of the buffer, get() and friends
+    move the offset forward, so decoding an N octet packet is O(N).  When
+    the buffer is immutable (bytes, which is what comes off a socket) it
+    is shared as-is by copies of the PDU and handed up the stack with
+    take_data() instead of being sliced at every layer.
+
+    Encoding goes the other way.  A buffer is only written by the one PDU
+    that owns it, which appends at the end or writes in front of its
+    offset.  A new buffer starts with HEADROOM free octets in front, and
+    put_payload() lets the next layer down write its header into that
+    headroom and take over the buffer instead of copying the payload
+    behind its header, so a response is serialized into one buffer from
+    the service encoding all the way to the socket.  Everybody else who
+    shares a buffer has their own window on it and makes a copy the first
+    time they write.
+
+    The pduData attribute is still the data that has not been consumed
+    yet, reading it returns the window as a bytes-like object.
+    """
+
     def __init__(self, data=None, *args, **kwargs):
         if _debug: PDUData._debug("__init__ %r %r %r", data, args, kwargs)
 
@@ -108,47 +131,135 @@ class PDUData(object):
         super(PDUData, self).__init__(*args, **kwargs)
 
         # function acts like a copy constructor
+        self._owned = False
         if data is None:
-            self.pduData = bytearray()
-        elif isinstance(data, (bytes, bytearray)):
-            self.pduData = bytearray(data)
-        elif isinstance(data, PDUData) or isinstance(data, PDU):
-            self.pduData = _copy(data.pduData)
+            # nothing allocated until something is written
+            self._data = b''
+            self._offset = self._end = 0
+        elif isinstance(data, bytes):
+            # immutable, no copy needed
+            self._data = data
+            self._offset = 0
+            self._end = len(data)
+        elif isinstance(data, (bytearray, memoryview)):
+            self._data = bytearray(data)
+            self._offset = 0
+            self._end = len(self._data)
+            self._owned = True
+        elif isinstance(data, PDUData):
+            # share the window, the copy inherits the right to write
+            self._data = data._data
+            self._offset = data._offset
+            self._end = data._end
+            self._owned = data._owned
+            data._owned = False
         else:
             raise TypeError("bytes or bytearray expected")
 
+    def _get_pdu_data(self):
+        data = self._data
+        if isinstance(data, (bytes, bytearray)) and (self._offset or self._end != len(data)):
+            return data[self._offset:self._end]
+        return data
+
+    def _set_pdu_data(self, data):
+        self._data = data
+        self._offset = 0
+        self._owned = False
+
+        # the pickle actors park other objects here for a while
+        try:
+            self._end = len(data)
+        except TypeError:
+            self._end = 0
+
+    pduData = property(_get_pdu_data, _set_pdu_data)
+
+    def remaining(self):
+        """Number of octets left to decode."""
+        return self._end - self._offset
+
+    def data_view(self):
+        """The data as a memoryview on the buffer, no copy, for handing to
+        a socket.  Let go of it before anything is written to the PDU."""
+        return memoryview(self._data)[self._offset:self._end]
+
+    def take_data(self, pdu):
+        """Take the rest of the data of pdu as our data, without a copy when
+        the buffer is immutable."""
+        data = pdu._data
+        if isinstance(data, bytes):
+            self._data = data
+            self._offset = pdu._offset
+            self._end = pdu._end
+            self._owned = False
+        else:
+            self._data = data[pdu._offset:pdu._end]
+            self._offset = 0
+            self._end = len(self._data)
+            self._owned = True
+        pdu._offset = pdu._end
+
     def get(self):
-        if len(self.pduData) == 0:
+        offset = self._offset
+        if offset >= self._end:
             raise DecodingError("no more packet data")
+        self._offset = offset + 1
 
-        octet = self.pduData[0]
-        del self.pduData[0]
-
-        return octet
+        return self._data[offset]
 
     def get_data(self, dlen):
-        if len(self.pduData) < dlen:
+        offset = self._offset
+        if self._end - offset < dlen:
             raise DecodingError("no more packet data")
 
-        data = self.pduData[:dlen]
-        del self.pduData[:dlen]
+        data = self._data[offset:offset + dlen]
+        self._offset = offset + dlen
 
         return data
 
+    def get_view(self, dlen):
+        """Like get_data() but a memoryview into the buffer, no copy."""
+        offset = self._offset
+        if self._end - offset < dlen:
+            raise DecodingError("no more packet data")
+
+        self._offset = offset + dlen
+        return memoryview(self._data)[offset:offset + dlen]
+
     def get_short(self):
-        return struct.unpack('>H',self.get_data(2))[0]
+        offset = self._offset
+        if self._end - offset < 2:
+            raise DecodingError("no more packet data")
+        self._offset = offset + 2
+        return _short_struct.unpack_from(self._data, offset)[0]
 
     def get_long(self):
-        return struct.unpack('>L',self.get_data(4))[0]
+        offset = self._offset
+        if self._end - offset < 4:
+            raise DecodingError("no more packet data")
+        self._offset = offset + 4
+        return _long_struct.unpack_from(self._data, offset)[0]
+
+    def _writable(self):
+        # appending to a buffer we don't own, copy the window into a new
+        # one with room in front for the headers of the layers below
+        if not self._owned:
+            data = bytearray(HEADROOM)
+            data += memoryview(self._data)[self._offset:self._end]
+            self._data = data
+            self._offset = HEADROOM
+            self._end = len(data)
+            self._owned = True
+        return self._data
 
     def put(self, n):
-        # pduData is a bytearray
-        self.pduData += bytes([n])
+        data = self._data if self._owned else self._writable()
+        data.append(n)
+        self._end += 1
 
     def put_data(self, data):
-        if isinstance(data, bytes):
-            pass
-        elif isinstance(data, bytearray):
+        if isinstance(data, (bytes, bytearray, memoryview)):
             pass
         elif isinstance(data, list):
             data = bytes(data)
@@ -156,16 +267,42 @@ class PDUData(object):
             raise TypeError("data must be bytes, bytearray, or a list")
 
         # regular append works
-        self.pduData += data
+        buff = self._data if self._owned else self._writable()
+        buff += data
+        self._end += len(data)
 
     def put_short(self, n):
-        self.pduData += struct.pack('>H',n & _short_mask)
+        data = self._data if self._owned else self._writable()
+        data += _short_struct.pack(n & _short_mask)
+        self._end += 2
 
     def put_long(self, n):
-        self.pduData += struct.pack('>L',n & _long_mask)
+        data = self._data if self._owned else self._writable()
+        data += _long_struct.pack(n & _long_mask)
+        self._end += 4
+
+    def put_payload(self, pdu):
+        """Append the data of pdu, which is usually the payload of the layer
+        above going behind the header just put into this PDU.  When pdu owns
+        its buffer and the header fits in front of its data, the header is
+        moved there and this PDU takes over the buffer, so the payload is
+        never copied.  The data of pdu is not consumed either way."""
+        hlen = self._end - self._offset
+        offset = pdu._offset - hlen
+        if pdu._owned and offset >= 0:
+            data = pdu._data
+            if hlen:
+                data[offset:pdu._offset] = memoryview(self._data)[self._offset:self._end]
+            self._data = data
+            self._offset = offset
+            self._end = pdu._end
+            self._owned = True
+            pdu._owned = False
+        else:
+            self.put_data(pdu.data_view())
 
     def debug_contents(self, indent=1, file=sys.stdout, _ids=None):
-        if isinstance(self.pduData, bytearray):
+        if isinstance(self.pduData, (bytes, bytearray)):
             if len(self.pduData) > 20:
                 hexed = btox(self.pduData[:20],'.') + "..."
             else:
@@ -185,7 +322,7 @@ class PDUData(object):
         # add the data if it is not None
         v = self.pduData
         if v is not None:
-            if isinstance(v, bytearray):
+            if isinstance(v, (bytes, bytearray)):
                 v = btox(v)
             elif hasattr(v, 'dict_contents'):
                 v = v.dict_contents(as_class=as_class)
@@ -41,6 +41,358 @@ class Element:
 
         return '<' + desc + ' instance at 0x%08x' % (id(self),) + '>'
 
+#
+#   Compiled Codecs
+#
+#   Sequence and Choice encode and decode by walking their element lists,
+#   which means a getattr(), isinstance() and issubclass() dispatch and a
+#   handful of attribute lookups for every element of every message.  The
+#   element lists never change once a class is defined, so the first time
+#   a class is encoded or decoded its elements are turned into the source
+#   of a function that does exactly what the walk would have done, in line,
+#   and that function is cached for the class.
+#
+
+_sequence_encoders = {}
+_sequence_decoders = {}
+_choice_encoders = {}
+_choice_decoders = {}
+
+# opening and closing tags are never modified after they are built, the
+# compiled encoders share one of each per context
+_opening_tags = {}
+_closing_tags = {}
+
+def _opening_tag(context):
+    tag = _opening_tags.get(context)
+    if tag is None:
+        tag = _opening_tags[context] = OpeningTag(context)
+    return tag
+
+def _closing_tag(context):
+    tag = _closing_tags.get(context)
+    if tag is None:
+        tag = _closing_tags[context] = ClosingTag(context)
+    return tag
+
+def _element_kind(element, decoding=False):
+    """Return 'sequenceof', 'anyatomic', 'atomic' or 'structure', the branch
+    Sequence.encode() or Sequence.decode() would take for the element."""
+    klass = element.klass
+    if decoding:
+        # lists decode as structures, see below
+        if klass in _sequence_of_classes:
+            return 'sequenceof'
+        if issubclass(klass, AnyAtomic):
+            return 'anyatomic'
+    elif (klass in _sequence_of_classes) or (klass in _list_of_classes):
+        return 'sequenceof'
+    if issubclass(klass, (Atomic, AnyAtomic)):
+        return 'atomic'
+    return 'structure'
+
+@bacpypes_debugging
+class _CodecSource:
+
+    """Source lines and the names they refer to for one compiled codec."""
+
+    def __init__(self, header):
+        self.lines = [header]
+        self.names = {
+            'TagList': TagList, 'Tag': Tag,
+            'MissingRequiredParameter': MissingRequiredParameter,
+            'InvalidParameterDatatype': InvalidParameterDatatype,
+            'InvalidTag': InvalidTag, 'DecodingError': DecodingError,
+            }
+
+    def add(self, indent, line):
+        self.lines.append("    " * indent + line)
+
+    def name(self, prefix, value):
+        """Return a name bound to the value in the compiled function."""
+        name = "%s%d" % (prefix, len(self.names))
+        self.names[name] = value
+        return name
+
+    def encode_atomic(self, indent, element, klass):
+        """Encode value into an application tag, context tag if necessary."""
+        self.add(indent, "tag = Tag()")
+        self.add(indent, "%s(value).encode(tag)" % (klass,))
+        if element.context is not None:
+            # same as tag.app_to_context(), without building another tag
+            if element.klass._app_tag is None:
+                self.add(indent, "if tag.tagClass != 0:")
+                self.add(indent + 1, "raise ValueError('application tag required')")
+                self.add(indent, "if tag.tagNumber == 1:")
+                self.add(indent + 1, "tag.tagData = bytes((tag.tagLVT,))")
+                self.add(indent + 1, "tag.tagLVT = 1")
+            elif element.klass._app_tag == Tag.booleanAppTag:
+                self.add(indent, "tag.tagData = bytes((tag.tagLVT,))")
+                self.add(indent, "tag.tagLVT = 1")
+            self.add(indent, "tag.tagClass = 1")
+            self.add(indent, "tag.tagNumber = %d" % (element.context,))
+        self.add(indent, "append(tag)")
+
+    def encode_enclosed(self, indent, element, line):
+        """Encode with line, between opening and closing tags if necessary."""
+        if element.context is not None:
+            self.add(indent, "append(%s)" % (self.name('open', _opening_tag(element.context)),))
+        self.add(indent, line)
+        if element.context is not None:
+            self.add(indent, "append(%s)" % (self.name('close', _closing_tag(element.context)),))
+
+    def compile(self, fname, label):
+        source = "\n".join(self.lines) + "\n"
+        if _debug: _CodecSource._debug("compile %s:\n%s", label, source)
+        exec(compile(source, "<%s %s>" % (fname, label), "exec"), self.names)
+        return self.names[fname]
+
+def _compile_sequence_encoder(cls):
+    """Build and cache the encoder of a Sequence subclass."""
+    src = _CodecSource("def encode(self, taglist):")
+    src.add(1, "if not isinstance(taglist, TagList):")
+    src.add(2, "raise TypeError('TagList expected')")
+    src.add(1, "append = taglist.append")
+
+    for element in cls.sequenceElements:
+        klass = src.name('klass', element.klass)
+
+        src.add(1, "value = getattr(self, %r, None)" % (element.name,))
+        if element.optional:
+            src.add(1, "if value is not None:")
+            indent = 2
+        else:
+            src.add(1, "if value is None:")
+            src.add(2, "raise MissingRequiredParameter(%r)" % ("%s is a missing required element of %s" % (element.name, cls.__name__),))
+            indent = 1
+
+        kind = _element_kind(element)
+        if kind == 'sequenceof':
+            src.encode_enclosed(indent, element, "%s(value).encode(taglist)" % (klass,))
+        elif kind == 'atomic':
+            src.encode_atomic(indent, element, klass)
+        else:
+            src.add(indent, "if not isinstance(value, %s):" % (klass,))
+            src.add(indent + 1, "raise TypeError(%r)" % ("%s must be of type %s" % (element.name, element.klass.__name__),))
+            src.encode_enclosed(indent, element, "value.encode(taglist)")
+
+    src.add(1, "pass")
+    _sequence_encoders[cls] = encoder = src.compile('encode', cls.__name__)
+    return encoder
+
+def _compile_sequence_decoder(cls):
+    """Build and cache the decoder of a Sequence subclass."""
+    src = _CodecSource("def decode(self, taglist):")
+    src.add(1, "if not isinstance(taglist, TagList):")
+    src.add(2, "raise TypeError('TagList expected')")
+    src.add(1, "peek = taglist.Peek")
+    src.add(1, "pop = taglist.Pop")
+
+    for element in cls.sequenceElements:
+        klass = src.name('klass', element.klass)
+        name = element.name
+        context = element.context
+        kind = _element_kind(element, decoding=True)
+        missing = "raise MissingRequiredParameter(%r)" % ("%s is a missing required element of %s" % (name, cls.__name__),)
+
+        # no more tags, or the end of an enclosing context
+        src.add(1, "tag = peek()")
+        src.add(1, "if tag is None:")
+        if element.optional:
+            src.add(2, "self.%s = None" % (name,))
+        elif (element.klass in _sequence_of_classes) or (element.klass in _list_of_classes):
+            src.add(2, "self.%s = []" % (name,))
+        else:
+            src.add(2, missing)
+        src.add(1, "elif tag.tagClass == 3:")
+        if not element.optional:
+            src.add(2, missing)
+        src.add(2, "self.%s = None" % (name,))
+
+        if kind == 'sequenceof':
+            if context is not None:
+                src.add(1, "elif tag.tagClass != 2 or tag.tagNumber != %d:" % (context,))
+                if element.optional:
+                    src.add(2, "self.%s = []" % (name,))
+                else:
+                    src.add(2, "raise MissingRequiredParameter(%r)" % ("%s expected opening tag %d" % (name, context),))
+            src.add(1, "else:")
+            if context is not None:
+                src.add(2, "pop()")
+            src.add(2, "helper = %s()" % (klass,))
+            src.add(2, "helper.decode(taglist)")
+            src.add(2, "self.%s = helper.value" % (name,))
+            if context is not None:
+                src.add(2, "tag = pop()")
+                src.add(2, "if tag.tagClass != 3 or tag.tagNumber != %d:" % (context,))
+                src.add(3, "raise InvalidTag(%r)" % ("%s expected closing tag %d" % (name, context),))
+
+        elif kind == 'anyatomic':
+            src.add(1, "else:")
+            if context is not None:
+                src.add(2, "raise InvalidTag(%r)" % ("%s any atomic with context tag %d" % (name, context),))
+            else:
+                src.add(2, "if tag.tagClass != 0:")
+                if element.optional:
+                    src.add(3, "self.%s = None" % (name,))
+                else:
+                    src.add(3, "raise InvalidParameterDatatype(%r)" % ("%s expected any atomic application tag" % (name,),))
+                src.add(2, "else:")
+                src.add(3, "pop()")
+                src.add(3, "self.%s = %s(tag).value" % (name, klass))
+
+        elif kind == 'atomic':
+            app_tag = element.klass._app_tag
+            if context is not None:
+                src.add(1, "elif tag.tagClass != 1 or tag.tagNumber != %d:" % (context,))
+                if element.optional:
+                    src.add(2, "self.%s = None" % (name,))
+                else:
+                    src.add(2, "raise InvalidTag(%r)" % ("%s expected context tag %d" % (name, context),))
+                src.add(1, "else:")
+                src.add(2, "tag = tag.context_to_app(%r)" % (app_tag,))
+                src.add(2, "pop()")
+                src.add(2, "self.%s = %s(tag).value" % (name, klass))
+            else:
+                src.add(1, "elif tag.tagClass != 0 or tag.tagNumber != %r:" % (app_tag,))
+                if element.optional:
+                    src.add(2, "self.%s = None" % (name,))
+                else:
+                    src.add(2, "raise InvalidParameterDatatype(%r %% (Tag._app_tag_name[%s._app_tag],))" % (name.replace('%', '%%') + " expected application tag %s", klass))
+                src.add(1, "else:")
+                src.add(2, "pop()")
+                src.add(2, "self.%s = %s(tag).value" % (name, klass))
+
+        elif context is not None:
+            # a context tag has been matched, the structure has to decode
+            src.add(1, "elif tag.tagClass != 2 or tag.tagNumber != %d:" % (context,))
+            if element.optional:
+                src.add(2, "self.%s = None" % (name,))
+            else:
+                src.add(2, "raise InvalidTag(%r)" % ("%s expected opening tag %d" % (name, context),))
+            src.add(1, "else:")
+            src.add(2, "pop()")
+            src.add(2, "value = %s()" % (klass,))
+            src.add(2, "value.decode(taglist)")
+            src.add(2, "self.%s = value" % (name,))
+            src.add(2, "tag = pop()")
+            src.add(2, "if (not tag) or tag.tagClass != 3 or tag.tagNumber != %d:" % (context,))
+            src.add(3, "raise InvalidTag(%r)" % ("%s expected closing tag %d" % (name, context),))
+
+        elif element.optional:
+            # try it, back out if it isn't there
+            src.add(1, "else:")
+            src.add(2, "mark = taglist.mark()")
+            src.add(2, "try:")
+            src.add(3, "value = %s()" % (klass,))
+            src.add(3, "value.decode(taglist)")
+            src.add(3, "self.%s = value" % (name,))
+            src.add(2, "except (DecodingError, InvalidTag):")
+            src.add(3, "self.%s = None" % (name,))
+            src.add(3, "taglist.restore(mark)")
+
+        else:
+            src.add(1, "else:")
+            src.add(2, "value = %s()" % (klass,))
+            src.add(2, "value.decode(taglist)")
+            src.add(2, "self.%s = value" % (name,))
+
+    src.add(1, "pass")
+    _sequence_decoders[cls] = decoder = src.compile('decode', cls.__name__)
+    return decoder
+
+def _compile_choice_encoder(cls):
+    """Build and cache the encoder of a Choice subclass."""
+    src = _CodecSource("def encode(self, taglist):")
+    src.add(1, "append = taglist.append")
+
+    for element in cls.choiceElements:
+        klass = src.name('klass', element.klass)
+
+        src.add(1, "value = getattr(self, %r, None)" % (element.name,))
+        src.add(1, "if value is not None:")
+        if issubclass(element.klass, (Atomic, AnyAtomic)):
+            src.encode_atomic(2, element, klass)
+        else:
+            src.add(2, "if not isinstance(value, %s):" % (klass,))
+            src.add(3, "raise TypeError(%r)" % ("%s must be a %s" % (element.name, element.klass.__name__),))
+            src.encode_enclosed(2, element, "value.encode(taglist)")
+        src.add(2, "return")
+
+    src.add(1, "raise AttributeError(%r)" % ("missing choice of %s" % (cls.__name__,),))
+    _choice_encoders[cls] = encoder = src.compile('encode', cls.__name__)
+    return encoder
+
+def _compile_choice_decoder(cls):
+    """Build and cache the decoder of a Choice subclass."""
+    missing = "raise AttributeError(%r)" % ("missing choice of %s" % (cls.__name__,),)
+
+    src = _CodecSource("def decode(self, taglist):")
+    src.add(1, "pop = taglist.Pop")
+    src.add(1, "tag = taglist.Peek()")
+    src.add(1, "if tag is None or tag.tagClass == 3:")
+    src.add(2, missing)
+
+    names = [element.name for element in cls.choiceElements]
+    keyword = "if"
+    for element in cls.choiceElements:
+        klass = src.name('klass', element.klass)
+        name = element.name
+        context = element.context
+
+        if (element.klass in _sequence_of_classes) or (element.klass in _list_of_classes):
+            if context is None:
+                src.add(1, "%s True:" % (keyword,))
+                src.add(2, "raise NotImplementedError('choice of a SequenceOf must be context encoded')")
+                break
+            src.add(1, "%s tag.tagClass == 1 and tag.tagNumber == %d:" % (keyword, context))
+            src.add(2, "pop()")
+            src.add(2, "helper = %s()" % (klass,))
+            src.add(2, "helper.decode(taglist)")
+            src.add(2, "value = helper.value")
+            src.add(2, "tag = pop()")
+            src.add(2, "if tag.tagClass != 3 or tag.tagNumber != %d:" % (context,))
+            src.add(3, "raise InvalidTag(%r)" % ("%s expected closing tag %d" % (name, context),))
+
+        elif issubclass(element.klass, (Atomic, AnyAtomic)):
+            app_tag = element.klass._app_tag
+            if context is not None:
+                src.add(1, "%s tag.tagClass == 1 and tag.tagNumber == %d:" % (keyword, context))
+                src.add(2, "tag = tag.context_to_app(%r)" % (app_tag,))
+                src.add(2, "pop()")
+                src.add(2, "value = %s(tag).value" % (klass,))
+            else:
+                src.add(1, "%s tag.tagClass == 0 and tag.tagNumber == %r:" % (keyword, app_tag))
+                src.add(2, "pop()")
+                src.add(2, "value = %s(tag).value" % (klass,))
+
+        else:
+            if context is None:
+                src.add(1, "%s True:" % (keyword,))
+                src.add(2, "raise NotImplementedError('choice of non-atomic data must be context encoded')")
+                break
+            src.add(1, "%s tag.tagClass == 2 and tag.tagNumber == %d:" % (keyword, context))
+            src.add(2, "pop()")
+            src.add(2, "value = %s()" % (klass,))
+            src.add(2, "value.decode(taglist)")
+            src.add(2, "tag = pop()")
+            src.add(2, "if tag.tagClass != 3 or tag.tagNumber != %d:" % (context,))
+            src.add(3, "raise InvalidTag(%r)" % ("%s expected closing tag %d" % (name, context),))
+
+        # the one found and None everywhere else
+        for other in names:
+            src.add(2, "self.%s = %s" % (other, "value" if other == name else "None"))
+        keyword = "elif"
+    else:
+        if keyword == "if":
+            src.add(1, missing)
+        else:
+            src.add(1, "else:")
+            src.add(2, missing)
+
+    _choice_decoders[cls] = decoder = src.compile('decode', cls.__name__)
+    return decoder
+
 #
 #   Sequence
 #
@@ -77,239 +429,25 @@ class Sequence(object):
 
     def encode(self, taglist):
         """
+        Encode the elements into the tag list, see _compile_sequence_encoder().
         """
         if _debug: Sequence._debug("encode %r", taglist)
-        global _sequence_of_classes, _list_of_classes
-
-        # make sure we're dealing with a tag list
-        if not isinstance(taglist, TagList):
-            raise TypeError("TagList expected")
-
-        for element in self.sequenceElements:
-            value = getattr(self, element.name, None)
-            if element.optional and value is None:
-                continue
-            if not element.optional and value is None:
-                raise MissingRequiredParameter("%s is a missing required element of %s" % (element.name, self.__class__.__name__))
-            if (element.klass in _sequence_of_classes) or (element.klass in _list_of_classes):
-                # might need to encode an opening tag
-                if element.context is not None:
-                    taglist.append(OpeningTag(element.context))
-
-                if _debug: Sequence._debug("    - build sequence helper: %r %r", element.klass, value)
-                helper = element.klass(value)
 
-                # encode the value
-                helper.encode(taglist)
-
-                # might need to encode a closing tag
-                if element.context is not None:
-                    taglist.append(ClosingTag(element.context))
-            elif issubclass(element.klass, (Atomic, AnyAtomic)):
-                # a helper cooperates between the atomic value and the tag
-                if _debug: Sequence._debug("    - build helper: %r %r", element.klass, value)
-                helper = element.klass(value)
-
-                # build a tag and encode the data into it
-                tag = Tag()
-                helper.encode(tag)
-
-                # convert it to context encoding iff necessary
-                if element.context is not None:
-                    tag = tag.app_to_context(element.context)
-
-                # now append the tag
-                taglist.append(tag)
-            elif isinstance(value, element.klass):
-                # might need to encode an opening tag
-                if element.context is not None:
-                    taglist.append(OpeningTag(element.context))
-
-                # encode the value
-                value.encode(taglist)
-
-                # might need to encode a closing tag
-                if element.context is not None:
-                    taglist.append(ClosingTag(element.context))
-            else:
-                raise TypeError("%s must be of type %s" % (element.name, element.klass.__name__))
+        encoder = _sequence_encoders.get(self.__class__)
+        if encoder is None:
+            encoder = _compile_sequence_encoder(self.__class__)
+        encoder(self, taglist)
 
     def decode(self, taglist):
         """
+        Decode the elements from the tag list, see _compile_sequence_decoder().
         """
         if _debug: Sequence._debug("decode %r", taglist)
-        global _sequence_of_classes, _list_of_classes
-
-        # make sure we're dealing with a tag list
-        if not isinstance(taglist, TagList):
-            raise TypeError("TagList expected")
 
-        for element in self.sequenceElements:
-            tag = taglist.Peek()
-            if _debug: Sequence._debug("    - element, tag: %r, %r", element, tag)
-
-            # no more elements
-            if tag is None:
-                if element.optional:
-                    # omitted optional element
-                    setattr(self, element.name, None)
-                elif (element.klass in _sequence_of_classes) or (element.klass in _list_of_classes):
-                    # empty list
-                    setattr(self, element.name, [])
-                else:
-                    raise MissingRequiredParameter("%s is a missing required element of %s" % (element.name, self.__class__.__name__))
-
-            # we have been enclosed in a context
-            elif tag.tagClass == Tag.closingTagClass:
-                if not element.optional:
-                    raise MissingRequiredParameter("%s is a missing required element of %s" % (element.name, self.__class__.__name__))
-
-                # omitted optional element
-                setattr(self, element.name, None)
-
-            # check for a sequence element
-            elif element.klass in _sequence_of_classes:
-                # check for context encoding
-                if element.context is not None:
-                    if tag.tagClass != Tag.openingTagClass or tag.tagNumber != element.context:
-                        if not element.optional:
-                            raise MissingRequiredParameter("%s expected opening tag %d" % (element.name, element.context))
-                        else:
-                            # omitted optional element
-                            setattr(self, element.name, [])
-                            continue
-                    taglist.Pop()
-
-                # a helper cooperates between the atomic value and the tag
-                helper = element.klass()
-                helper.decode(taglist)
-
-                # now save the value
-                setattr(self, element.name, helper.value)
-
-                # check for context closing tag
-                if element.context is not None:
-                    tag = taglist.Pop()
-                    if tag.tagClass != Tag.closingTagClass or tag.tagNumber != element.context:
-                        raise InvalidTag("%s expected closing tag %d" % (element.name, element.context))
-
-            # check for an any atomic element
-            elif issubclass(element.klass, AnyAtomic):
-                # convert it to application encoding
-                if element.context is not None:
-                    raise InvalidTag("%s any atomic with context tag %d" % (element.name, element.context))
-
-                if tag.tagClass != Tag.applicationTagClass:
-                    if not element.optional:
-                        raise InvalidParameterDatatype("%s expected any atomic application tag" % (element.name,))
-                    else:
-                        setattr(self, element.name, None)
-                        continue
-
-                # consume the tag
-                taglist.Pop()
-
-                # a helper cooperates between the atomic value and the tag
-                helper = element.klass(tag)
-
-                # now save the value
-                setattr(self, element.name, helper.value)
-
-            # check for specific kind of atomic element, or the context says what kind
-            elif issubclass(element.klass, Atomic):
-                # convert it to application encoding
-                if element.context is not None:
-                    if tag.tagClass != Tag.contextTagClass or tag.tagNumber != element.context:
-                        if not element.optional:
-                            raise InvalidTag("%s expected context tag %d" % (element.name, element.context))
-                        else:
-                            setattr(self, element.name, None)
-                            continue
-                    tag = tag.context_to_app(element.klass._app_tag)
-                else:
-                    if tag.tagClass != Tag.applicationTagClass or tag.tagNumber != element.klass._app_tag:
-                        if not element.optional:
-                            raise InvalidParameterDatatype("%s expected application tag %s" % (element.name, Tag._app_tag_name[element.klass._app_tag]))
-                        else:
-                            setattr(self, element.name, None)
-                            continue
-
-                # consume the tag
-                taglist.Pop()
-
-                # a helper cooperates between the atomic value and the tag
-                helper = element.klass(tag)
-
-                # now save the value
-                setattr(self, element.name, helper.value)
-
-            # check for an AnyAtomic element
-            elif issubclass(element.klass, AnyAtomic):
-                # convert it to application encoding
-                if element.context is not None:
-                    if tag.tagClass != Tag.contextTagClass or tag.tagNumber != element.context:
-                        if not element.optional:
-                            raise InvalidTag("%s expected context tag %d" % (element.name, element.context))
-                        else:
-                            setattr(self, element.name, None)
-                            continue
-                    tag = tag.context_to_app(element.klass._app_tag)
-                else:
-                    if tag.tagClass != Tag.applicationTagClass:
-                        if not element.optional:
-                            raise InvalidParameterDatatype("%s expected application tag" % (element.name,))
-                        else:
-                            setattr(self, element.name, None)
-                            continue
-
-                # consume the tag
-                taglist.Pop()
-
-                # a helper cooperates between the atomic value and the tag
-                helper = element.klass(tag)
-
-                # now save the value
-                setattr(self, element.name, helper.value)
-
-            # some kind of structure
-            else:
-                if element.context is not None:
-                    if tag.tagClass != Tag.openingTagClass or tag.tagNumber != element.context:
-                        if not element.optional:
-                            raise InvalidTag("%s expected opening tag %d" % (element.name, element.context))
-                        else:
-                            setattr(self, element.name, None)
-                            continue
-                    taglist.Pop()
-
-                try:
-                    # make a backup of the tag list in case the structure manages to
-                    # decode some content but not all of it.  This is not supposed to
-                    # happen if the ASN.1 has been formed correctly.
-                    backup = taglist.tagList[:]
-
-                    # build a value and decode it
-                    value = element.klass()
-                    value.decode(taglist)
-
-                    # save the result
-                    setattr(self, element.name, value)
-                except (DecodingError, InvalidTag) as err:
-                    # if the context tag was matched, the substructure has to be decoded
-                    # correctly.
-                    if element.context is None and element.optional:
-                        # omitted optional element
-                        setattr(self, element.name, None)
-
-                        # restore the backup
-                        taglist.tagList = backup
-                    else:
-                        raise
-
-                if element.context is not None:
-                    tag = taglist.Pop()
-                    if (not tag) or tag.tagClass != Tag.closingTagClass or tag.tagNumber != element.context:
-                        raise InvalidTag("%s expected closing tag %d" % (element.name, element.context))
+        decoder = _sequence_decoders.get(self.__class__)
+        if decoder is None:
+            decoder = _compile_sequence_decoder(self.__class__)
+        decoder(self, taglist)
 
     def debug_contents(self, indent=1, file=sys.stdout, _ids=None):
         global _sequence_of_classes, _list_of_classes
@@ -439,10 +577,12 @@ def SequenceOf(klass):
 
         def encode(self, taglist):
             if _debug: _SequenceOf._debug("(%r)encode %r", self.__class__.__name__, taglist)
+            subtype = self.subtype
+            atomic = issubclass(subtype, (Atomic, AnyAtomic))
             for value in self.value:
-                if issubclass(self.subtype, (Atomic, AnyAtomic)):
+                if atomic:
                     # a helper cooperates between the atomic value and the tag
-                    helper = self.subtype(value)
+                    helper = subtype(value)
 
                     # build a tag and encode the data into it
                     tag = Tag()
@@ -450,33 +590,35 @@ def SequenceOf(klass):
 
                     # now encode the tag
                     taglist.append(tag)
-                elif isinstance(value, self.subtype):
+                elif isinstance(value, subtype):
                     # it must have its own encoder
                     value.encode(taglist)
                 else:
-                    raise TypeError("%s must be a %s" % (value, self.subtype.__name__))
+                    raise TypeError("%s must be a %s" % (value, subtype.__name__))
 
         def decode(self, taglist):
             if _debug: _SequenceOf._debug("(%r)decode %r", self.__class__.__name__, taglist)
+            subtype = self.subtype
+            atomic = issubclass(subtype, (Atomic, AnyAtomic))
 
             while len(taglist) != 0:
                 tag = taglist.Peek()
                 if tag.tagClass == Tag.closingTagClass:
                     return
 
-                if issubclass(self.subtype, (Atomic, AnyAtomic)):
-                    if _debug: _SequenceOf._debug("    - building helper: %r %r", self.subtype, tag)
+                if atomic:
+                    if _debug: _SequenceOf._debug("    - building helper: %r %r", subtype, tag)
                     taglist.Pop()
 
                     # a helper cooperates between the atomic value and the tag
-                    helper = self.subtype(tag)
+                    helper = subtype(tag)
 
                     # save the value
                     self.value.append(helper.value)
                 else:
-                    if _debug: _SequenceOf._debug("    - building value: %r", self.subtype)
+                    if _debug: _SequenceOf._debug("    - building value: %r", subtype)
                     # build an element
-                    value = self.subtype()
+                    value = subtype()
 
                     # let it decode itself
                     value.decode(taglist)
@@ -1052,143 +1194,18 @@ class Choice(object):
     def encode(self, taglist):
         if _debug: Choice._debug("(%r)encode %r", self.__class__.__name__, taglist)
 
-        for element in self.choiceElements:
-            value = getattr(self, element.name, None)
-            if value is None:
-                continue
-
-            if issubclass(element.klass, (Atomic, AnyAtomic)):
-                # a helper cooperates between the atomic value and the tag
-                helper = element.klass(value)
-
-                # build a tag and encode the data into it
-                tag = Tag()
-                helper.encode(tag)
-
-                # convert it to context encoding
-                if element.context is not None:
-                    tag = tag.app_to_context(element.context)
-
-                # now encode the tag
-                taglist.append(tag)
-                break
-
-            elif isinstance(value, element.klass):
-                # encode an opening tag
-                if element.context is not None:
-                    taglist.append(OpeningTag(element.context))
-
-                # encode the value
-                value.encode(taglist)
-
-                # encode a closing tag
-                if element.context is not None:
-                    taglist.append(ClosingTag(element.context))
-                break
-
-            else:
-                raise TypeError("%s must be a %s" % (element.name, element.klass.__name__))
-        else:
-            raise AttributeError("missing choice of %s" % (self.__class__.__name__,))
+        encoder = _choice_encoders.get(self.__class__)
+        if encoder is None:
+            encoder = _compile_choice_encoder(self.__class__)
+        encoder(self, taglist)
 
     def decode(self, taglist):
         if _debug: Choice._debug("(%r)decode %r", self.__class__.__name__, taglist)
-        global _sequence_of_classes, _list_of_classes
-
-        # peek at the element
-        tag = taglist.Peek()
-        if tag is None:
-            raise AttributeError("missing choice of %s" % (self.__class__.__name__,))
-        if tag.tagClass == Tag.closingTagClass:
-            raise AttributeError("missing choice of %s" % (self.__class__.__name__,))
-
-        # keep track of which one was found
-        foundElement = {}
-
-        # figure out which choice it is
-        for element in self.choiceElements:
-            if _debug: Choice._debug("    - checking choice: %s", element.name)
-
-            # check for a sequence element
-            if (element.klass in _sequence_of_classes) or (element.klass in _list_of_classes):
-                # check for context encoding
-                if element.context is None:
-                    raise NotImplementedError("choice of a SequenceOf must be context encoded")
-                # match the context tag number
-                if tag.tagClass != Tag.contextTagClass or tag.tagNumber != element.context:
-                    continue
-                taglist.Pop()
-
-                # a helper cooperates between the atomic value and the tag
-                helper = element.klass()
-                helper.decode(taglist)
-
-                # now save the value
-                foundElement[element.name] = helper.value
 
-                # check for context closing tag
-                tag = taglist.Pop()
-                if tag.tagClass != Tag.closingTagClass or tag.tagNumber != element.context:
-                    raise InvalidTag("%s expected closing tag %d" % (element.name, element.context))
-
-                # done
-                if _debug: Choice._debug("    - found choice (sequence)")
-                break
-
-            # check for an atomic element
-            elif issubclass(element.klass, (Atomic, AnyAtomic)):
-                # convert it to application encoding
-                if element.context is not None:
-                    if tag.tagClass != Tag.contextTagClass or tag.tagNumber != element.context:
-                        continue
-                    tag = tag.context_to_app(element.klass._app_tag)
-                else:
-                    if tag.tagClass != Tag.applicationTagClass or tag.tagNumber != element.klass._app_tag:
-                        continue
-
-                # consume the tag
-                taglist.Pop()
-
-                # a helper cooperates between the atomic value and the tag
-                helper = element.klass(tag)
-
-                # now save the value
-                foundElement[element.name] = helper.value
-
-                # done
-                if _debug: Choice._debug("    - found choice (atomic)")
-                break
-
-            # some kind of structure
-            else:
-                # check for context encoding
-                if element.context is None:
-                    raise NotImplementedError("choice of non-atomic data must be context encoded")
-                if tag.tagClass != Tag.openingTagClass or tag.tagNumber != element.context:
-                    continue
-                taglist.Pop()
-
-                # build a value and decode it
-                value = element.klass()
-                value.decode(taglist)
-
-                # now save the value
-                foundElement[element.name] = value
-
-                # check for the correct closing tag
-                tag = taglist.Pop()
-                if tag.tagClass != Tag.closingTagClass or tag.tagNumber != element.context:
-                    raise InvalidTag("%s expected closing tag %d" % (element.name, element.context))
-
-                # done
-                if _debug: Choice._debug("    - found choice (structure)")
-                break
-        else:
-            raise AttributeError("missing choice of %s" % (self.__class__.__name__,))
-
-        # now save the value and None everywhere else
-        for element in self.choiceElements:
-            setattr(self, element.name, foundElement.get(element.name, None))
+        decoder = _choice_decoders.get(self.__class__)
+        if decoder is None:
+            decoder = _compile_choice_decoder(self.__class__)
+        decoder(self, taglist)
 
     def debug_contents(self, indent=1, file=sys.stdout, _ids=None):
         for element in self.choiceElements:
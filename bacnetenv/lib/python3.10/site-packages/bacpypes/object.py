@@ -67,6 +67,37 @@ class PropertyError(AttributeError):
 # a dictionary of object types and classes
 registered_object_types = {}
 
+#
+#   Lookup Tables
+#
+
+# property identifiers and object types by name and by enumeration value,
+# so the service handlers can go between the two without building
+# PropertyIdentifier or ObjectType instances
+property_identifier_values = dict(PropertyIdentifier.enumerations)
+property_identifier_names = dict((value, name) for name, value in property_identifier_values.items())
+
+object_type_values = dict(ObjectType.enumerations)
+object_type_names = dict((value, name) for name, value in object_type_values.items())
+
+def _property_table(properties):
+    """Return the (property, datatype) of each property of a property
+    dictionary, by its identifier and by the other form of the identifier
+    when it is a standard one."""
+    table = {}
+    for propid, prop in properties.items():
+        table[propid] = (prop, prop.datatype)
+
+    for propid, entry in list(table.items()):
+        if isinstance(propid, str):
+            alias = property_identifier_values.get(propid)
+        else:
+            alias = property_identifier_names.get(propid)
+        if (alias is not None) and (alias not in table):
+            table[alias] = entry
+
+    return table
+
 #
 #   register_object_type
 #
@@ -100,8 +131,9 @@ def register_object_type(cls=None, vendor_id=0):
     if 'objectType' not in _properties:
         _properties['objectType'] = ReadableProperty('objectType', ObjectType, cls.objectType, mutable=False)
 
-    # store this in the class
+    # store this in the class along with its lookup table
     cls._properties = _properties
+    cls._property_table = _property_table(_properties)
 
     # now save this in all our types
     registered_object_types[(cls.objectType, vendor_id)] = cls
@@ -118,6 +150,10 @@ def get_object_class(object_type, vendor_id=0):
     """Return the class associated with an object type."""
     if _debug: get_object_class._debug("get_object_class %r vendor_id=%r", object_type, vendor_id)
 
+    # standard types are registered by name
+    if isinstance(object_type, int):
+        object_type = object_type_names.get(object_type, object_type)
+
     # find the klass as given
     cls = registered_object_types.get((object_type, vendor_id))
     if _debug: get_object_class._debug("    - direct lookup: %s", repr(cls))
@@ -144,12 +180,12 @@ def get_datatype(object_type, propid, vendor_id=0):
         return None
 
     # get the property
-    prop = cls._properties.get(propid)
-    if not prop:
+    entry = cls._property_table.get(propid)
+    if not entry:
         return None
 
     # return the datatype
-    return prop.datatype
+    return entry[1]
 
 #
 #   Property
@@ -319,6 +355,14 @@ class Property(object):
                         self.identifier, self.datatype.__name__,
                         ))
 
+        # encodings of the old value are no good (see service.object)
+        cache = obj.__dict__.get('_property_cache')
+        if cache:
+            cache.pop(self.identifier, None)
+            if issubclass(self.datatype, Array):
+                for key in [key for key in cache if isinstance(key, tuple) and key[0] == self.identifier]:
+                    del cache[key]
+
         # local check if the property is monitored
         is_monitored = self.identifier in obj._property_monitors
 
@@ -345,9 +389,13 @@ class Property(object):
 
             # check for monitors, call each one with the old and new value
             if is_monitored:
-                for fn in obj._property_monitors[self.identifier]:
-                    if _debug: Property._debug("    - monitor: %r", fn)
-                    fn(old_value, arry)
+                batch = obj.__dict__.get('_monitor_batch')
+                if batch is not None:
+                    batch.append((self.identifier, old_value, arry))
+                else:
+                    for fn in obj._property_monitors[self.identifier]:
+                        if _debug: Property._debug("    - monitor: %r", fn)
+                        fn(old_value, arry)
 
         else:
             if is_monitored:
@@ -358,9 +406,13 @@ class Property(object):
 
             # check for monitors, call each one with the old and new value
             if is_monitored:
-                for fn in obj._property_monitors[self.identifier]:
-                    if _debug: Property._debug("    - monitor: %r", fn)
-                    fn(old_value, value)
+                batch = obj.__dict__.get('_monitor_batch')
+                if batch is not None:
+                    batch.append((self.identifier, old_value, value))
+                else:
+                    for fn in obj._property_monitors[self.identifier]:
+                        if _debug: Property._debug("    - monitor: %r", fn)
+                        fn(old_value, value)
 
 #
 #   StandardProperty
@@ -486,6 +538,7 @@ class Object:
         , OptionalProperty('profileName', CharacterString)
         ]
     _properties = {}
+    _property_table = {}
 
     def __init__(self, **kwargs):
         """Create an object, with default property values as needed."""
@@ -535,12 +588,12 @@ class Object:
         return the appropriate property."""
 
         # get the property
-        prop = self._properties.get(attr)
-        if not prop:
+        entry = self._property_table.get(attr)
+        if not entry:
             raise PropertyError(attr)
 
         # found it
-        return prop
+        return entry[0]
 
     def __getattr__(self, attr):
         if _debug: Object._debug("__getattr__ %r", attr)
@@ -581,6 +634,10 @@ class Object:
         # save the property reference and default value (usually None)
         self._properties[prop.identifier] = prop
         self._values[prop.identifier] = prop.default
+        self._property_table = _property_table(self._properties)
+
+        # forget any encodings of the property it replaces
+        self.__dict__.pop('_property_cache', None)
 
     def delete_property(self, prop):
         """Delete a property from an object.  The property is an instance of
@@ -596,40 +653,74 @@ class Object:
         del self._properties[prop.identifier]
         if prop.identifier in self._values:
             del self._values[prop.identifier]
+        self._property_table = _property_table(self._properties)
+
+        # forget any encodings of it
+        self.__dict__.pop('_property_cache', None)
 
     def ReadProperty(self, propid, arrayIndex=None):
         if _debug: Object._debug("ReadProperty %r arrayIndex=%r", propid, arrayIndex)
 
         # get the property
-        prop = self._properties.get(propid)
-        if not prop:
+        entry = self._property_table.get(propid)
+        if not entry:
             raise PropertyError(propid)
 
         # defer to the property to get the value
-        return prop.ReadProperty(self, arrayIndex)
+        return entry[0].ReadProperty(self, arrayIndex)
 
     def WriteProperty(self, propid, value, arrayIndex=None, priority=None, direct=False):
         if _debug: Object._debug("WriteProperty %r %r arrayIndex=%r priority=%r", propid, value, arrayIndex, priority)
 
         # get the property
-        prop = self._properties.get(propid)
-        if not prop:
+        entry = self._property_table.get(propid)
+        if not entry:
             raise PropertyError(propid)
 
         # defer to the property to set the value
-        return prop.WriteProperty(self, value, arrayIndex, priority, direct)
+        return entry[0].WriteProperty(self, value, arrayIndex, priority, direct)
+
+    def begin_monitor_batch(self):
+        """Hold back the property monitors until end_monitor_batch(), for a
+        group of writes that should look like one change."""
+        if _debug: Object._debug("begin_monitor_batch")
+
+        if '_monitor_batch' not in self.__dict__:
+            self._monitor_batch = []
+
+    def end_monitor_batch(self):
+        """Call the monitors held back since begin_monitor_batch(), once per
+        property with its value before the first write and after the last."""
+        if _debug: Object._debug("end_monitor_batch")
+
+        batch = self.__dict__.pop('_monitor_batch', None)
+        if not batch:
+            return
+
+        changes = {}
+        for identifier, old_value, value in batch:
+            if identifier in changes:
+                changes[identifier] = (changes[identifier][0], value)
+            else:
+                changes[identifier] = (old_value, value)
+        if _debug: Object._debug("    - changes: %r", changes)
+
+        for identifier, (old_value, value) in changes.items():
+            for fn in self._property_monitors[identifier]:
+                if _debug: Object._debug("    - monitor: %r", fn)
+                fn(old_value, value)
 
     def get_datatype(self, propid):
         """Return the datatype for the property of an object."""
         if _debug: Object._debug("get_datatype %r", propid)
 
         # get the property
-        prop = self._properties.get(propid)
-        if not prop:
+        entry = self._property_table.get(propid)
+        if not entry:
             raise PropertyError(propid)
 
         # return the datatype
-        return prop.datatype
+        return entry[1]
 
     def _dict_contents(self, use_dict=None, as_class=dict):
         """Return the contents of an object as a dict."""
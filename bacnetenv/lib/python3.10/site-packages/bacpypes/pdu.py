@@ -52,6 +52,14 @@ combined_pattern = re.compile("^(?:(?:([0-9]+)|([*])):)?(?:([*])|" + _field_addr
 
 @bacpypes_debugging
 class Address:
+
+    # the IP fields are only there for addresses that have them
+    __slots__ = (
+        'addrType', 'addrNet', 'addrAddr', 'addrLen', 'addrRoute',
+        'addrIP', 'addrMask', 'addrHost', 'addrSubnet', 'addrPort',
+        'addrTuple', 'addrBroadcastTuple',
+        )
+
     nullAddr = 0
     localBroadcastAddr = 1
     localStationAddr = 2
@@ -502,6 +510,8 @@ def unpack_ip_addr(addr):
 
 class LocalStation(Address):
 
+    __slots__ = ()
+
     def __init__(self, addr, route=None):
         self.addrType = Address.localStationAddr
         self.addrNet = None
@@ -529,6 +539,8 @@ class LocalStation(Address):
 
 class RemoteStation(Address):
 
+    __slots__ = ()
+
     def __init__(self, net, addr, route=None):
         if not isinstance(net, int):
             raise TypeError("integer network required")
@@ -561,6 +573,8 @@ class RemoteStation(Address):
 
 class LocalBroadcast(Address):
 
+    __slots__ = ()
+
     def __init__(self, route=None):
         self.addrType = Address.localBroadcastAddr
         self.addrNet = None
@@ -574,6 +588,8 @@ class LocalBroadcast(Address):
 
 class RemoteBroadcast(Address):
 
+    __slots__ = ()
+
     def __init__(self, net, route=None):
         if not isinstance(net, int):
             raise TypeError("integer network required")
@@ -592,6 +608,8 @@ class RemoteBroadcast(Address):
 
 class GlobalBroadcast(Address):
 
+    __slots__ = ()
+
     def __init__(self, route=None):
         self.addrType = Address.globalBroadcastAddr
         self.addrNet = None
@@ -611,24 +629,17 @@ class PCI(_PCI):
     def __init__(self, *args, **kwargs):
         if _debug: PCI._debug("__init__ %r %r", args, kwargs)
 
-        # split out the keyword arguments that belong to this class
-        my_kwargs = {}
-        other_kwargs = {}
-        for element in ('expectingReply', 'networkPriority'):
-            if element in kwargs:
-                my_kwargs[element] = kwargs[element]
-        for kw in kwargs:
-            if kw not in my_kwargs:
-                other_kwargs[kw] = kwargs[kw]
-        if _debug: PCI._debug("    - my_kwargs: %r", my_kwargs)
-        if _debug: PCI._debug("    - other_kwargs: %r", other_kwargs)
+        # take out the keyword arguments that belong to this class, kwargs
+        # is our own copy
+        expecting_reply = kwargs.pop('expectingReply', 0)
+        network_priority = kwargs.pop('networkPriority', 0)
 
         # call some superclass, if there is one
-        super(PCI, self).__init__(*args, **other_kwargs)
+        super(PCI, self).__init__(*args, **kwargs)
 
         # set the attribute/property values for the ones provided
-        self.pduExpectingReply = my_kwargs.get('expectingReply', 0)     # see 6.2.2 (1 or 0)
-        self.pduNetworkPriority = my_kwargs.get('networkPriority', 0)   # see 6.2.2 (0..3)
+        self.pduExpectingReply = expecting_reply        # see 6.2.2 (1 or 0)
+        self.pduNetworkPriority = network_priority      # see 6.2.2 (0..3)
 
     def update(self, pci):
         """Copy the PCI fields."""
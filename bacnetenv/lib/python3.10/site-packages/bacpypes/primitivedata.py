@@ -28,6 +28,8 @@ _log = ModuleLogger(globals())
 
 class Tag(object):
 
+    __slots__ = ('tagClass', 'tagNumber', 'tagLVT', 'tagData')
+
     applicationTagClass     = 0
     contextTagClass         = 1
     openingTagClass         = 2
@@ -58,6 +60,9 @@ class Tag(object):
         ]
     _app_tag_class = [] # defined later
 
+    # initial octet bits of each tag class
+    _class_bits = (0x00, 0x08, 0x0E, 0x0F)
+
     def __init__(self, *args):
         self.tagClass = None
         self.tagNumber = None
@@ -98,43 +103,34 @@ class Tag(object):
 
     def encode(self, pdu):
         """Encode a tag on the end of the PDU."""
-        # check for special encoding
-        if (self.tagClass == Tag.contextTagClass):
-            data = 0x08
-        elif (self.tagClass == Tag.openingTagClass):
-            data = 0x0E
-        elif (self.tagClass == Tag.closingTagClass):
-            data = 0x0F
-        else:
-            data = 0x00
-
-        # encode the tag number part
-        if (self.tagNumber < 15):
-            data += (self.tagNumber << 4)
+        tagNumber = self.tagNumber
+        tagLVT = self.tagLVT
+
+        # the class bits, the tag number part and the length/value/type part
+        data = Tag._class_bits[self.tagClass]
+        data += (tagNumber << 4) if (tagNumber < 15) else 0xF0
+        data += tagLVT if (tagLVT < 5) else 0x05
+
+        # the common case is one octet, otherwise build the extended tag
+        # number and length and append the header in one piece
+        if (tagNumber < 15) and (tagLVT < 5):
+            pdu.put( data )
         else:
-            data += 0xF0
-
-        # encode the length/value/type part
-        if (self.tagLVT < 5):
-            data += self.tagLVT
-        else:
-            data += 0x05
-
-        # save this and the extended tag value
-        pdu.put( data )
-        if (self.tagNumber >= 15):
-            pdu.put(self.tagNumber)
-
-        # really short lengths are already done
-        if (self.tagLVT >= 5):
-            if (self.tagLVT <= 253):
-                pdu.put( self.tagLVT )
-            elif (self.tagLVT <= 65535):
-                pdu.put( 254 )
-                pdu.put_short( self.tagLVT )
-            else:
-                pdu.put( 255 )
-                pdu.put_long( self.tagLVT )
+            header = bytearray((data,))
+            if (tagNumber >= 15):
+                header.append(tagNumber)
+
+            # really short lengths are already done
+            if (tagLVT >= 5):
+                if (tagLVT <= 253):
+                    header.append(tagLVT)
+                elif (tagLVT <= 65535):
+                    header.append(254)
+                    header += struct.pack('>H', tagLVT)
+                else:
+                    header.append(255)
+                    header += struct.pack('>L', tagLVT)
+            pdu.put_data(header)
 
         # now put the data
         pdu.put_data(self.tagData)
@@ -172,8 +168,8 @@ class Tag(object):
                 # tagLVT contains value
                 self.tagData = b''
             else:
-                # tagLVT contains length
-                self.tagData = pdu.get_data(self.tagLVT)
+                # tagLVT contains length, one copy of just the tag data
+                self.tagData = pdu.get_view(self.tagLVT).tobytes()
         except DecodingError:
             raise InvalidTag("invalid tag encoding")
 
@@ -274,6 +270,8 @@ class Tag(object):
 
 class ApplicationTag(Tag):
 
+    __slots__ = ()
+
     def __init__(self, *args):
         if len(args) == 1 and isinstance(args[0], PDUData):
             Tag.__init__(self, args[0])
@@ -291,6 +289,8 @@ class ApplicationTag(Tag):
 
 class ContextTag(Tag):
 
+    __slots__ = ()
+
     def __init__(self, *args):
         if len(args) == 1 and isinstance(args[0], PDUData):
             Tag.__init__(self, args[0])
@@ -308,6 +308,8 @@ class ContextTag(Tag):
 
 class OpeningTag(Tag):
 
+    __slots__ = ()
+
     def __init__(self, context):
         if isinstance(context, PDUData):
             Tag.__init__(self, context)
@@ -324,6 +326,8 @@ class OpeningTag(Tag):
 
 class ClosingTag(Tag):
 
+    __slots__ = ()
+
     def __init__(self, context):
         if isinstance(context, PDUData):
             Tag.__init__(self, context)
@@ -340,32 +344,56 @@ class ClosingTag(Tag):
 
 class TagList(object):
 
+    """A list of tags that decoders consume from the front.  Popping moves
+    a read index along instead of shifting the list, the consumed tags are
+    only dropped when the whole list is asked for (tagList)."""
+
+    __slots__ = ('_tags', '_index')
+
     def __init__(self, arg=None):
-        self.tagList = []
+        self._tags = []
+        self._index = 0
 
         if isinstance(arg, list):
-            self.tagList = arg
+            self._tags = arg
         elif isinstance(arg, TagList):
-            self.tagList = arg.tagList[:]
+            self._tags = arg.tagList[:]
         elif isinstance(arg, PDUData):
             self.decode(arg)
 
+    def _get_tag_list(self):
+        if self._index:
+            del self._tags[:self._index]
+            self._index = 0
+        return self._tags
+
+    def _set_tag_list(self, tags):
+        self._tags = tags
+        self._index = 0
+
+    tagList = property(_get_tag_list, _set_tag_list)
+
     def append(self, tag):
-        self.tagList.append(tag)
+        self._tags.append(tag)
 
     def extend(self, taglist):
-        self.tagList.extend(taglist)
+        self._tags.extend(taglist)
 
     def __getitem__(self, item):
-        return self.tagList[item]
+        if isinstance(item, int) and item >= 0:
+            return self._tags[self._index + item]
+        return self._tags[self._index:][item]
 
     def __len__(self):
-        return len(self.tagList)
+        return len(self._tags) - self._index
+
+    def __iter__(self):
+        return iter(self._tags[self._index:])
 
     def Peek(self):
         """Return the tag at the front of the list."""
-        if self.tagList:
-            tag = self.tagList[0]
+        if self._index < len(self._tags):
+            tag = self._tags[self._index]
         else:
             tag = None
 
@@ -373,24 +401,35 @@ class TagList(object):
 
     def push(self, tag):
         """Return a tag back to the front of the list."""
-        self.tagList = [tag] + self.tagList
+        self._tags.insert(self._index, tag)
 
     def Pop(self):
         """Remove the tag from the front of the list and return it."""
-        if self.tagList:
-            tag = self.tagList[0]
-            del self.tagList[0]
+        if self._index < len(self._tags):
+            tag = self._tags[self._index]
+            self._index += 1
         else:
             tag = None
 
         return tag
 
+    def mark(self):
+        """Return a position that restore() can go back to, for decoders
+        that try a structure and back out if it doesn't fit."""
+        return len(self._tags) - self._index
+
+    def restore(self, mark):
+        """Put back the tags popped since mark()."""
+        self._index = len(self._tags) - mark
+
     def get_context(self, context):
         """Return a tag or a list of tags context encoded."""
+        tags = self._tags
+
         # forward pass
-        i = 0
-        while i < len(self.tagList):
-            tag = self.tagList[i]
+        i = self._index
+        while i < len(tags):
+            tag = tags[i]
 
             # skip application stuff
             if tag.tagClass == Tag.applicationTagClass:
@@ -407,8 +446,8 @@ class TagList(object):
                 rslt = []
                 i += 1
                 lvl = 0
-                while i < len(self.tagList):
-                    tag = self.tagList[i]
+                while i < len(tags):
+                    tag = tags[i]
                     if tag.tagClass == Tag.openingTagClass:
                         lvl += 1
                     elif tag.tagClass == Tag.closingTagClass:
@@ -436,23 +475,60 @@ class TagList(object):
 
     def encode(self, pdu):
         """encode the tag list into a PDU."""
-        for tag in self.tagList:
+        for tag in self:
             tag.encode(pdu)
 
     def decode(self, pdu):
         """decode the tags from a PDU."""
-        while pdu.pduData:
-            self.tagList.append( Tag(pdu) )
+        append = self._tags.append
+        while pdu.remaining():
+            append( Tag(pdu) )
 
     def debug_contents(self, indent=1, file=sys.stdout, _ids=None):
-        for tag in self.tagList:
+        for tag in self:
             tag.debug_contents(indent+1, file, _ids)
 
+#
+#   EncodedTags
+#
+
+class EncodedTags(object):
+
+    """Tags that have already been encoded.  It goes in a TagList that is
+    about to be encoded in place of the tags themselves and its encode()
+    copies the octets, it is not something a decoder can take apart."""
+
+    __slots__ = ('tagData',)
+
+    def __init__(self, taglist):
+        pdu = PDUData()
+        taglist.encode(pdu)
+        self.tagData = bytes(pdu.data_view())
+
+    def encode(self, pdu):
+        pdu.put_data(self.tagData)
+
+    def debug_contents(self, indent=1, file=sys.stdout, _ids=None):
+        file.write("%sencoded tags = '%s'\n" % ("    " * indent, btox(self.tagData, '.')))
+
 #
 #   Atomic
 #
 
-class Atomic(object):
+class _AtomicMetaclass(type):
+
+    """Atomic values are made by the thousand and all they have is a value
+    (a few have a little more), so they are slotted.  A derived class that
+    doesn't give __slots__ gets empty ones rather than a __dict__, add
+    '__dict__' to its __slots__ if it needs other instance attributes."""
+
+    def __new__(cls, name, bases, namespace, **kwargs):
+        namespace.setdefault('__slots__', ())
+        return super(_AtomicMetaclass, cls).__new__(cls, name, bases, namespace, **kwargs)
+
+class Atomic(object, metaclass=_AtomicMetaclass):
+
+    __slots__ = ('value',)
 
     _app_tag = None
 
@@ -505,6 +581,9 @@ class Atomic(object):
         raise NotImplementedError("call on a derived class of Atomic")
 
 class CommonMath:
+
+    __slots__ = ()
+
     def __add__(self, other):
         return self.value + other.value if isinstance(other, Atomic) else (self.value + other)
 
@@ -918,6 +997,8 @@ class OctetString(Atomic):
 
 class CharacterString(Atomic):
 
+    __slots__ = ('strEncoding', 'strValue')
+
     _app_tag = Tag.characterStringAppTag
 
     def __init__(self, arg=None):
@@ -1143,6 +1224,7 @@ class Enumerated(Atomic):
 
     enumerations = {}
     _xlate_table = {}
+    _xlate_octets = {}
 
     def __init__(self, arg=None):
         self.value = int(0)
@@ -1217,19 +1299,21 @@ class Enumerated(Atomic):
             return 0
 
     def encode(self, tag):
-        if isinstance(self.value, int):
-            value = int(self.value)
-        elif isinstance(self.value, str):
-            value = self._xlate_table[self.value]
-        else:
-            raise TypeError("%s is an invalid enumeration value datatype" % (type(self.value),))
+        # the octets of a name are worked out once for the class
+        data = self._xlate_octets.get(self.value)
+        if data is None:
+            if isinstance(self.value, int):
+                value = int(self.value)
+            elif isinstance(self.value, str):
+                value = self._xlate_table[self.value]
+            else:
+                raise TypeError("%s is an invalid enumeration value datatype" % (type(self.value),))
 
-        # rip apart the number
-        data = bytearray(struct.pack('>L', value))
+            # rip apart the number, reduced to the smallest number of octets
+            data = struct.pack('>L', value).lstrip(b'\x00') or b'\x00'
 
-        # reduce the value to the smallest number of octets
-        while (len(data) > 1) and (data[0] == 0):
-            del data[0]
+            if isinstance(self.value, str):
+                self._xlate_octets[self.value] = data
 
         # encode the tag
         tag.set_app_data(Tag.enumeratedAppTag, data)
@@ -1241,9 +1325,7 @@ class Enumerated(Atomic):
             raise InvalidTag("invalid tag length")
 
         # get the data
-        rslt = 0
-        for c in tag.tagData:
-            rslt = (rslt << 8) + c
+        rslt = int.from_bytes(tag.tagData, 'big')
 
         # translate to a string if possible
         rslt = self._xlate_table.get(rslt, rslt)
@@ -1284,8 +1366,9 @@ def expand_enumerations(klass):
                 # save the name in the class
                 setattr(klass, name, value)
 
-    # save the dictionary in the class
+    # save the dictionary in the class, and start one for the encoded names
     setattr(klass, '_xlate_table', xlateTable)
+    setattr(klass, '_xlate_octets', {})
 
 #
 #   Date
@@ -1731,7 +1814,9 @@ class ObjectIdentifier(Atomic):
             pass
         elif len(args) == 1:
             arg = args[0]
-            if isinstance(arg, Tag):
+            if isinstance(arg, tuple):
+                self.set_tuple(*arg)
+            elif isinstance(arg, Tag):
                 self.decode(arg)
             elif isinstance(arg, int):
                 self.set_long(arg)
@@ -1745,8 +1830,6 @@ class ObjectIdentifier(Atomic):
                     raise ValueError("invalid format")
 
                 self.set_tuple(objType, objInstance)
-            elif isinstance(arg, tuple):
-                self.set_tuple(*arg)
             elif isinstance(arg, ObjectIdentifier):
                 self.value = arg.value
             else:
@@ -1756,6 +1839,14 @@ class ObjectIdentifier(Atomic):
         else:
             raise ValueError("invalid constructor parameters")
 
+    def _object_types(self):
+        """The translation table of the object type class, without making
+        an instance of it every time."""
+        klass = self.objectTypeClass
+        if '_xlate_table' not in klass.__dict__:
+            expand_enumerations(klass)
+        return klass._xlate_table
+
     def set_tuple(self, objType, objInstance):
         # allow a type name as well as an integer
         if isinstance(objType, int):
@@ -1783,7 +1874,7 @@ class ObjectIdentifier(Atomic):
             pass
         elif isinstance(objType, str):
             # turn it back into an integer
-            objType = self.objectTypeClass()[objType]
+            objType = self._object_types().get(objType)
         else:
             raise TypeError("invalid datatype for objType")
 
@@ -1795,7 +1886,7 @@ class ObjectIdentifier(Atomic):
         objType = (value >> 22) & 0x03FF
 
         # try and make it pretty
-        objType = self.objectTypeClass()[objType] or objType
+        objType = self._object_types().get(objType) or objType
 
         # suck out the instance
         objInstance = value & 0x003FFFFF
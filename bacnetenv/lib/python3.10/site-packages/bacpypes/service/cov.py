@@ -13,8 +13,10 @@ from ..iocb import IOCB
 
 from ..basetypes import DeviceAddress, COVSubscription, PropertyValue, \
     Recipient, RecipientProcess, ObjectPropertyReference
+from ..pdu import PDUData
+from ..primitivedata import Tag, ContextTag, TagList, EncodedTags, Unsigned
 from ..constructeddata import ListOf, Any
-from ..apdu import ConfirmedCOVNotificationRequest, \
+from ..apdu import COVNotificationParameters, ConfirmedCOVNotificationRequest, \
     UnconfirmedCOVNotificationRequest, \
     SimpleAckPDU, Error, RejectPDU, AbortPDU
 from ..errors import ExecutionError
@@ -33,34 +35,28 @@ _log = ModuleLogger(globals())
 @bacpypes_debugging
 class SubscriptionList:
 
+    """The subscriptions of one object by subscription_key(), kept in the
+    order they were made."""
+
     def __init__(self):
         if _debug: SubscriptionList._debug("__init__")
 
-        self.cov_subscriptions = []
+        self.cov_subscriptions = {}
 
     def append(self, cov):
         if _debug: SubscriptionList._debug("append %r", cov)
 
-        self.cov_subscriptions.append(cov)
+        self.cov_subscriptions[cov.key] = cov
 
     def remove(self, cov):
         if _debug: SubscriptionList._debug("remove %r", cov)
 
-        self.cov_subscriptions.remove(cov)
+        del self.cov_subscriptions[cov.key]
 
     def find(self, client_addr, proc_id, obj_id):
         if _debug: SubscriptionList._debug("find %r %r %r", client_addr, proc_id, obj_id)
 
-        for cov in self.cov_subscriptions:
-            all_equal = (cov.client_addr == client_addr) and \
-                (cov.proc_id == proc_id) and \
-                (cov.obj_id == obj_id)
-            if _debug: SubscriptionList._debug("    - cov, all_equal: %r %r", cov, all_equal)
-
-            if all_equal:
-                return cov
-
-        return None
+        return self.cov_subscriptions.get(subscription_key(client_addr, proc_id, obj_id), None)
 
     def __len__(self):
         if _debug: SubscriptionList._debug("__len__")
@@ -70,10 +66,18 @@ class SubscriptionList:
     def __iter__(self):
         if _debug: SubscriptionList._debug("__iter__")
 
-        for cov in self.cov_subscriptions:
-            yield cov
+        return iter(list(self.cov_subscriptions.values()))
 
 
+#
+#   subscription_key
+#
+
+def subscription_key(client_addr, proc_id, obj_id):
+    """The key of a subscription in the registries.  An address hashes by
+    building its tuple form every time, build it once instead."""
+    return (client_addr._tuple(), proc_id, obj_id)
+
 #
 #   Subscription
 #
@@ -105,6 +109,14 @@ class Subscription(OneShotTask, DebugContents):
         self.lifetime = lifetime
         self.covIncrement = cov_inc
 
+        # how the registries find it
+        self.key = subscription_key(client_addr, proc_id, obj_id)
+
+        # the notification waiting in the scheduler and when the last one
+        # was sent
+        self.pending_notification = None
+        self.last_notification = None
+
         # if lifetime is zero this is a permanent subscription
         if lifetime > 0:
             self.install_task(delta=self.lifetime)
@@ -138,6 +150,52 @@ class Subscription(OneShotTask, DebugContents):
         # subscription is canceled
         self.cancel_subscription()
 
+#
+#   EncodedCOVNotification
+#
+
+def _context_unsigned(context, value):
+    """The octets of a context tagged unsigned, what encoding a ContextTag
+    with Unsigned(value) data produces."""
+    data = value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big')
+    if (context >= 15) or (len(data) >= 5):
+        tag = Tag()
+        Unsigned(value).encode(tag)
+        pdu = PDUData()
+        ContextTag(context, tag.tagData).encode(pdu)
+        return bytes(pdu.pduData)
+
+    # class bits, tag number and length in the first octet
+    return bytes((0x08 | (context << 4) | len(data),)) + data
+
+@bacpypes_debugging
+class _EncodedCOVNotification(object):
+
+    """A COV notification whose initiating device and monitored object
+    identifiers and list of values were encoded once for all of the
+    subscribers, encoding it only adds the subscriber process identifier
+    and the time remaining."""
+
+    def encode(self, apdu):
+        if _debug: _EncodedCOVNotification._debug("encode %r", apdu)
+
+        # copy the header fields
+        apdu.update(self)
+
+        # splice the subscriber fields in with the encoded ones
+        apdu.put_data(b''.join((
+            _context_unsigned(0, self.subscriberProcessIdentifier),
+            self._encoded_identifiers.tagData,
+            _context_unsigned(3, self.timeRemaining),
+            self._encoded_values.tagData,
+            )))
+
+class EncodedConfirmedCOVNotificationRequest(_EncodedCOVNotification, ConfirmedCOVNotificationRequest):
+    pass
+
+class EncodedUnconfirmedCOVNotificationRequest(_EncodedCOVNotification, UnconfirmedCOVNotificationRequest):
+    pass
+
 #
 #   COVDetection
 #
@@ -232,6 +290,12 @@ class COVDetection(DetectionAlgorithm):
         else:
             notification_list = self.cov_subscriptions
 
+        # the parts every subscriber of an object gets are encoded once,
+        # unless there is only the one
+        initiating_device = self.obj._app.localDevice.objectIdentifier
+        shared_encoding = len(notification_list) > 1
+        encoded_parts = {}
+
         # loop through the subscriptions and send out notifications
         for cov in notification_list:
             if _debug: COVDetection._debug("    - cov: %s", repr(cov))
@@ -247,15 +311,28 @@ class COVDetection(DetectionAlgorithm):
                     time_remaining = 1
 
             # build a request with the correct type
-            if cov.confirmed:
-                request = ConfirmedCOVNotificationRequest()
+            if not shared_encoding:
+                if cov.confirmed:
+                    request = ConfirmedCOVNotificationRequest()
+                else:
+                    request = UnconfirmedCOVNotificationRequest()
             else:
-                request = UnconfirmedCOVNotificationRequest()
+                if cov.confirmed:
+                    request = EncodedConfirmedCOVNotificationRequest()
+                else:
+                    request = EncodedUnconfirmedCOVNotificationRequest()
+
+                parts = encoded_parts.get(cov.obj_id)
+                if parts is None:
+                    parts = encoded_parts[cov.obj_id] = self.encode_notification_parts(
+                        initiating_device, cov.obj_id, list_of_values,
+                        )
+                request._encoded_identifiers, request._encoded_values = parts
 
             # fill in the parameters
             request.pduDestination = cov.client_addr
             request.subscriberProcessIdentifier = cov.proc_id
-            request.initiatingDeviceIdentifier = self.obj._app.localDevice.objectIdentifier
+            request.initiatingDeviceIdentifier = initiating_device
             request.monitoredObjectIdentifier = cov.obj_id
             request.timeRemaining = time_remaining
             request.listOfValues = list_of_values
@@ -264,6 +341,28 @@ class COVDetection(DetectionAlgorithm):
             # let the application send it
             self.obj._app.cov_notification(cov, request)
 
+    def encode_notification_parts(self, initiating_device, obj_id, list_of_values):
+        """Encode the identifiers and the list of values of a notification,
+        returns a pair of EncodedTags."""
+        if _debug: COVDetection._debug("encode_notification_parts %r %r", initiating_device, obj_id)
+
+        # encode all of the parameters with placeholders for the subscriber
+        # fields, the tags come out in element order
+        parameters = COVNotificationParameters(
+            subscriberProcessIdentifier=0,
+            initiatingDeviceIdentifier=initiating_device,
+            monitoredObjectIdentifier=obj_id,
+            timeRemaining=0,
+            listOfValues=list_of_values,
+            )
+        tag_list = TagList()
+        parameters.encode(tag_list)
+        tags = tag_list.tagList
+
+        # [0] process identifier, [1] [2] identifiers, [3] time remaining,
+        # [4:] the list of values between its opening and closing tags
+        return EncodedTags(TagList(tags[1:3])), EncodedTags(TagList(tags[4:]))
+
     def __str__(self):
         return "<" + self.__class__.__name__ + \
             "(" + ','.join(self.properties_tracked) + ')' + \
@@ -579,6 +678,120 @@ class ActiveCOVSubscriptions(Property):
         raise ExecutionError(errorClass='property', errorCode='writeAccessDenied')
 
 
+#
+#   COVNotificationScheduler
+#
+
+@bacpypes_debugging
+class COVNotificationScheduler(OneShotTask):
+
+    """Holds the latest notification of each subscription until it may go
+    out.  A subscription gets at most one every cov_notification_interval
+    seconds, a subscriber has at most cov_max_outstanding confirmed
+    notifications waiting for an answer, and a pass sends at most
+    cov_notifications_per_pass so a burst is spread over loop iterations.
+    A change that comes in while a notification is waiting replaces it."""
+
+    def __init__(self, app):
+        if _debug: COVNotificationScheduler._debug("__init__ %r", app)
+        OneShotTask.__init__(self)
+
+        self.app = app
+
+        # subscriber address tuple -> {subscription key: subscription} of
+        # the subscriptions with a notification waiting, subscribers are
+        # served round robin and their subscriptions in the order they
+        # started waiting
+        self.waiting = {}
+
+    def submit(self, cov, request):
+        if _debug: COVNotificationScheduler._debug("submit %r %r", cov, request)
+
+        # latest values win, a replaced notification keeps its place
+        cov.pending_notification = request
+
+        client_waiting = self.waiting.get(cov.key[0])
+        if client_waiting is None:
+            client_waiting = self.waiting[cov.key[0]] = {}
+        client_waiting[cov.key] = cov
+
+        self.wakeup(0.0)
+
+    def discard(self, cov):
+        if _debug: COVNotificationScheduler._debug("discard %r", cov)
+
+        cov.pending_notification = None
+
+        client_waiting = self.waiting.get(cov.key[0])
+        if client_waiting and client_waiting.pop(cov.key, None) and not client_waiting:
+            del self.waiting[cov.key[0]]
+
+    def wakeup(self, delta):
+        """Run a pass delta seconds from now unless one is due sooner."""
+        when = TaskManager().get_time() + delta
+        if self.isScheduled and (self.taskTime <= when):
+            return
+
+        self.install_task(when)
+
+    def process_task(self):
+        if _debug: COVNotificationScheduler._debug("process_task")
+
+        app = self.app
+        interval = app.cov_notification_interval
+        max_outstanding = app.cov_max_outstanding
+        budget = app.cov_notifications_per_pass
+
+        current_time = TaskManager().get_time()
+        next_time = None
+
+        for client_key in list(self.waiting):
+            if not budget:
+                break
+
+            # to the back of the line
+            client_waiting = self.waiting.pop(client_key)
+
+            for key, cov in list(client_waiting.items()):
+                if not budget:
+                    break
+
+                # the rest of this subscriber's notifications wait for an
+                # answer, the confirmation starts another pass
+                if cov.confirmed and (max_outstanding is not None) \
+                        and (app.cov_outstanding.get(client_key, 0) >= max_outstanding):
+                    break
+
+                # too soon after the last one
+                if interval and (cov.last_notification is not None):
+                    ready_time = cov.last_notification + interval
+                    if ready_time > current_time:
+                        if (next_time is None) or (ready_time < next_time):
+                            next_time = ready_time
+                        continue
+
+                del client_waiting[key]
+                request, cov.pending_notification = cov.pending_notification, None
+                cov.last_notification = current_time
+                budget -= 1
+
+                # it may have waited, bring the time remaining up to date
+                if cov.lifetime:
+                    request.timeRemaining = int(cov.taskTime - current_time) or 1
+                if _debug: COVNotificationScheduler._debug("    - send: %r", request)
+
+                app.send_cov_notification(cov, request)
+
+            if client_waiting:
+                self.waiting[client_key] = client_waiting
+
+        # more in the next loop iteration, or when the next one is ready
+        if self.waiting:
+            if not budget:
+                self.wakeup(0.0)
+            elif next_time is not None:
+                self.wakeup(next_time - current_time)
+
 #
 #   ChangeOfValueServices
 #
@@ -586,13 +799,35 @@ class ActiveCOVSubscriptions(Property):
 @bacpypes_debugging
 class ChangeOfValueServices(Capability):
 
+    # notifications to one subscription are at least this many seconds
+    # apart, the changes in between are coalesced into the latest values
+    cov_notification_interval = 0.0
+
+    # confirmed notifications a subscriber may have waiting for an answer,
+    # None for no limit
+    cov_max_outstanding = None
+
+    # notifications sent per scheduler pass, the rest go out in the next
+    # loop iteration
+    cov_notifications_per_pass = 50
+
     def __init__(self):
         if _debug: ChangeOfValueServices._debug("__init__")
         Capability.__init__(self)
 
+        # notifications go out through the scheduler, the number of
+        # confirmed ones outstanding by subscriber address tuple
+        self.cov_scheduler = COVNotificationScheduler(self)
+        self.cov_outstanding = {}
+
         # map from an object to its detection algorithm
         self.cov_detections = {}
 
+        # every subscription by its subscription_key(), and the subscriptions
+        # of each client (by address tuple) by the same key
+        self.cov_subscriptions = {}
+        self.cov_clients = {}
+
         # if there is a local device object, make sure it has an active COV
         # subscriptions property
         if self.localDevice and self.localDevice.activeCovSubscriptions is None:
@@ -604,6 +839,13 @@ class ChangeOfValueServices(Capability):
         # let the detection algorithm know this is a new or additional subscription
         self.cov_detections[cov.obj_ref].add_subscription(cov)
 
+        # index it
+        self.cov_subscriptions[cov.key] = cov
+        client_subscriptions = self.cov_clients.get(cov.key[0])
+        if client_subscriptions is None:
+            client_subscriptions = self.cov_clients[cov.key[0]] = {}
+        client_subscriptions[cov.key] = cov
+
     def cancel_subscription(self, cov):
         if _debug: ChangeOfValueServices._debug("cancel_subscription %r", cov)
 
@@ -623,18 +865,44 @@ class ChangeOfValueServices(Capability):
             # delete it from the object map
             del self.cov_detections[cov.obj_ref]
 
+        # drop a notification still waiting to go out
+        self.cov_scheduler.discard(cov)
+
+        # take it out of the indexes
+        del self.cov_subscriptions[cov.key]
+        client_subscriptions = self.cov_clients[cov.key[0]]
+        del client_subscriptions[cov.key]
+        if not client_subscriptions:
+            del self.cov_clients[cov.key[0]]
+
+    def cancel_client_subscriptions(self, client_addr):
+        """Cancel all of the subscriptions of a client, for example one that
+        is known to have gone away."""
+        if _debug: ChangeOfValueServices._debug("cancel_client_subscriptions %r", client_addr)
+
+        for cov in list(self.cov_clients.get(client_addr._tuple(), {}).values()):
+            cov.cancel_subscription()
+
     def subscriptions(self):
         """Generator for the active subscriptions."""
         if _debug: ChangeOfValueServices._debug("subscriptions")
 
-        # loop through the object and detection list
-        for obj, cov_detection in self.cov_detections.items():
-            for cov in cov_detection.cov_subscriptions:
-                yield cov
+        for cov in list(self.cov_subscriptions.values()):
+            yield cov
 
     def cov_notification(self, cov, request):
         if _debug: ChangeOfValueServices._debug("cov_notification %s %s", str(cov), str(request))
 
+        # the scheduler sends it when it may
+        self.cov_scheduler.submit(cov, request)
+
+    def send_cov_notification(self, cov, request):
+        if _debug: ChangeOfValueServices._debug("send_cov_notification %s %s", str(cov), str(request))
+
+        # count the confirmed ones until they are answered
+        if cov.confirmed:
+            self.cov_outstanding[cov.key[0]] = self.cov_outstanding.get(cov.key[0], 0) + 1
+
         # create an IOCB with the request
         iocb = IOCB(request)
         if _debug: ChangeOfValueServices._debug("    - iocb: %r", iocb)
@@ -649,6 +917,18 @@ class ChangeOfValueServices(Capability):
     def cov_confirmation(self, iocb):
         if _debug: ChangeOfValueServices._debug("cov_confirmation %r", iocb)
 
+        # one less outstanding, the subscriber may have more waiting
+        if iocb.cov.confirmed:
+            client_key = iocb.cov.key[0]
+            outstanding = self.cov_outstanding[client_key] - 1
+            if outstanding:
+                self.cov_outstanding[client_key] = outstanding
+            else:
+                del self.cov_outstanding[client_key]
+
+            if client_key in self.cov_scheduler.waiting:
+                self.cov_scheduler.wakeup(0.0)
+
         # do something for success
         if iocb.ioResponse:
             if _debug: ChangeOfValueServices._debug("    - ack")
@@ -683,91 +963,24 @@ class ChangeOfValueServices(Capability):
     def do_SubscribeCOVRequest(self, apdu):
         if _debug: ChangeOfValueServices._debug("do_SubscribeCOVRequest %r", apdu)
 
-        # extract the pieces
-        client_addr = apdu.pduSource
-        proc_id = apdu.subscriberProcessIdentifier
-        obj_id = apdu.monitoredObjectIdentifier
-        confirmed = apdu.issueConfirmedNotifications
-        lifetime = apdu.lifetime
-
-        # request is to cancel the subscription
-        cancel_subscription = (confirmed is None) and (lifetime is None)
-
-        # find the object
-        obj = self.get_object_id(obj_id)
-        if _debug: ChangeOfValueServices._debug("    - object: %r", obj)
-        if not obj:
-            raise ExecutionError(errorClass='object', errorCode='unknownObject')
-
-        # check to see if the object supports COV
-        if not obj._object_supports_cov:
-            raise ExecutionError(errorClass='services', errorCode='covSubscriptionFailed')
-
-        # look for an algorithm already associated with this object
-        cov_detection = self.cov_detections.get(obj, None)
-
-        # if there isn't one, make one and associate it with the object
-        if not cov_detection:
-            # look for an associated class and if it's not there it's not supported
-            criteria_class = criteria_type_map.get(obj_id[0], None)
-            if not criteria_class:
-                raise ExecutionError(errorClass='services', errorCode='covSubscriptionFailed')
-
-            # make one of these and bind it to the object
-            cov_detection = criteria_class(obj)
-
-            # keep track of it for other subscriptions
-            self.cov_detections[obj] = cov_detection
-        if _debug: ChangeOfValueServices._debug("    - cov_detection: %r", cov_detection)
-
-        # can a match be found?
-        cov = cov_detection.cov_subscriptions.find(client_addr, proc_id, obj_id)
-        if _debug: ChangeOfValueServices._debug("    - cov: %r", cov)
-
-        # if a match was found, update the subscription
-        if cov:
-            if cancel_subscription:
-                if _debug: ChangeOfValueServices._debug("    - cancel the subscription")
-                self.cancel_subscription(cov)
-            else:
-                if _debug: ChangeOfValueServices._debug("    - renew the subscription")
-                cov.renew_subscription(lifetime)
-        else:
-            if cancel_subscription:
-                if _debug: ChangeOfValueServices._debug("    - cancel a subscription that doesn't exist")
-            else:
-                if _debug: ChangeOfValueServices._debug("    - create a subscription")
-
-                # make a subscription
-                cov = Subscription(obj, client_addr, proc_id, obj_id, confirmed, lifetime, None)
-                if _debug: ChangeOfValueServices._debug("    - cov: %r", cov)
-
-                # add it to our subscriptions lists
-                self.add_subscription(cov)
-
-        # success
-        response = SimpleAckPDU(context=apdu)
-
-        # return the result
-        self.response(response)
-
-        # if the subscription is not being canceled, it is new or renewed,
-        # so send it a notification when you get a chance.
-        if not cancel_subscription:
-            if _debug: ChangeOfValueServices._debug("    - send a notification")
-            deferred(cov_detection.send_cov_notifications, cov)
+        self.subscribe_cov(apdu, None)
 
     def do_SubscribeCOVPropertyRequest(self, apdu):
         if _debug: ChangeOfValueServices._debug("do_SubscribeCOVPropertyRequest %r", apdu)
 
+        self.subscribe_cov(apdu, apdu.covIncrement)
+
+    def subscribe_cov(self, apdu, cov_inc):
+        """Create, renew or cancel the subscription of a SubscribeCOV or
+        SubscribeCOVProperty request and respond to it."""
+        if _debug: ChangeOfValueServices._debug("subscribe_cov %r %r", apdu, cov_inc)
+
         # extract the pieces
         client_addr = apdu.pduSource
         proc_id = apdu.subscriberProcessIdentifier
         obj_id = apdu.monitoredObjectIdentifier
         confirmed = apdu.issueConfirmedNotifications
         lifetime = apdu.lifetime
-        prop_id = apdu.monitoredPropertyIdentifier
-        cov_inc = apdu.covIncrement
 
         # request is to cancel the subscription
         cancel_subscription = (confirmed is None) and (lifetime is None)
@@ -782,48 +995,48 @@ class ChangeOfValueServices(Capability):
         if not obj._object_supports_cov:
             raise ExecutionError(errorClass='services', errorCode='covSubscriptionFailed')
 
-        # look for an algorithm already associated with this object
-        cov_detection = self.cov_detections.get(obj, None)
-
-        # if there isn't one, make one and associate it with the object
-        if not cov_detection:
-            # look for an associated class and if it's not there it's not supported
-            criteria_class = criteria_type_map.get(obj_id[0], None)
-            if not criteria_class:
-                raise ExecutionError(errorClass='services', errorCode='covSubscriptionFailed')
-
-            # make one of these and bind it to the object
-            cov_detection = criteria_class(obj)
-
-            # keep track of it for other subscriptions
-            self.cov_detections[obj] = cov_detection
-        if _debug: ChangeOfValueServices._debug("    - cov_detection: %r", cov_detection)
-
         # can a match be found?
-        cov = cov_detection.cov_subscriptions.find(client_addr, proc_id, obj_id)
+        cov = self.cov_subscriptions.get(subscription_key(client_addr, proc_id, obj_id), None)
         if _debug: ChangeOfValueServices._debug("    - cov: %r", cov)
 
         # if a match was found, update the subscription
         if cov:
+            cov_detection = self.cov_detections[obj]
+
             if cancel_subscription:
                 if _debug: ChangeOfValueServices._debug("    - cancel the subscription")
                 self.cancel_subscription(cov)
             else:
                 if _debug: ChangeOfValueServices._debug("    - renew the subscription")
                 cov.renew_subscription(lifetime)
+        elif cancel_subscription:
+            if _debug: ChangeOfValueServices._debug("    - cancel a subscription that doesn't exist")
         else:
-            if cancel_subscription:
-                if _debug: ChangeOfValueServices._debug("    - cancel a subscription that doesn't exist")
-            else:
-                if _debug: ChangeOfValueServices._debug("    - create a subscription")
+            if _debug: ChangeOfValueServices._debug("    - create a subscription")
+
+            # look for an algorithm already associated with this object
+            cov_detection = self.cov_detections.get(obj, None)
+
+            # if there isn't one, make one and associate it with the object
+            if not cov_detection:
+                # look for an associated class and if it's not there it's not supported
+                criteria_class = criteria_type_map.get(obj_id[0], None)
+                if not criteria_class:
+                    raise ExecutionError(errorClass='services', errorCode='covSubscriptionFailed')
+
+                # make one of these and bind it to the object
+                cov_detection = criteria_class(obj)
+
+                # keep track of it for other subscriptions
+                self.cov_detections[obj] = cov_detection
+            if _debug: ChangeOfValueServices._debug("    - cov_detection: %r", cov_detection)
 
-                # make a subscription
-                cov = Subscription(obj, client_addr, proc_id, obj_id,
-                                   confirmed, lifetime, cov_inc)
-                if _debug: ChangeOfValueServices._debug("    - cov: %r", cov)
+            # make a subscription
+            cov = Subscription(obj, client_addr, proc_id, obj_id, confirmed, lifetime, cov_inc)
+            if _debug: ChangeOfValueServices._debug("    - cov: %r", cov)
 
-                # add it to our subscriptions lists
-                self.add_subscription(cov)
+            # add it to our subscriptions lists
+            self.add_subscription(cov)
 
         # success
         response = SimpleAckPDU(context=apdu)
@@ -3,14 +3,16 @@
 from ..debugging import bacpypes_debugging, ModuleLogger
 from ..capability import Capability
 
-from ..basetypes import ErrorType, PropertyIdentifier
-from ..primitivedata import Atomic, Null, Unsigned
+from ..basetypes import ErrorType, ObjectPropertyReference, PropertyIdentifier, PropertyValue
+from ..primitivedata import Atomic, Null, Unsigned, TagList, EncodedTags
 from ..constructeddata import Any, Array, ArrayOf, List
 
 from ..apdu import SimpleAckPDU, ReadPropertyACK, ReadPropertyMultipleACK, \
-    ReadAccessResult, ReadAccessResultElement, ReadAccessResultElementChoice
-from ..errors import ExecutionError
-from ..object import PropertyError
+    ReadAccessResult, ReadAccessResultElement, ReadAccessResultElementChoice, \
+    WriteAccessSpecification, WritePropertyMultipleRequest, WritePropertyMultipleError
+from ..errors import ExecutionError, InvalidTag, InvalidParameterDatatype, ParameterOutOfRange
+from ..iocb import IOCB
+from ..object import Object, Property, PropertyError
 
 # some debugging
 _debug = 0
@@ -106,25 +108,8 @@ class ReadWritePropertyServices(Capability):
             raise ExecutionError(errorClass='object', errorCode='unknownObject')
 
         try:
-            # check if the property exists
-            if obj.ReadProperty(apdu.propertyIdentifier, apdu.propertyArrayIndex) is None:
-                raise PropertyError(apdu.propertyIdentifier)
-
-            # get the datatype, special case for null
-            if apdu.propertyValue.is_application_class_null():
-                datatype = Null
-            else:
-                datatype = obj.get_datatype(apdu.propertyIdentifier)
-            if _debug: ReadWritePropertyServices._debug("    - datatype: %r", datatype)
-
-            # special case for array parts, others are managed by cast_out
-            if issubclass(datatype, Array) and (apdu.propertyArrayIndex is not None):
-                if apdu.propertyArrayIndex == 0:
-                    value = apdu.propertyValue.cast_out(Unsigned)
-                else:
-                    value = apdu.propertyValue.cast_out(datatype.subtype)
-            else:
-                value = apdu.propertyValue.cast_out(datatype)
+            # check the property and cast the value out of the request
+            value = property_value_from_any(obj, apdu.propertyIdentifier, apdu.propertyArrayIndex, apdu.propertyValue)
             if _debug: ReadWritePropertyServices._debug("    - value: %r", value)
 
             # change the value
@@ -186,16 +171,174 @@ def read_property_to_any(obj, propertyIdentifier, propertyArrayIndex=None):
     # return the object
     return result
 
+#
+#   property_value_error
+#
+
+# what casting or writing a value that doesn't fit the property raises
+_value_errors = (InvalidTag, InvalidParameterDatatype, ParameterOutOfRange, TypeError, ValueError)
+
+def property_value_error(err):
+    """Return the ExecutionError for a value that doesn't fit the property,
+    one of the _value_errors."""
+    if isinstance(err, ParameterOutOfRange):
+        return ExecutionError(errorClass='property', errorCode='valueOutOfRange')
+    return ExecutionError(errorClass='property', errorCode='invalidDataType')
+
+#
+#   property_value_from_any
+#
+
+@bacpypes_debugging
+def property_value_from_any(obj, propertyIdentifier, propertyArrayIndex, propertyValue):
+    """Check that the object has the property and cast the value to be
+    written out of the Any, the other way around from read_property_to_any.
+    A value that can't be cast is an ExecutionError like any other failed
+    write, see property_value_error()."""
+    if _debug: property_value_from_any._debug("property_value_from_any %s %r %r", obj, propertyIdentifier, propertyArrayIndex)
+
+    # check if the property exists
+    if obj.ReadProperty(propertyIdentifier, propertyArrayIndex) is None:
+        raise PropertyError(propertyIdentifier)
+
+    # get the datatype, special case for null
+    if propertyValue.is_application_class_null():
+        datatype = Null
+    else:
+        datatype = obj.get_datatype(propertyIdentifier)
+    if _debug: property_value_from_any._debug("    - datatype: %r", datatype)
+
+    # special case for array parts, others are managed by cast_out
+    try:
+        if issubclass(datatype, Array) and (propertyArrayIndex is not None):
+            if propertyArrayIndex == 0:
+                value = propertyValue.cast_out(Unsigned)
+            else:
+                value = propertyValue.cast_out(datatype.subtype)
+        else:
+            value = propertyValue.cast_out(datatype)
+    except _value_errors as err:
+        if _debug: property_value_from_any._debug("    - cast error: %r", err)
+        raise property_value_error(err)
+    if _debug: property_value_from_any._debug("    - value: %r", value)
+
+    return value
+
+#
+#   EncodedReadAccessResultElement
+#
+
+@bacpypes_debugging
+class EncodedReadAccessResultElement(ReadAccessResultElement):
+
+    """A result element that is encoded once, when it is built, and then
+    copies those octets into every response it is a part of."""
+
+    def __init__(self, *args, **kwargs):
+        if _debug: EncodedReadAccessResultElement._debug("__init__ %r %r", args, kwargs)
+        ReadAccessResultElement.__init__(self, *args, **kwargs)
+
+        taglist = TagList()
+        ReadAccessResultElement.encode(self, taglist)
+        self._encoded = EncodedTags(taglist)
+
+    def encode(self, taglist):
+        taglist.append(self._encoded)
+
 #
 #   read_property_to_result_element
 #
 
+# elements for properties an object doesn't have a value for are the same
+# for every object, they are shared
+_unknown_property_elements = {}
+
+# values that hold nothing that can be changed in place
+_simple_types = (type(None), bool, int, float, str, bytes, tuple)
+
+# the state of a value that can't be checked, it is never cached
+_uncached = object()
+
+def _value_state(value):
+    """Return a copy of what an encoding of the value depends on.  Values
+    are changed in place more often than not (an atomic value's .value,
+    the bits of statusFlags, the objectList of a device as objects come
+    and go), so it is their contents that are compared, not just their
+    identity.  Lists and arrays are good as long as their elements are
+    simple or atomic, anything else is _uncached."""
+    if isinstance(value, _simple_types):
+        return value
+    if isinstance(value, (Atomic, Array, List)):
+        value = value.value
+        if isinstance(value, _simple_types):
+            return value
+    if not isinstance(value, list):
+        return _uncached
+
+    state = []
+    for item in value:
+        if isinstance(item, Atomic):
+            item = item.value
+        if not isinstance(item, _simple_types):
+            return _uncached
+        state.append(item)
+
+    return tuple(state)
+
+def _result_element_cache(obj, propertyIdentifier):
+    """Return the cache of result elements of the object, or None if the
+    property can't be cached.  Only properties that are read straight out
+    of obj._values are, an element is good for as long as the value there
+    is the same object (its _value) with the same contents (its _state),
+    see _value_state()."""
+    if (not obj) or (type(obj).ReadProperty is not Object.ReadProperty) \
+            or (type(obj).get_datatype is not Object.get_datatype):
+        return None
+
+    entry = obj._property_table.get(propertyIdentifier)
+    if (entry is None) or (type(entry[0]).ReadProperty is not Property.ReadProperty):
+        return None
+
+    cache = obj.__dict__.get('_property_cache')
+    if cache is None:
+        cache = obj._property_cache = {}
+
+    return cache
+
 @bacpypes_debugging
 def read_property_to_result_element(obj, propertyIdentifier, propertyArrayIndex=None):
     """Read the specified property of the object, with the optional array index,
     and cast the result into an Any object."""
     if _debug: read_property_to_result_element._debug("read_property_to_result_element %s %r %r", obj, propertyIdentifier, propertyArrayIndex)
 
+    # array elements are cached by property and index
+    if propertyArrayIndex is None:
+        key = propertyIdentifier
+    else:
+        key = (propertyIdentifier, propertyArrayIndex)
+
+    # check for an encoding of the current value
+    try:
+        element = obj._property_cache[key]
+        value = obj._values.get(propertyIdentifier)
+        if (element._value is value) and ((value is None) or (element._state == _value_state(value))):
+            if _debug: read_property_to_result_element._debug("    - cached")
+            return element
+    except (AttributeError, KeyError):
+        pass
+
+    cache = _result_element_cache(obj, propertyIdentifier)
+    if cache is not None:
+        value = obj._values.get(propertyIdentifier)
+        state = _value_state(value)
+        if state is _uncached:
+            cache = None
+        elif value is None:
+            element = _unknown_property_elements.get(key)
+            if element is not None:
+                cache[key] = element
+                return element
+
     # save the result in the property value
     read_result = ReadAccessResultElementChoice()
 
@@ -212,12 +355,26 @@ def read_property_to_result_element(obj, propertyIdentifier, propertyArrayIndex=
         if _debug: read_property_to_result_element._debug("    - error: %r", error)
         read_result.propertyAccessError = ErrorType(errorClass=error.errorClass, errorCode=error.errorCode)
 
-    # make an element for this value
-    read_access_result_element = ReadAccessResultElement(
-        propertyIdentifier=propertyIdentifier,
-        propertyArrayIndex=propertyArrayIndex,
-        readResult=read_result,
-        )
+    # make an element for this value, encoded now if it can be kept
+    if cache is not None:
+        read_access_result_element = EncodedReadAccessResultElement(
+            propertyIdentifier=propertyIdentifier,
+            propertyArrayIndex=propertyArrayIndex,
+            readResult=read_result,
+            )
+        read_access_result_element._value = value
+        read_access_result_element._state = state
+        cache[key] = read_access_result_element
+
+        if (value is None) and read_result.propertyAccessError \
+                and (read_result.propertyAccessError.errorCode == 'unknownProperty'):
+            _unknown_property_elements[key] = read_access_result_element
+    else:
+        read_access_result_element = ReadAccessResultElement(
+            propertyIdentifier=propertyIdentifier,
+            propertyArrayIndex=propertyArrayIndex,
+            readResult=read_result,
+            )
     if _debug: read_property_to_result_element._debug("    - read_access_result_element: %r", read_access_result_element)
 
     # fini
@@ -341,8 +498,170 @@ class ReadWritePropertyMultipleServices(Capability):
         # return the result
         self.response(resp)
 
-#   def do_WritePropertyMultipleRequest(self, apdu):
-#       """Respond to a WritePropertyMultiple Request."""
-#       if _debug: ReadWritePropertyMultipleServices._debug("do_ReadPropertyMultipleRequest %r", apdu)
+    def is_writable(self, obj, propertyIdentifier):
+        """Return True if a WritePropertyMultiple may change the property,
+        checked for every write before any of them is applied."""
+        if _debug: ReadWritePropertyMultipleServices._debug("is_writable %s %r", obj, propertyIdentifier)
+
+        entry = obj._property_table.get(propertyIdentifier)
+        return (entry is not None) and entry[0].mutable
+
+    def write_property(self, obj, propertyIdentifier, value, propertyArrayIndex=None, priority=None):
+        """Change the value of a property for a WritePropertyMultiple, an
+        application with objects that are fed from somewhere else can
+        override this (and is_writable) to route the write."""
+        if _debug: ReadWritePropertyMultipleServices._debug("write_property %s %r %r", obj, propertyIdentifier, value)
+
+        return obj.WriteProperty(propertyIdentifier, value, propertyArrayIndex, priority)
+
+    def do_WritePropertyMultipleRequest(self, apdu):
+        """Respond to a WritePropertyMultiple Request."""
+        if _debug: ReadWritePropertyMultipleServices._debug("do_WritePropertyMultipleRequest %r", apdu)
+
+        # look up every object and property and cast every value before
+        # anything is changed, most failures leave the objects untouched
+        writes = []
+        for write_access_spec in apdu.listOfWriteAccessSpecs:
+            # get the object identifier
+            objectIdentifier = write_access_spec.objectIdentifier
+            if _debug: ReadWritePropertyMultipleServices._debug("    - objectIdentifier: %r", objectIdentifier)
+
+            # get the object
+            obj = self.get_object_id(objectIdentifier)
+            if _debug: ReadWritePropertyMultipleServices._debug("    - object: %r", obj)
+
+            for property_value in write_access_spec.listOfProperties:
+                propertyIdentifier = property_value.propertyIdentifier
+                propertyArrayIndex = property_value.propertyArrayIndex
+                if _debug: ReadWritePropertyMultipleServices._debug("    - property: %r %r", propertyIdentifier, propertyArrayIndex)
+
+                try:
+                    if not obj:
+                        raise ExecutionError(errorClass='object', errorCode='unknownObject')
+
+                    try:
+                        value = property_value_from_any(obj, propertyIdentifier, propertyArrayIndex, property_value.value)
+                    except PropertyError:
+                        raise ExecutionError(errorClass='property', errorCode='unknownProperty')
+
+                    if not self.is_writable(obj, propertyIdentifier):
+                        raise ExecutionError(errorClass='property', errorCode='writeAccessDenied')
+
+                except ExecutionError as err:
+                    if _debug: ReadWritePropertyMultipleServices._debug("    - execution error: %r", err)
+                    self.response(write_property_multiple_error(apdu, err, objectIdentifier, propertyIdentifier, propertyArrayIndex))
+                    return
+
+                writes.append((obj, objectIdentifier, propertyIdentifier, propertyArrayIndex, value, property_value.priority))
+
+        # apply them in one batch, the property monitors (and with them the
+        # change of value detection) run once per changed property at the end
+        batch_objects = []
+        for obj, _, _, _, _, _ in writes:
+            if '_monitor_batch' not in obj.__dict__:
+                obj.begin_monitor_batch()
+                batch_objects.append(obj)
+
+        resp = None
+        try:
+            for obj, objectIdentifier, propertyIdentifier, propertyArrayIndex, value, priority in writes:
+                try:
+                    try:
+                        self.write_property(obj, propertyIdentifier, value, propertyArrayIndex, priority)
+                    except PropertyError:
+                        raise ExecutionError(errorClass='property', errorCode='unknownProperty')
+                    except _value_errors as err:
+                        raise property_value_error(err)
+
+                except ExecutionError as err:
+                    # the writes before this one stay applied
+                    if _debug: ReadWritePropertyMultipleServices._debug("    - execution error: %r", err)
+                    resp = write_property_multiple_error(apdu, err, objectIdentifier, propertyIdentifier, propertyArrayIndex)
+                    break
+            else:
+                # success
+                resp = SimpleAckPDU(context=apdu)
+
+        finally:
+            # every batch is ended even when a monitor fails, an object
+            # left batched would never report another change
+            monitor_error = None
+            for obj in batch_objects:
+                try:
+                    obj.end_monitor_batch()
+                except Exception as err:
+                    if _debug: ReadWritePropertyMultipleServices._debug("    - monitor error: %r", err)
+                    if monitor_error is None:
+                        monitor_error = err
+
+            # the writes were applied, so the reply goes out regardless
+            if resp is not None:
+                if _debug: ReadWritePropertyMultipleServices._debug("    - resp: %r", resp)
+                self.response(resp)
+
+            if monitor_error is not None:
+                raise monitor_error
+
+#
+#   write_property_multiple_error
+#
+
+def write_property_multiple_error(apdu, err, objectIdentifier, propertyIdentifier, propertyArrayIndex=None):
+    """Build the error response for a failed write of a WritePropertyMultiple."""
+    return WritePropertyMultipleError(
+        errorType=ErrorType(errorClass=err.errorClass, errorCode=err.errorCode),
+        firstFailedWriteAttempt=ObjectPropertyReference(
+            objectIdentifier=objectIdentifier,
+            propertyIdentifier=propertyIdentifier,
+            propertyArrayIndex=propertyArrayIndex,
+            ),
+        context=apdu,
+        )
+
 #
-#       raise NotImplementedError()
+#   ReadWritePropertyMultipleServicesClient
+#
+
+@bacpypes_debugging
+class ReadWritePropertyMultipleServicesClient(Capability):
+
+    def write_property_multiple(self, address, writes, priority=None):
+        """Write a list of (objectIdentifier, propertyIdentifier, value) or
+        (objectIdentifier, propertyIdentifier, value, propertyArrayIndex)
+        in one WritePropertyMultiple request, consecutive writes to the same
+        object share a write access specification.  The value is an Any or
+        something Any.cast_in() accepts.  Returns the IOCB of the request."""
+        if _debug: ReadWritePropertyMultipleServicesClient._debug("write_property_multiple %r %r priority=%r", address, writes, priority)
+
+        write_access_specs = []
+        for write in writes:
+            objectIdentifier, propertyIdentifier, value = write[:3]
+            propertyArrayIndex = write[3] if len(write) > 3 else None
+
+            if not isinstance(value, Any):
+                value = Any(value)
+
+            property_value = PropertyValue(
+                propertyIdentifier=propertyIdentifier,
+                propertyArrayIndex=propertyArrayIndex,
+                value=value,
+                priority=priority,
+                )
+
+            if write_access_specs and write_access_specs[-1].objectIdentifier == objectIdentifier:
+                write_access_specs[-1].listOfProperties.append(property_value)
+            else:
+                write_access_specs.append(WriteAccessSpecification(
+                    objectIdentifier=objectIdentifier,
+                    listOfProperties=[property_value],
+                    ))
+
+        request = WritePropertyMultipleRequest(listOfWriteAccessSpecs=write_access_specs)
+        request.pduDestination = address
+        if _debug: ReadWritePropertyMultipleServicesClient._debug("    - request: %r", request)
+
+        # give it to the application
+        iocb = IOCB(request)
+        self.request_io(iocb)
+
+        return iocb
@@ -31,6 +31,8 @@ settings = Settings(
     max_bytes=1048576,
     backup_count=5,
     route_aware=False,
+    udp_rcvbuf=0,
+    udp_sndbuf=0,
 )
 
 
@@ -45,6 +47,8 @@ def os_settings():
         ("max_bytes", "BACPYPES_MAX_BYTES"),
         ("backup_count", "BACPYPES_BACKUP_COUNT"),
         ("route_aware", "BACPYPES_ROUTE_AWARE"),
+        ("udp_rcvbuf", "BACPYPES_UDP_RCVBUF"),
+        ("udp_sndbuf", "BACPYPES_UDP_SNDBUF"),
     ):
         env_value = os.getenv(env_name, None)
         if env_value is not None:
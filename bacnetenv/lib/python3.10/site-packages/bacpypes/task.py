@@ -21,6 +21,9 @@ _log = ModuleLogger(globals())
 _task_manager = None
 _unscheduled_tasks = []
 
+# dead heap entries tolerated before the task manager bothers to compact
+STALE_MINIMUM = 1024
+
 # only defined for linux platforms
 if sys.platform in ('linux', 'darwin'):
     from .event import WaitableEvent
@@ -54,6 +57,7 @@ class _Task(DebugContents, Logging):
     def __init__(self):
         self.taskTime = None
         self.isScheduled = False
+        self.taskEntry = None
 
     def install_task(self, when=None, delta=None):
         global _task_manager, _unscheduled_tasks
@@ -267,8 +271,10 @@ class TaskManager(SingletonLogging):
         if _debug: TaskManager._debug("__init__")
         global _task_manager, _unscheduled_tasks
 
-        # initialize
+        # initialize, the tasks are a heap of (time, entry, task) and an
+        # entry is only live while it is the taskEntry of its task
         self.tasks = []
+        self.stale = 0
         if _Trigger:
             self.trigger = _Trigger()
         else:
@@ -299,45 +305,69 @@ class TaskManager(SingletonLogging):
         if task.taskTime is None:
             raise RuntimeError("task time is None")
 
-        # if this is already installed, suspend it
+        # if this is already installed the old entry is left in the heap,
+        # it no longer matches the task and is skipped when it comes up
         if task.isScheduled:
-            self.suspend_task(task)
+            self.stale += 1
+            if (self.stale > STALE_MINIMUM) and (2 * self.stale > len(self.tasks)):
+                task.taskEntry = None
+                self.compact()
 
         # save this in the task list
-        heappush( self.tasks, (task.taskTime, next(self.counter), task) )
+        entry = next(self.counter)
+        heappush( self.tasks, (task.taskTime, entry, task) )
         if _debug: TaskManager._debug("    - tasks: %r", self.tasks)
 
+        task.taskEntry = entry
         task.isScheduled = True
 
-        # trigger the event
-        if self.trigger:
+        # trigger the event if this is the new first thing to do, anything
+        # later is found when the current first one comes up
+        if self.trigger and (self.tasks[0][1] == entry):
             self.trigger.set()
 
     def suspend_task(self, task):
         if _debug: TaskManager._debug("suspend_task %r", task)
 
-        # remove this guy
-        for i, (when, n, curtask) in enumerate(self.tasks):
-            if task is curtask:
-                if _debug: TaskManager._debug("    - task found")
-                del self.tasks[i]
-
-                task.isScheduled = False
-                heapify(self.tasks)
-                break
+        # the entry stays in the heap until it comes up or the heap is
+        # compacted, there is nothing to search for
+        if task.isScheduled:
+            if _debug: TaskManager._debug("    - task found")
+            task.taskEntry = None
+            task.isScheduled = False
+            self.stale += 1
+
+            # more dead entries than live ones, clean up
+            if (self.stale > STALE_MINIMUM) and (2 * self.stale > len(self.tasks)):
+                self.compact()
         else:
             if _debug: TaskManager._debug("    - task not found")
 
-        # trigger the event
-        if self.trigger:
-            self.trigger.set()
-
     def resume_task(self, task):
         if _debug: TaskManager._debug("resume_task %r", task)
 
         # just re-install it
         self.install_task(task)
 
+    def compact(self):
+        """Drop the entries of suspended and rescheduled tasks."""
+        if _debug: TaskManager._debug("compact")
+
+        self.tasks = [item for item in self.tasks if item[2].taskEntry == item[1]]
+        heapify(self.tasks)
+        self.stale = 0
+
+    def _first(self):
+        """The first live entry of the heap or None, dropping dead ones."""
+        tasks = self.tasks
+        while tasks:
+            item = tasks[0]
+            if item[2].taskEntry == item[1]:
+                return item
+            heappop(tasks)
+            self.stale -= 1
+        return None
+
     def get_next_task(self):
         """get the next task if there's one that should be processed,
         and return how long it will be until the next one should be
@@ -350,19 +380,21 @@ class TaskManager(SingletonLogging):
         task = None
         delta = None
 
-        if self.tasks:
-            # look at the first task
-            when, n, nxttask = self.tasks[0]
+        # look at the first task
+        item = self._first()
+        if item:
+            when, n, nxttask = item
             if when <= now:
                 # pull it off the list and mark that it's no longer scheduled
                 heappop(self.tasks)
                 task = nxttask
+                task.taskEntry = None
                 task.isScheduled = False
 
-                if self.tasks:
-                    when, n, nxttask = self.tasks[0]
-                    # peek at the next task, return how long to wait
-                    delta = max(when - now, 0.0)
+                # peek at the next task, return how long to wait
+                item = self._first()
+                if item:
+                    delta = max(item[0] - now, 0.0)
             else:
                 delta = when - now
 
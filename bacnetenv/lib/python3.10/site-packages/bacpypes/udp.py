@@ -4,8 +4,10 @@
 UDP Communications Module
 """
 
+import sys
 import asyncore
 import socket
+import struct
 import pickle
 import queue
 
@@ -13,6 +15,7 @@ from time import time as _time
 
 from .debugging import ModuleLogger, bacpypes_debugging
 
+from .settings import settings
 from .core import deferred
 from .task import FunctionTask
 from .comm import PDU, Server
@@ -22,6 +25,20 @@ from .comm import ServiceAccessPoint
 _debug = 0
 _log = ModuleLogger(globals())
 
+# datagrams read or written per handle_read() / handle_write() call before
+# the dispatcher gives the other sockets and the task manager a turn
+RECV_BATCH = 64
+SEND_BATCH = 64
+
+# largest UDP payload, the size of the receive buffer
+MAX_DATAGRAM = 65536
+
+# ask Linux for the running count of datagrams dropped for want of buffer
+# space, it comes back as ancillary data with each datagram
+_SO_RXQ_OVFL = getattr(socket, 'SO_RXQ_OVFL', 40 if sys.platform.startswith('linux') else None)
+_OVFL_SPACE = socket.CMSG_SPACE(4) if hasattr(socket, 'CMSG_SPACE') else 0
+_uint32 = struct.Struct('=I')
+
 #
 #   UDPActor
 #
@@ -65,8 +82,8 @@ class UDPActor:
         if self.timer:
             self.timer.install_task(_time() + self.timeout)
 
-        # put it in the outbound queue for the director
-        self.director.request.put(pdu)
+        # hand it to the director to send
+        self.director.send(pdu)
 
     def response(self, pdu):
         if _debug: UDPActor._debug("response %r", pdu)
@@ -125,8 +142,8 @@ class UDPPickleActor(UDPActor):
 @bacpypes_debugging
 class UDPDirector(asyncore.dispatcher, Server, ServiceAccessPoint):
 
-    def __init__(self, address, timeout=0, reuse=False, actorClass=UDPActor, sid=None, sapID=None):
-        if _debug: UDPDirector._debug("__init__ %r timeout=%r reuse=%r actorClass=%r sid=%r sapID=%r", address, timeout, reuse, actorClass, sid, sapID)
+    def __init__(self, address, timeout=0, reuse=False, actorClass=UDPActor, sid=None, sapID=None, rcvbuf=None, sndbuf=None):
+        if _debug: UDPDirector._debug("__init__ %r timeout=%r reuse=%r actorClass=%r sid=%r sapID=%r rcvbuf=%r sndbuf=%r", address, timeout, reuse, actorClass, sid, sapID, rcvbuf, sndbuf)
         Server.__init__(self, sid)
         ServiceAccessPoint.__init__(self, sapID)
 
@@ -162,8 +179,43 @@ class UDPDirector(asyncore.dispatcher, Server, ServiceAccessPoint):
         # allow it to send broadcasts
         self.socket.setsockopt( socket.SOL_SOCKET, socket.SO_BROADCAST, 1 )
 
-        # create the request queue
+        # socket buffer sizes, zero leaves the system default
+        if rcvbuf is None:
+            rcvbuf = settings.udp_rcvbuf
+        if sndbuf is None:
+            sndbuf = settings.udp_sndbuf
+        if rcvbuf:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        if sndbuf:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+
+        # kernel drop counter where the platform has one
+        self.overflowCount = False
+        if _SO_RXQ_OVFL is not None and _OVFL_SPACE and hasattr(self.socket, 'recvmsg_into'):
+            try:
+                self.socket.setsockopt(socket.SOL_SOCKET, _SO_RXQ_OVFL, 1)
+                self.overflowCount = True
+            except (OSError, socket.error) as err:
+                if _debug: UDPDirector._debug("    - no overflow count: %r", err)
+
+        # every datagram is read into the same buffer
+        self.buffer = bytearray(MAX_DATAGRAM)
+        self.bufferView = memoryview(self.buffer)
+
+        # create the request queue, and a datagram that didn't fit in the
+        # socket buffer the last time around
         self.request = queue.Queue()
+        self.pending = None
+
+        # counters, see counters()
+        self.received = 0
+        self.sent = 0
+        self.sendErrors = 0
+        self.drops = 0
+        self.queuePeak = 0
+
+        # set when an asyncio loop owns the socket (see aiocore)
+        self.transport = None
 
         # start with an empty peer pool
         self.peers = {}
@@ -205,57 +257,122 @@ class UDPDirector(asyncore.dispatcher, Server, ServiceAccessPoint):
         return 1
 
     def handle_read(self):
+        """Read datagrams until the socket is drained (or RECV_BATCH of them)
+        and pass them up together in one deferred call."""
         if _debug: UDPDirector._debug("handle_read(%r)", self.address)
 
+        pdus = []
+        view = self.bufferView
         try:
-            msg, addr = self.socket.recvfrom(65536)
-            if _debug: UDPDirector._debug("    - received %d octets from %s", len(msg), addr)
-
-            # send the PDU up to the client
-            deferred(self._response, PDU(msg, source=addr))
+            for _ in range(RECV_BATCH):
+                if self.overflowCount:
+                    nbytes, ancdata, flags, addr = self.socket.recvmsg_into((view,), _OVFL_SPACE)
+                    for level, kind, data in ancdata:
+                        if level == socket.SOL_SOCKET and kind == _SO_RXQ_OVFL and len(data) >= 4:
+                            self.drops = _uint32.unpack_from(data)[0]
+                else:
+                    nbytes, addr = self.socket.recvfrom_into(view)
+                if _debug: UDPDirector._debug("    - received %d octets from %s", nbytes, addr)
+
+                pdus.append(PDU(view[:nbytes].tobytes(), source=addr))
+
+        except (BlockingIOError, InterruptedError):
+            # drained
+            pass
 
         except socket.timeout as err:
             if _debug: UDPDirector._debug("    - socket timeout: %s", err)
 
         except socket.error as err:
-            if err.args[0] == 11:
-                pass
-            else:
-                if _debug: UDPDirector._debug("    - socket error: %s", err)
+            if _debug: UDPDirector._debug("    - socket error: %s", err)
+
+            # pass along to a handler
+            self.handle_error(err)
+
+        if pdus:
+            self.received += len(pdus)
 
-                # pass along to a handler
-                self.handle_error(err)
+            # send the PDUs up to the client
+            deferred(self._responses, pdus)
 
     def writable(self):
         """Return true iff there is a request pending."""
-        return (not self.request.empty())
+        return (self.pending is not None) or (not self.request.empty())
 
     def handle_write(self):
-        """get a PDU from the queue and send it."""
+        """Send queued PDUs until the socket buffer is full, the queue is
+        empty or SEND_BATCH of them have gone out."""
         if _debug: UDPDirector._debug("handle_write(%r)", self.address)
 
-        try:
-            pdu = self.request.get()
-
-            sent = self.socket.sendto(pdu.pduData, pdu.pduDestination)
-            if _debug: UDPDirector._debug("    - sent %d octets to %s", sent, pdu.pduDestination)
-
-        except socket.error as err:
-            if _debug: UDPDirector._debug("    - socket error: %s", err)
-
-            # get the peer
-            peer = self.peers.get(pdu.pduDestination, None)
-            if peer:
-                # let the actor handle the error
-                peer.handle_error(err)
-            else:
-                # let the director handle the error
-                self.handle_error(err)
+        for _ in range(SEND_BATCH):
+            pdu = self.pending
+            if pdu is None:
+                try:
+                    pdu = self.request.get_nowait()
+                except queue.Empty:
+                    break
+            self.pending = None
+
+            try:
+                sent = self.socket.sendto(pdu.data_view(), pdu.pduDestination)
+                if _debug: UDPDirector._debug("    - sent %d octets to %s", sent, pdu.pduDestination)
+                self.sent += 1
+
+            except (BlockingIOError, InterruptedError):
+                # socket buffer is full, try this one again when writable
+                self.pending = pdu
+                break
+
+            except socket.error as err:
+                if _debug: UDPDirector._debug("    - socket error: %s", err)
+                self.sendErrors += 1
+
+                # get the peer
+                peer = self.peers.get(pdu.pduDestination, None)
+                if peer:
+                    # let the actor handle the error
+                    peer.handle_error(err)
+                else:
+                    # let the director handle the error
+                    self.handle_error(err)
+
+    def send(self, pdu):
+        """Send a PDU, straight to the transport when there is one,
+        otherwise queue it for handle_write().  Queued PDUs are counted
+        as sent when they leave the socket."""
+        if self.transport is not None:
+            if _debug: UDPDirector._debug("send %r", pdu)
+            self.transport.sendto(pdu.data_view(), pdu.pduDestination)
+            self.sent += 1
+        else:
+            self.request.put(pdu)
+            depth = self.request.qsize()
+            if depth > self.queuePeak:
+                self.queuePeak = depth
+
+    def counters(self):
+        """Datagrams received and sent, send errors, datagrams the kernel
+        dropped because the receive buffer was full (where the platform
+        counts them), and the current and peak depth of the send queue."""
+        depth = self.request.qsize() + (self.pending is not None)
+        if self.transport is not None:
+            depth += self.transport.get_write_buffer_size()
+        return {
+            'received': self.received,
+            'sent': self.sent,
+            'sendErrors': self.sendErrors,
+            'drops': self.drops,
+            'queueDepth': depth,
+            'queuePeak': self.queuePeak,
+            }
 
     def close_socket(self):
         """Close the socket."""
         if _debug: UDPDirector._debug("close_socket")
 
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
         self.socket.close()
         self.close()
         self.socket = None
@@ -299,3 +416,11 @@ class UDPDirector(asyncore.dispatcher, Server, ServiceAccessPoint):
 
         # send the message
         peer.response(pdu)
+
+    def _responses(self, pdus):
+        """A batch from handle_read(), one bad datagram doesn't stop the rest."""
+        for pdu in pdus:
+            try:
+                self._response(pdu)
+            except Exception as err:
+                UDPDirector._exception("an error has occurred: %s", err)
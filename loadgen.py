@@ -0,0 +1,302 @@
+# loadgen.py
+#
+# Drive a BACnet device (the PPF / PadA servers by default) with a mix of
+# ReadProperty, ReadPropertyMultiple, WriteProperty, WritePropertyMultiple and
+# SubscribeCOV at a target rate, with many requests in flight, and report throughput,
+# timeouts and latency percentiles.
+#
+#   python3 loadgen.py --rate 500 --duration 30 --mix rp=70,rpm=15,wp=10,cov=5
+#   python3 loadgen.py --targets 127.0.0.1:47809 --objects analogInput:1-9 --rate 2000
+
+import argparse
+import random
+import time
+from collections import Counter, defaultdict
+
+from bacpypes import core, aiocore
+from bacpypes.core import stop, deferred
+from bacpypes.settings import os_settings
+from bacpypes.task import RecurringTask, FunctionTask
+from bacpypes.app import BIPSimpleApplication
+from bacpypes.local.device import LocalDeviceObject
+from bacpypes.pdu import Address
+from bacpypes.iocb import IOCB, TimeoutError
+from bacpypes.apdu import (
+    ReadPropertyRequest, ReadPropertyMultipleRequest, ReadAccessSpecification, PropertyReference,
+    WritePropertyRequest, WritePropertyMultipleRequest, WriteAccessSpecification, SubscribeCOVRequest,
+    SimpleAckPDU, ComplexAckPDU, ErrorPDU, RejectPDU, AbortPDU,
+)
+from bacpypes.basetypes import PropertyValue
+from bacpypes.constructeddata import Any
+from bacpypes.primitivedata import Real
+
+SERVICES = ("rp", "rpm", "wp", "wpm", "cov")
+
+# how often the pacer wakes up to send what's due, milliseconds
+TICK = 10
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip().lower()
+        if name not in SERVICES:
+            raise argparse.ArgumentTypeError("unknown service %r, use %s" % (name, "/".join(SERVICES)))
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_objects(text):
+    """analogInput:1-3,analogValue:1 -> [('analogInput', 1), ...]"""
+    objects = []
+    for part in text.split(","):
+        obj_type, _, instances = part.strip().partition(":")
+        lo, _, hi = instances.partition("-")
+        objects.extend((obj_type, inst) for inst in range(int(lo), int(hi or lo) + 1))
+    return objects
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return float("nan")
+    k = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+# --------------------------------------------------------------------
+# Client application that keeps many requests in flight per device
+class LoadApplication(BIPSimpleApplication):
+    """ApplicationIOController queues requests per destination and only has
+    one outstanding at a time, which measures our own queue instead of the
+    device.  Send every request straight away and match the answer on
+    (source, invoke ID) instead."""
+
+    def __init__(self, *args, **kwargs):
+        BIPSimpleApplication.__init__(self, *args, **kwargs)
+        self.inflight = {}
+        self.notifications = 0
+
+    def process_io(self, iocb):
+        apdu = iocb.args[0]
+        apdu.apduInvokeID = self.smap.get_next_invoke_id(apdu.pduDestination)
+        key = (apdu.pduDestination, apdu.apduInvokeID)
+        self.inflight[key] = iocb
+        iocb.add_callback(lambda _iocb: self.inflight.pop(key, None))
+        self._app_request(apdu)
+
+    def confirmation(self, apdu):
+        iocb = self.inflight.pop((apdu.pduSource, apdu.apduInvokeID), None)
+        if iocb is None:
+            # answer to a request that already timed out
+            return
+        if isinstance(apdu, (SimpleAckPDU, ComplexAckPDU)):
+            self.complete_io(iocb, apdu)
+        elif isinstance(apdu, (ErrorPDU, RejectPDU, AbortPDU)):
+            self.abort_io(iocb, apdu)
+
+    def do_UnconfirmedCOVNotificationRequest(self, apdu):
+        self.notifications += 1
+
+
+# --------------------------------------------------------------------
+# Pacing + bookkeeping
+class LoadGenerator(RecurringTask):
+
+    def __init__(self, app, args):
+        RecurringTask.__init__(self, TICK)
+        self.app = app
+        self.args = args
+        self.targets = [Address(t) for t in args.targets.split(",")]
+        self.objects = parse_objects(args.objects)
+        self.services = list(args.mix)
+        self.weights = [args.mix[s] for s in self.services]
+        self.rng = random.Random(args.seed)
+
+        self.start = None
+        self.last_done = None
+        self.sent = 0
+        self.throttled = 0
+        self.latency = defaultdict(list)    # service -> seconds, completed ok
+        self.results = defaultdict(Counter) # service -> outcome -> count
+        self.process_id = 0
+
+        # per-second progress
+        self.window_done = 0
+        self.window_start = None
+
+    # ---- requests
+    def build(self, service, target):
+        obj = self.rng.choice(self.objects)
+        if service == "rp":
+            apdu = ReadPropertyRequest(objectIdentifier=obj, propertyIdentifier="presentValue")
+        elif service == "rpm":
+            specs = [
+                ReadAccessSpecification(
+                    objectIdentifier=o,
+                    listOfPropertyReferences=[
+                        PropertyReference(propertyIdentifier="presentValue"),
+                        PropertyReference(propertyIdentifier="statusFlags"),
+                    ],
+                )
+                for o in self.rng.sample(self.objects, min(self.args.rpm_objects, len(self.objects)))
+            ]
+            apdu = ReadPropertyMultipleRequest(listOfReadAccessSpecs=specs)
+        elif service == "wp":
+            value = Any()
+            value.cast_in(Real(self.rng.uniform(10.0, 30.0)))
+            apdu = WritePropertyRequest(objectIdentifier=obj, propertyIdentifier="presentValue", propertyValue=value)
+        elif service == "wpm":
+            specs = [
+                WriteAccessSpecification(
+                    objectIdentifier=o,
+                    listOfProperties=[
+                        PropertyValue(propertyIdentifier="presentValue", value=Any(Real(self.rng.uniform(10.0, 30.0)))),
+                    ],
+                )
+                for o in self.rng.sample(self.objects, min(self.args.wpm_objects, len(self.objects)))
+            ]
+            apdu = WritePropertyMultipleRequest(listOfWriteAccessSpecs=specs)
+        else:
+            self.process_id += 1
+            apdu = SubscribeCOVRequest(
+                subscriberProcessIdentifier=self.process_id,
+                monitoredObjectIdentifier=obj,
+                issueConfirmedNotifications=False,
+                lifetime=self.args.cov_lifetime,
+            )
+        apdu.pduDestination = target
+        return apdu
+
+    def send_one(self):
+        service = self.rng.choices(self.services, self.weights)[0]
+        target = self.targets[self.sent % len(self.targets)]
+
+        iocb = IOCB(self.build(service, target))
+        iocb.set_timeout(self.args.timeout)
+        iocb.add_callback(self.done, service, time.perf_counter())
+        self.app.request_io(iocb)
+        self.sent += 1
+
+    def done(self, iocb, service, started):
+        self.last_done = time.perf_counter()
+        elapsed = self.last_done - started
+        self.window_done += 1
+        if iocb.ioResponse is not None:
+            self.results[service]["ok"] += 1
+            self.latency[service].append(elapsed)
+        elif iocb.ioError is TimeoutError:
+            self.results[service]["timeout"] += 1
+        elif isinstance(iocb.ioError, RejectPDU):
+            self.results[service]["reject"] += 1
+        elif isinstance(iocb.ioError, AbortPDU):
+            self.results[service]["abort"] += 1
+        else:
+            self.results[service]["error"] += 1
+
+    # ---- pacing
+    def process_task(self):
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = self.window_start = now
+
+        elapsed = now - self.start
+        if elapsed >= self.args.duration:
+            self.suspend_task()
+            # let the stragglers finish or time out
+            FunctionTask(self.finish).install_task(delta=self.args.timeout + 0.5)
+            return
+
+        # open loop: what can't go out because of --concurrency is skipped, not queued
+        due = int(elapsed * self.args.rate) - self.sent - self.throttled
+        while due > 0:
+            if len(self.app.inflight) >= self.args.concurrency:
+                self.throttled += due
+                break
+            self.send_one()
+            due -= 1
+
+        if now - self.window_start >= 1.0:
+            print(f"⏱️  {elapsed:5.1f}s  {self.window_done / (now - self.window_start):8.1f} rsp/s  "
+                  f"in flight {len(self.app.inflight):4d}  sent {self.sent}")
+            self.window_done = 0
+            self.window_start = now
+
+    def finish(self):
+        self.report()
+        stop()
+
+    def report(self):
+        elapsed = (self.last_done or time.perf_counter()) - self.start
+        total = Counter()
+        for counts in self.results.values():
+            total.update(counts)
+        completed = sum(total.values())
+
+        print()
+        print(f"📊 {self.sent} sent in {self.args.duration:.0f}s (target {self.args.rate:.0f}/s), "
+              f"{completed / elapsed:.1f} rsp/s, {total['ok']} ok, {total['timeout']} timeouts, "
+              f"{self.throttled} held back by --concurrency, {self.app.notifications} COV notifications")
+        print(f"{'service':<8}{'ok':>8}{'timeout':>9}{'reject':>8}{'abort':>7}{'error':>7}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+
+        rows = [(s, self.results[s], sorted(self.latency[s])) for s in self.services]
+        rows.append(("all", total, sorted(x for s in self.services for x in self.latency[s])))
+        for name, counts, ordered in rows:
+            print(f"{name:<8}{counts['ok']:>8}{counts['timeout']:>9}{counts['reject']:>8}"
+                  f"{counts['abort']:>7}{counts['error']:>7}"
+                  f"{percentile(ordered, 50) * 1000:>9.2f}{percentile(ordered, 95) * 1000:>9.2f}"
+                  f"{percentile(ordered, 99) * 1000:>9.2f}")
+
+        socket_counts = self.app.mux.directPort.counters()
+        print(f"🔌 socket: {socket_counts['received']} received, {socket_counts['sent']} sent, "
+              f"{socket_counts['drops']} dropped by the kernel, {socket_counts['sendErrors']} send errors, "
+              f"send queue peak {socket_counts['queuePeak']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BACnet load generator")
+    parser.add_argument("--targets", default="127.0.0.1:47809,127.0.0.1:47810",
+                        help="comma separated device addresses, requests rotate over them")
+    parser.add_argument("--local", default="127.0.0.1:47830", help="address the generator binds to")
+    parser.add_argument("--objects", default="analogInput:1-2", help="objects to hit, e.g. analogInput:1-9,analogValue:1")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("rp=70,rpm=15,wp=10,cov=5"),
+                        help="service weights, e.g. rp=70,rpm=15,wp=10,wpm=5,cov=5")
+    parser.add_argument("--rate", type=float, default=100.0, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--concurrency", type=int, default=200,
+                        help="max requests in flight (invoke IDs are one byte, keep it under 256 per device)")
+    parser.add_argument("--timeout", type=float, default=3.0, help="seconds before a request counts as timed out")
+    parser.add_argument("--rpm-objects", type=int, default=2, help="objects per ReadPropertyMultiple")
+    parser.add_argument("--wpm-objects", type=int, default=2, help="objects written per WritePropertyMultiple")
+    parser.add_argument("--cov-lifetime", type=int, default=60, help="SubscribeCOV lifetime in seconds")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--core", choices=("asyncore", "asyncio"), default="asyncore",
+                        help="event loop the generator runs on")
+    args = parser.parse_args()
+
+    # BACPYPES_UDP_RCVBUF / BACPYPES_UDP_SNDBUF size the generator's socket
+    os_settings()
+
+    device = LocalDeviceObject(
+        objectName="LoadGenerator",
+        objectIdentifier=599,
+        maxApduLengthAccepted=1024,
+        segmentationSupported="noSegmentation",
+        vendorIdentifier=15,
+    )
+    app = LoadApplication(device, Address(args.local))
+
+    # our own timeout decides, the stack shouldn't retry behind our back
+    app.smap.numberOfApduRetries = 0
+    app.smap.apduTimeout = int(args.timeout * 1000) + 1000
+
+    generator = LoadGenerator(app, args)
+    deferred(generator.install_task)
+
+    print(f"🚀 {args.rate:.0f} req/s for {args.duration:.0f}s against {args.targets}, mix {args.mix}")
+    (aiocore if args.core == "asyncio" else core).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,17 @@
 #!/usr/bin/env python2
 
+import os
+import sys
 import time
 import argparse
 import Tkinter as tk
 import socket
-import json
+
+# FeedCodec.py sits next to this file on the VM, or in ../Common in the repo
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(HERE)
+sys.path.append(os.path.join(HERE, "..", "Common"))
+from FeedCodec import DeltaEncoder
 
 
 LEVEL_SENSOR_FD = "CB7 Analog In 04  Mon"
@@ -20,6 +27,15 @@ PRESS_SENSOR_RANGE = 300
 MAX_SCALE = 30000
 LN2_SPECIFIC_GRAVITY = 0.808
 
+LISTENER = ("10.97.0.130", 9000)
+
+# sample every POLL_MS, ship the batch every PUBLISH_MS
+POLL_MS = 100
+PUBLISH_MS = 500
+
+# seconds between reconnect attempts while the listener is unreachable
+RECONNECT_DELAY = 2.0
+
 SWITCH_MEAS_TRANS = {
     "true": True,
     "false": False,
@@ -73,12 +89,14 @@ class Monitor(object):
             main_window=self.root
         )
 
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.settimeout(1.0)
-        self.sock.connect(("10.97.0.130", 9000))
+        # binary delta frames, samples are buffered while disconnected
+        self.encoder = DeltaEncoder(feed="padA")
+        self.sock = None
+        self.next_connect = 0.0
+
         # start polling
-        self.root.after(500, self.poll)
-        self.root.after(500, self.publish)
+        self.root.after(POLL_MS, self.poll)
+        self.root.after(PUBLISH_MS, self.publish)
 
     def poll(self):
         self.model.set_level(self.iface.GetMeasValue(LEVEL_SENSOR_FD))
@@ -89,13 +107,13 @@ class Monitor(object):
         self.model.press_open = self.model.parse_switch(self.iface.GetMeasValue(PRESS_OPEN_SW_FD))
         self.model.press_close= self.model.parse_switch(self.iface.GetMeasValue(PRESS_CLOSE_SW_FD))
 
-
+        self.encoder.add(self.snapshot())
 
         # reschedule
-        self.root.after(500, self.poll)
+        self.root.after(POLL_MS, self.poll)
 
-    def publish(self):
-        snapshot = {
+    def snapshot(self):
+        return {
             "pressure": self.model.pressure,
             "level": self.model.level,
             "delta_p": self.model.delta_p,
@@ -105,6 +123,33 @@ class Monitor(object):
             "press_close": self.model.press_close,
         }
 
+    def connect(self):
+        now = time.time()
+        if now < self.next_connect:
+            return False
+        self.next_connect = now + RECONNECT_DELAY
+        try:
+            sock = socket.create_connection(LISTENER, timeout=1.0)
+        except socket.error as e:
+            print("Listener %s:%d unreachable (%s), %d samples buffered"
+                  % (LISTENER[0], LISTENER[1], e, len(self.encoder.pending)))
+            return False
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        # new connection, new decoder on the other end
+        self.encoder.reset()
+        print("Connected to listener %s:%d" % LISTENER)
+        return True
+
+    def disconnect(self):
+        try:
+            self.sock.close()
+        except socket.error:
+            pass
+        self.sock = None
+        self.encoder.reset()
+
+    def publish(self):
         print(
             "Pressure: %.2f psig | Level: %.2f in | dP: %.2f inH2O | "
             "Vent(O/C): %s/%s | Supply(O/C): %s/%s"
@@ -119,15 +164,24 @@ class Monitor(object):
             )
         )
 
-        payload = json.dumps(snapshot) + "\n"
-        try:
-            self.sock.sendall(payload)
-        except socket.error:
-            # handle reconnect or drop
-            pass
-
-
-        self.root.after(500, self.publish)
+        if self.sock is not None or self.connect():
+            try:
+                while True:
+                    payload = self.encoder.frame()
+                    if not payload:
+                        break
+                    self.sock.sendall(payload)
+                    self.encoder.commit()
+            except socket.error as e:
+                # keep the samples, they go out in a keyframe after reconnecting
+                print("Send failed (%s), reconnecting" % (e,))
+                self.disconnect()
+
+        if self.encoder.dropped:
+            print("Dropped %d samples while disconnected" % (self.encoder.dropped,))
+            self.encoder.dropped = 0
+
+        self.root.after(PUBLISH_MS, self.publish)
 
 
     def run(self):
@@ -1,57 +1,222 @@
-import socket
-import threading
-import json, os, tempfile
-
-# GLOBAL sensor value cache
-sensor_cache = {
-    "AI1": None,
-    "AI2": None,
-    "AI3": None,
-    # ...
-}
-
-DATA_PATH = "/tmp/padA_state.json"
-
-def write_data(data):
-    dir_path = os.path.dirname(DATA_PATH)
-    with tempfile.NamedTemporaryFile(
-        mode="w",
-        dir=dir_path,
-        delete=False
-    ) as tmp:
-        json.dump(data, tmp)
-        tmp.flush()
-        os.fsync(tmp.fileno())
-
-    os.replace(tmp.name, DATA_PATH)  # atomic
-
-def tcp_listener():
-    dir_path = "/tmp"
-    #tmp = tempfile.NamedTemporaryFile(delete=False, dir=dir_path)
-    
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.bind(("0.0.0.0", 9000))   # or whatever port
-    sock.listen(1)
-    print("TCP listener waiting for PoD-A connection...")
-
-    conn, addr = sock.accept()
-    
-    print(f"TCP connected: {addr}")
-
-    while True:
-        pkt = conn.recv(1024)
-        if not pkt:
-            break
-        decoded = pkt.decode("utf-8").strip()
-        data = json.loads(decoded)   # bytes → dict
-        print(data)
-        write_data(data)
-
-       
+import asyncio
+import json
+import os
+import sys
+
+from PadAState import StateWriter, Doorbell, DEFAULT_SLOTS, FIELDS, record_values
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common.FeedCodec import DeltaDecoder, FeedCodecError, MAGIC
+
+LISTEN_HOST = "0.0.0.0"
+LISTEN_PORT = 9000
+
+# a single JSON snapshot is ~150 bytes, anything this long without a newline is garbage
+MAX_LINE = 64 * 1024
+
+# lines parsed from one feed before we stop reading it until the next publish
+BURST_LIMIT = 256
+
+# shared-memory snapshot PadAServer reads from (see PadAState.py)
+state = StateWriter()
+bell = Doorbell()
+
+def write_data(data, slot=0, name=""):
+    state.publish(data, slot, name)  # seqlock protected, no fsync / rename
+
+
+class FeedPublisher:
+    """Coalesces snapshots from every feed and publishes the latest one per feed
+    once per event loop pass, so a burst of packets costs one shared-memory write."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.slots = {}         # feed name -> slot, slot 0 goes to the first feed
+        self.pending = {}       # feed name -> latest unpublished snapshot
+        self.paused = set()     # protocols waiting on the next flush
+        self.scheduled = False
+        self.epoch = 0          # bumped on every flush, resets per-feed burst counts
+
+    def slot_for(self, feed):
+        slot = self.slots.get(feed)
+        if slot is None:
+            if len(self.slots) >= DEFAULT_SLOTS:
+                return None
+            slot = self.slots[feed] = len(self.slots)
+            print(f"📥 feed {feed!r} -> slot {slot}")
+        return slot
+
+    def submit(self, feed, data):
+        # latest value wins
+        self.pending[feed] = data
+        if not self.scheduled:
+            self.scheduled = True
+            self.loop.call_soon(self.flush)
+
+    def hold(self, protocol):
+        # backpressure: stop reading a chatty feed until we have caught up
+        protocol.transport.pause_reading()
+        self.paused.add(protocol)
+        if not self.scheduled:
+            self.scheduled = True
+            self.loop.call_soon(self.flush)
+
+    def flush(self):
+        self.scheduled = False
+        self.epoch += 1
+
+        pending, self.pending = self.pending, {}
+        try:
+            for feed, data in pending.items():
+                slot = self.slot_for(feed)
+                if slot is None:
+                    print(f"⚠️ no free slot for feed {feed!r}, dropping")
+                    continue
+                # one feed failing doesn't cost the others their snapshot
+                try:
+                    write_data(data, slot, feed)
+                except Exception as e:
+                    print(f"⚠️ feed {feed!r}: snapshot not published: {e!r}")
+        finally:
+            # one wakeup for the whole batch, and paused feeds always get going again
+            if pending:
+                bell.ring()
+
+            paused, self.paused = self.paused, set()
+            for protocol in paused:
+                protocol.resume()
+
+
+class FeedProtocol(asyncio.Protocol):
+    """One PoD/VM connection, newline framed JSON snapshots or binary delta
+    frames (Common/FeedCodec.py), told apart by the first byte received."""
+
+    def __init__(self, publisher):
+        self.publisher = publisher
+        self.transport = None
+        self.feed = None
+        self.buffer = bytearray()
+        self.decoder = None     # DeltaDecoder once the peer turns out to speak binary
+        self.detected = False
+        self.lines = 0
+        self.epoch = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        host, port = transport.get_extra_info("peername")[:2]
+        self.feed = host
+        print(f"TCP connected: {host}:{port}")
+
+    def connection_lost(self, exc):
+        print(f"TCP disconnected: {self.feed} ({exc or 'eof'})")
+        self.publisher.paused.discard(self)
+
+    def data_received(self, chunk):
+        if not self.detected:
+            if not chunk:
+                return
+            self.detected = True
+            if chunk[:1] == MAGIC[:1]:
+                self.decoder = DeltaDecoder()
+                print(f"📦 {self.feed}: binary delta feed")
+
+        if self.decoder is not None:
+            self.frames_received(chunk)
+        else:
+            self.lines_received(chunk)
+
+        if self.lines >= BURST_LIMIT and not self.transport.is_closing():
+            self.publisher.hold(self)
+
+    def frames_received(self, chunk):
+        try:
+            samples = self.decoder.feed(chunk)
+        except FeedCodecError as e:
+            print(f"❌ {self.feed}: {e}, dropping connection")
+            self.transport.close()
+            return
+
+        if len(self.decoder.buffer) > MAX_LINE:
+            print(f"❌ {self.feed}: frame over {MAX_LINE} bytes, dropping connection")
+            self.transport.close()
+            return
+
+        for name, data in samples:
+            self.handle_sample(name or self.feed, data)
+
+    def lines_received(self, chunk):
+        buf = self.buffer
+        buf += chunk
+
+        start = 0
+        while True:
+            end = buf.find(b"\n", start)
+            if end < 0:
+                break
+            line = bytes(buf[start:end]).strip()
+            start = end + 1
+            if line:
+                self.handle_line(line)
+
+        # compact once per chunk, not once per line
+        if start:
+            del buf[:start]
+
+        if len(buf) > MAX_LINE:
+            print(f"❌ {self.feed}: no newline in {len(buf)} bytes, dropping connection")
+            self.transport.close()
+
+    def handle_line(self, line):
+        try:
+            data = json.loads(line)
+        except ValueError:
+            print(f"⚠️ {self.feed}: bad JSON {line[:80]!r}")
+            return
+        if not isinstance(data, dict):
+            return
+
+        # simulators can name themselves, otherwise the peer host is the feed
+        self.handle_sample(str(data.pop("feed", self.feed)), data)
+
+    def handle_sample(self, feed, data):
+        # the shared memory record only holds numbers and switches
+        try:
+            data = dict(zip(FIELDS, record_values(data)))
+        except (TypeError, ValueError) as e:
+            print(f"⚠️ {feed}: bad sample ({e})")
+            return
+
+        if self.epoch != self.publisher.epoch:
+            self.epoch = self.publisher.epoch
+            self.lines = 0
+        self.lines += 1
+        self.publisher.submit(feed, data)
+
+    def resume(self):
+        if not self.transport.is_closing():
+            self.transport.resume_reading()
+
+
+async def tcp_listener(host=LISTEN_HOST, port=LISTEN_PORT):
+    loop = asyncio.get_running_loop()
+    publisher = FeedPublisher(loop)
+
+    server = await loop.create_server(
+        lambda: FeedProtocol(publisher),
+        host, port,
+        reuse_address=True,
+    )
+    print(f"TCP listener waiting for PoD/VM connections on {host}:{port}...")
+
+    async with server:
+        await server.serve_forever()
+
 
 if __name__ == "__main__":
-    tcp_listener()
-    #threading.Thread(target=tcp_listener, daemon=True).start()
+    try:
+        asyncio.run(tcp_listener())
+    except KeyboardInterrupt:
+        pass
 
 b'{"vent_open": false, "vent_close": true, "level": 393.1188118811881, "press_open": false, "delta_p": 317.64, "pressure": 0.0, "press_close": true}\n'
 b'{"vent_open": false, "vent_close": true, "level": 393.1188118811881, "press_open": false, "delta_p": 317.64, "pressure": 0.0, "press_close": true}\n'
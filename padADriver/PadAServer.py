@@ -6,6 +6,8 @@ from bacpypes.core import run
 import time, random, threading
 from bacpypes.pdu import Address
 from bacpypes.app import BIPSimpleApplication
+from bacpypes.service.cov import ChangeOfValueServices
+from bacpypes.service.object import ReadWritePropertyMultipleServices
 from bacpypes.constructeddata import ArrayOf
 from bacpypes.local.device import LocalDeviceObject
 from bacpypes.object import AnalogInputObject
@@ -38,22 +40,26 @@ from bacpypes.apdu import ReadAccessResult, ReadAccessResultElement
 from bacpypes.object import DeviceObject
 from bacpypes.local.device import LocalDeviceObject
 
-# Sensor Reading From json
-import json
-import time
+# Sensor Reading From shared memory
+import os, sys
+from PadAState import StateReader, Doorbell
 
-DATA_PATH = "/tmp/padA_state.json"
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common.PointTable import PointTable
+from Common.DeviceConfig import load_definition, build_device, build_objects, add_objects
 
-def read_data():
-    try:
-        with open(DATA_PATH, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        # Writer hasn't written yet
-        return None
-    except json.JSONDecodeError:
-        # Extremely rare with atomic replace, but safe to guard
-        return None
+# device + points (and which shared memory field feeds each one) are declared in PadADevice.json
+DEVICE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "PadADevice.json")
+definition = load_definition(DEVICE_FILE)
+
+# the feed can move a point many times a second, COV subscribers get at most
+# one notification per subscription every COV_MIN_INTERVAL seconds (with the
+# latest values) and COV_MAX_OUTSTANDING unanswered confirmed ones
+COV_MIN_INTERVAL = 1.0
+COV_MAX_OUTSTANDING = 1
+
+state = StateReader()
+bell = Doorbell()
 
 def make_ansi_string(text: str):
     """Force ANSI (encoding=0) CharacterString compatible with BACnet 4J."""
@@ -64,21 +70,7 @@ def make_ansi_string(text: str):
     return any_val
 
 
-this_device = LocalDeviceObject(
-    objectIdentifier=('device', 3002),
-    objectName='PPFTransmitter',
-    systemStatus=Enumerated(0),  # operational
-    vendorName=CharacterString('VSA'),
-    vendorIdentifier=999,
-    modelName=CharacterString('PPF Environmental Transmitter'),
-    firmwareRevision=CharacterString('2.0'),
-    applicationSoftwareVersion=CharacterString('2.0'),
-    protocolVersion=Unsigned(1),
-    protocolRevision=Unsigned(22),
-    maxApduLengthAccepted=Unsigned(1024),
-    segmentationSupported=Enumerated(3),  # noSegmentation = 3
-    databaseRevision=Unsigned(1),
-)
+this_device = build_device(definition)
 
 def _send_ack(self, ack):
     self.response(ack)
@@ -89,102 +81,66 @@ def _send_ack(self, ack):
 
 # --------------------------------------------------------------------
 # 2️⃣ Application subclass that handles BACnet traffic
-class FakeBACnetServer(BIPSimpleApplication):
+class FakeBACnetServer(BIPSimpleApplication, ReadWritePropertyMultipleServices, ChangeOfValueServices):
+    cov_notification_interval = COV_MIN_INTERVAL
+    cov_max_outstanding = COV_MAX_OUTSTANDING
+
     def _send_ack(self, ack):
         self.response(ack)
         print("sent ack")
         return
  
 
-    def __init__(self, device, address):
+    def __init__(self, device, address, definition):
         super().__init__(device, address)
-                # --- 10 fake analog inputs ---
-
-                
 
-        # --- Realistic sensor categories ---
-        self.sensors = {
-            #level
-            1:  0,
-            # delta_p            
-            2:  0,
+        # --- Build every object from the definition in one go ---
+        points = build_objects(definition)
+        add_objects(self, [obj for _, obj in points])
 
-        }
-
-        # --- matching sensor metadata ---
-        self.sensor_types = {
-            1: "temperature", 2: "pressure"
-        }
-
-        # BACnet engineering units mapping
-        self.unit_map = {
-            "temperature": 62,   # degreesCelsius
-            "pressure":    115,  # kilopascals
-            "humidity":    29,   # percentRelativeHumidity
-        }
-
-        # start drift loop
-        
+        self.sensors = {}     # AI instance -> last value
         self.ai_objects = {}  # store references
-        # --- Build REAL analog input objects ---
-        for inst, value in self.sensors.items():
-            from bacpypes.basetypes import StatusFlags, EventTransitionBits, TimeStamp, EngineeringUnits, NotifyType, EventState
-            sensor_type = self.sensor_types[inst]
-            unit_enum = self.unit_map[sensor_type]
-            ai = AnalogInputObject(
-                objectIdentifier=('analogInput', inst),
-                objectName=f"{sensor_type.title()} Sensor {inst}",
-                presentValue=Real(value),
-
-                # ---- REQUIRED VALID BACNET TYPES ----
-                statusFlags=StatusFlags([0, 0, 0, 0]),
-
-                eventState=EventState(0),              # instead of 0
-                eventEnable=EventTransitionBits([0,0,0]),
-                ackedTransitions=EventTransitionBits([0,0,0]),
-                outOfService=Boolean(False),
-
-                notificationClass=Unsigned(0),
-
-                notifyType=1,               # instead of Unsigned(1)
-
-                # ---- FIXED! MUST BE EngineeringUnits ----
-                units=EngineeringUnits(unit_enum),              # degreesCelsius
-            )
-
-            self.add_object(ai)
-            self.ai_objects[inst] = ai
-
-        #Start Read Loop
+        self.av_objects = {}
+        self.sources = {}     # shared memory slot -> [(AI instance, field)]
+        for point, obj in points:
+            if point.type == "analogInput":
+                self.ai_objects[point.instance] = obj
+                self.sensors[point.instance] = obj.presentValue.value
+            elif point.type == "analogValue":
+                self.av_objects[point.instance] = obj
+
+            if point.source[0] == "feed":
+                _, slot, field = point.source
+                self.sources.setdefault(slot, []).append((point.instance, field))
+
+        # new samples go into the table's back buffer, the swap happens on the BACnet loop
+        self.points = PointTable(self.ai_objects)
         threading.Thread(target=self._read_loop, daemon=True).start()
 
     def _read_loop(self):
+        last_gen = {}
         while True:
-            data = read_data()
-            if data is None:
-                time.sleep(0.33)  # ~3 reads/sec
-                continue
-            #print(data)
-            pressure = data["pressure"]
-            level = data["level"]
-            for i, v in self.sensors.items():
+            # sleeps in the kernel until PadAListener publishes, the timeout
+            # only covers a listener that started before we bound the bell
+            bell.wait(timeout=5.0)
 
-                t = self.sensor_types[i]
+            values = {}
+            for slot, fields in self.sources.items():
+                gen, data = state.read(slot)
+                if data is None or gen == last_gen.get(slot):
+                    continue
+                last_gen[slot] = gen
 
-                if t == "temperature":
-                    new = level
+                for i, field in fields:
+                    new = data[field]
 
-                elif t == "pressure":
-                    new = pressure
+                    # SAVE internally
+                    self.sensors[i] = new
+                    values[i] = new
 
-                # SAVE internally
-                self.sensors[i] = new
-
-                # UPDATE BACnet object’s presentValue
-                ai = self.ai_objects[i]
-                ai.presentValue = Real(new)  # <-- THIS is what Ignition reads
-
-            time.sleep(0.5)
+            # stage + commit, swapped in on the bacpypes thread, only changed points are written
+            if values:
+                self.points.push(values)
 
 
 
@@ -207,7 +163,7 @@ class FakeBACnetServer(BIPSimpleApplication):
 
             # If writing to AV
             if obj == ('analogValue', 1) and prop == "presentValue":
-                self.av_objects[1].presentValue = float(val)
+                self.av_objects[1].presentValue = Real(val)
 
                 ack = SimpleAckPDU(context=apdu)
                 self.response(ack)
@@ -221,100 +177,36 @@ class FakeBACnetServer(BIPSimpleApplication):
                 return
 
 
-        if True:
-            super().indication(apdu)
-            return 
-        print(f"received {apdu}")
-        if isinstance(apdu, WhoIsRequest):
-            print(f"📡 Who-Is from {apdu.pduSource}")
-
-            i_am = IAmRequest(
-                iAmDeviceIdentifier=self.localDevice.objectIdentifier,
-                maxAPDULengthAccepted=self.localDevice.maxApduLengthAccepted,
-                segmentationSupported=self.localDevice.segmentationSupported,
-                vendorID=self.localDevice.vendorIdentifier,
-            )
-
-            # ✅ Use the real (ip, port) tuple — not the string
-            dest_ip, dest_port = apdu.pduSource.addrTuple
-            i_am.pduDestination = Address(f"{dest_ip}:{dest_port}")
-
-            print(f"   ↩️  Replying to {dest_ip}:{dest_port}")
-            self.request(i_am)
-            print("✅ I-Am sent")
+        # everything else, including ReadPropertyMultiple, WritePropertyMultiple
+        # and SubscribeCOV / SubscribeCOVProperty, goes to the service capabilities
+        super().indication(apdu)
 
+    def is_writable(self, obj, propertyIdentifier):
+        # point presentValues are read-only to bacpypes, write_property() takes them
+        if obj.objectIdentifier[0] in ("analogInput", "analogValue") and propertyIdentifier == "presentValue":
+            return True
+        return super().is_writable(obj, propertyIdentifier)
 
-        elif isinstance(apdu, ReadPropertyMultipleRequest):
-            print("📦 RPM received (device does NOT support RPM)")
-
-            from bacpypes.apdu import Error
-            from bacpypes.basetypes import ServicesSupported
-
-            # Proper defined enum values
-            error = Error(
-                errorClass='services',
-                errorCode='serviceRequestDenied',  # VALID enum
-            )
-
-            error.apduSource = apdu.pduSource
-
-            self.response(error)
-            print("❌ Sent proper RPM serviceRequestDenied error")
+    def write_property(self, obj, propertyIdentifier, value, propertyArrayIndex=None, priority=None):
+        # WritePropertyMultiple lands here, points take the same path as a WriteProperty
+        instance = obj.objectIdentifier
+        if instance[0] == "analogValue" and propertyIdentifier == "presentValue":
+            val = float(value)
+            print(f"WRITE: {instance} {propertyIdentifier} = {val}")
+            obj.presentValue = Real(val)
             return
-
-
-        
-
-        elif isinstance(apdu, SubscribeCOVRequest):
-            print(f"🟦 SubscribeCOVRequest from {apdu.pduSource}")
-
-            # Save the subscription (only one subscriber supported for simplicity)
-            self.cov_subscriber = apdu.pduSource
-            self.cov_object = apdu.monitoredObjectIdentifier
-            self.cov_lifetime = apdu.lifetime
-
-            # Must send ACK or Ignition will retry forever
-            ack = SimpleAckPDU(context=apdu)
-            self.response(ack)
-            print("🟩 Sent COV ACK")
+        if instance[0] == "analogInput" and propertyIdentifier == "presentValue":
+            val = float(value)
+            print(f"WRITE: {instance} {propertyIdentifier} = {val}")
+            self.sensors[instance[1]] = val
             return
-
-
-        elif isinstance(apdu, UnconfirmedTextMessageRequest):
-            print(f"💬 UnconfirmedText from {apdu.pduSource}: {apdu.message}")
-        # --- Confirmed services ---
-        elif isinstance(apdu, ReadPropertyRequest):
-            obj_id = apdu.objectIdentifier
-            prop_id = apdu.propertyIdentifier
-            print(f"🔍 ReadProperty from {apdu.pduSource}: {obj_id} {prop_id}")
-
-        if True:
-            super().indication(apdu)
-            return 
-       
-
-        elif isinstance(apdu, WritePropertyRequest):
-            obj_id = apdu.objectIdentifier
-            prop_id = apdu.propertyIdentifier
-            value = apdu.propertyValue.cast_out(Real)
-            print(f"✏️ WriteProperty from {apdu.pduSource}: {obj_id} {prop_id} = {value}")
-            if obj_id[0] == "analogInput" and prop_id == "presentValue":
-                self.sensors[obj_id[1]] = float(value)
-            ack = SimpleAckPDU(context=apdu)
-            self.response(ack)
-
-        elif isinstance(apdu, ConfirmedTextMessageRequest):
-            print(f"📨 ConfirmedText from {apdu.pduSource}: {apdu.message}")
-            ack = SimpleAckPDU(context=apdu)
-            self.response(ack)
-
-        else:
-            print(f"❓ Unknown APDU type: {apdu.__class__.__name__}")
+        return super().write_property(obj, propertyIdentifier, value, propertyArrayIndex, priority)
 
 
 # --------------------------------------------------------------------
-server = FakeBACnetServer(this_device, Address("127.0.0.1:47810"))
-print("🚀 BACnet server running on UDP/47810 ...")
+address = Address(definition["address"])
+server = FakeBACnetServer(this_device, address, definition)
+print(f"🚀 BACnet server running on UDP/{address.addrPort} ...")
 run()
 
 
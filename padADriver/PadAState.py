@@ -0,0 +1,274 @@
+"""
+Shared-memory snapshot channel between PadAListener and PadAServer.
+
+The listener publishes every PoD-A packet into a small mmap'd record with a
+fixed binary layout, and the BACnet server reads it straight out of memory.
+A seqlock style generation counter replaces the old temp file + fsync +
+os.replace dance: the writer bumps the counter to an odd value, writes the
+record, then bumps it back to even.  A reader that sees an odd counter, or a
+counter that moved while it was copying, just retries, so it never returns a
+half written (torn) snapshot.
+
+Readers don't have to poll the generation counter: after publishing, the
+writer rings a Doorbell (a one byte unix datagram next to the segment) and
+the reader blocks on it until there is something new to look at.
+
+The segment holds a fixed number of slots, one per PoD/VM feed, so several
+simulators can publish through one listener.  Slot 0 is the primary PoD-A
+feed that PadAServer exposes.
+
+Layout (little endian):
+
+    header, 8 bytes
+        offset  0  4s   magic  b"PADA"
+        offset  4  H    layout version
+        offset  6  H    slot count
+
+    slot, 80 bytes each, starting at offset 8
+        +0   Q    generation (odd while a write is in progress)
+        +8   32s  feed name (utf-8, NUL padded)
+        +40  d    pressure
+        +48  d    level
+        +56  d    delta_p
+        +64  ?    vent_open
+        +65  ?    vent_close
+        +66  ?    press_open
+        +67  ?    press_close
+        +68  12x  padding
+"""
+
+import mmap
+import os
+import socket
+import struct
+
+# tmpfs backed so nothing ever hits the disk
+SHM_PATH = "/dev/shm/padA_state" if os.path.isdir("/dev/shm") else "/tmp/padA_state.shm"
+
+# datagram socket the reader waits on
+BELL_PATH = SHM_PATH + ".bell"
+
+MAGIC = b"PADA"
+VERSION = 2
+
+# enough for every simulator we point at one host
+DEFAULT_SLOTS = 16
+
+_HEADER = struct.Struct("<4sHH")
+_GENERATION = struct.Struct("<Q")
+_NAME = struct.Struct("32s")
+_RECORD = struct.Struct("<ddd????12x")
+
+NAME_OFFSET = _GENERATION.size
+RECORD_OFFSET = NAME_OFFSET + _NAME.size
+SLOT_SIZE = RECORD_OFFSET + _RECORD.size
+
+# order matches _RECORD
+FIELDS = (
+    "pressure", "level", "delta_p",
+    "vent_open", "vent_close", "press_open", "press_close",
+)
+
+# how many times a reader retries before giving up on a busy writer
+MAX_READ_RETRIES = 1000
+
+
+def record_values(data):
+    """The _RECORD values of a snapshot dict, missing fields are 0 / False.
+    Raises TypeError or ValueError for an analog field that isn't a number or
+    a switch that isn't a boolean (or 0 / 1)."""
+    values = [float(data.get(name, 0.0)) for name in FIELDS[:3]]
+    for name in FIELDS[3:]:
+        value = data.get(name, False)
+        if not isinstance(value, (bool, int)) or value not in (0, 1):
+            raise ValueError("%s is not a boolean: %r" % (name, value))
+        values.append(bool(value))
+    return tuple(values)
+
+
+def segment_size(slots):
+    return _HEADER.size + slots * SLOT_SIZE
+
+
+def slot_offset(slot):
+    return _HEADER.size + slot * SLOT_SIZE
+
+
+class StateWriter:
+    """Single writer side, owned by PadAListener."""
+
+    def __init__(self, path=SHM_PATH, slots=DEFAULT_SLOTS):
+        self.path = path
+        self.slots = slots
+        self.size = segment_size(slots)
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, self.size)
+            self.mm = mmap.mmap(fd, self.size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+
+        # a fresh segment starts at generation 0 which readers treat as "no data yet"
+        magic, version, count = _HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION or count != slots:
+            self.mm[:] = bytes(self.size)
+            _HEADER.pack_into(self.mm, 0, MAGIC, VERSION, slots)
+
+        self.generations = []
+        for slot in range(slots):
+            gen = _GENERATION.unpack_from(self.mm, slot_offset(slot))[0]
+            if gen & 1:
+                # previous writer died mid-update, the record is garbage anyway
+                gen += 1
+            self.generations.append(gen)
+
+    def publish(self, data, slot=0, name=""):
+        """Publish a snapshot dict (the same keys the PoD-A feed sends)."""
+        values = record_values(data)
+
+        base = slot_offset(slot)
+        gen = self.generations[slot]
+        _GENERATION.pack_into(self.mm, base, gen + 1)     # odd: write in progress
+        _NAME.pack_into(self.mm, base + NAME_OFFSET, name.encode("utf-8")[:_NAME.size])
+        _RECORD.pack_into(self.mm, base + RECORD_OFFSET, *values)
+        _GENERATION.pack_into(self.mm, base, gen + 2)     # even: stable
+        self.generations[slot] = gen + 2
+
+    def close(self):
+        self.mm.close()
+
+
+class StateReader:
+    """Reader side, owned by PadAServer.  Never blocks on the writer."""
+
+    def __init__(self, path=SHM_PATH):
+        self.path = path
+        self.mm = None
+        self.slots = 0
+
+    def _attach(self):
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            # writer hasn't started yet
+            return False
+        try:
+            size = os.fstat(fd).st_size
+            if size < _HEADER.size:
+                return False
+            mm = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ)
+        finally:
+            os.close(fd)
+
+        magic, version, count = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION or size < segment_size(count):
+            mm.close()
+            return False
+
+        self.mm = mm
+        self.slots = count
+        return True
+
+    def generation(self, slot=0):
+        """Current generation of a slot, 0 if nothing has been published yet."""
+        if self.mm is None and not self._attach():
+            return 0
+        if slot >= self.slots:
+            return 0
+        return _GENERATION.unpack_from(self.mm, slot_offset(slot))[0]
+
+    def read(self, slot=0):
+        """Return (generation, snapshot dict), or (0, None) with no data yet."""
+        if self.mm is None and not self._attach():
+            return 0, None
+        if slot >= self.slots:
+            return 0, None
+
+        mm = self.mm
+        base = slot_offset(slot)
+        for _ in range(MAX_READ_RETRIES):
+            before = _GENERATION.unpack_from(mm, base)[0]
+            if before & 1:
+                continue
+            values = _RECORD.unpack_from(mm, base + RECORD_OFFSET)
+            after = _GENERATION.unpack_from(mm, base)[0]
+            if before != after:
+                continue
+            if before == 0:
+                return 0, None
+            return before, dict(zip(FIELDS, values))
+
+        # writer is hammering us, try again next time around
+        return 0, None
+
+    def feeds(self):
+        """Map of feed name -> slot for every slot that has been published."""
+        if self.mm is None and not self._attach():
+            return {}
+
+        result = {}
+        for slot in range(self.slots):
+            base = slot_offset(slot)
+            if _GENERATION.unpack_from(self.mm, base)[0] == 0:
+                continue
+            name = _NAME.unpack_from(self.mm, base + NAME_OFFSET)[0].rstrip(b"\0")
+            result[name.decode("utf-8", errors="replace")] = slot
+        return result
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+
+class Doorbell:
+    """Wakeup from writer to reader.  Rings are lossy by design, the reader
+    always re-reads the generation counters, so a missed or coalesced ring
+    only ever means one read covers several publishes."""
+
+    def __init__(self, path=BELL_PATH):
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.bound = False
+
+    def ring(self):
+        # writer side, never blocks and never fails the publish
+        try:
+            self.sock.sendto(b"\0", socket.MSG_DONTWAIT, self.path)
+        except OSError:
+            # nobody listening yet, or the reader is already behind
+            pass
+
+    def wait(self, timeout=None):
+        """Reader side, block until rung (True) or the timeout passes (False)."""
+        if not self.bound:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.sock.bind(self.path)
+            self.bound = True
+
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.recv(16)
+        except socket.timeout:
+            return False
+
+        # swallow rings that piled up while we were busy
+        self.sock.setblocking(False)
+        try:
+            while True:
+                self.sock.recv(16)
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        self.sock.close()
+        if self.bound:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,77 @@
+# timerbench.py
+#
+# Timer churn benchmark for the bacpypes TaskManager, with as many timers
+# active as thousands of outstanding transactions and COV subscriptions
+# would keep: install them all, push a random subset back (SSM
+# restart_timer, IOCB timeouts), suspend and reinstall another subset
+# (transactions completing, new ones starting), then let everything come
+# due and process it.
+#
+#   python3 timerbench.py                  # 100k timers, all of them churned
+#   python3 timerbench.py 100000 2000      # 100k timers, 2k churned per round
+
+import random
+import sys
+import time
+
+from bacpypes.task import TaskManager, OneShotTask
+
+
+class Timer(OneShotTask):
+    fired = 0
+
+    def process_task(self):
+        Timer.fired += 1
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    churn = int(sys.argv[2]) if len(sys.argv) > 2 else count
+
+    manager = TaskManager()
+    rng = random.Random(1)
+    now = manager.get_time()
+    timers = [Timer() for _ in range(count)]
+
+    def later():
+        return now + 60.0 + rng.random() * 60.0
+
+    def timed(label, ops, fn):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<22}{ops:>9} ops {elapsed:9.3f} s {elapsed / max(ops, 1) * 1e6:10.2f} us/op"
+              f"   heap {len(manager.tasks)}")
+
+    def install():
+        for timer in timers:
+            timer.install_task(later())
+
+    def reschedule():
+        for timer in rng.sample(timers, churn):
+            timer.install_task(later())
+
+    def suspend_install():
+        for timer in rng.sample(timers, churn):
+            timer.suspend_task()
+            timer.install_task(later())
+
+    def expire():
+        for timer in timers:
+            timer.install_task(now)
+        while True:
+            task, delta = manager.get_next_task()
+            if not task:
+                break
+            manager.process_task(task)
+
+    print(f"⏱️  {count} active timers, {churn} churned per round")
+    timed("install", count, install)
+    timed("reschedule", churn, reschedule)
+    timed("suspend + install", churn, suspend_install)
+    timed("expire + process", count, expire)
+    print(f"🔥 {Timer.fired} fired")
+
+
+if __name__ == "__main__":
+    main()